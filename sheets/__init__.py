@@ -11,3 +11,6 @@ from sheets.workbook import *
 from sheets.lark_module import *
 from sheets.version import version
 from sheets.tarjan import *
+from sheets.dependency_graph import *
+from sheets.formula_cache import *
+from sheets.json_reader import *
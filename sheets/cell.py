@@ -1,7 +1,9 @@
 """Representation of individual cell in spreadsheet."""
 
 import enum
-import uuid
+from decimal import Decimal
+from typing import Any, Tuple
+from sheets import string_conversions
 
 
 class CellType(enum.Enum):
@@ -15,49 +17,83 @@ class CellType(enum.Enum):
     BOOLEAN = 7
 
 
+def literal_value(contents: str) -> Tuple[Any, CellType]:
+    """
+    Evaluate the contents of a cell that isn't empty and isn't a formula.
+
+    Args:
+        contents (str): stripped contents of the cell
+
+    Returns:
+        Tuple[Any, CellType]: value and type of the cell
+    """
+    error = string_conversions.str_to_error(contents)
+    if error:
+        return error, CellType.ERROR
+    if contents[0] == "'":
+        return contents[1:], CellType.STRING
+    if string_conversions.is_bool_expr(contents):
+        return bool(string_conversions.is_true_expr(contents)), CellType.BOOLEAN
+    if string_conversions.is_number(contents):
+        return Decimal(string_conversions.strip_zeros(contents)), CellType.LITERAL_NUM
+    return contents, CellType.LITERAL_STRING
+
+
 class Cell:
     """
     Cells are uniquely identified by the sheet they're in and their location.
+
+    A workbook holds a single Cell object for each location, so cells are compared and
+    hashed by identity. Cells use __slots__ rather than a __dict__ to keep large sheets
+    small.
     """
 
+    __slots__ = ("sheet", "key", "contents", "value", "cell_type", "lazy", "node_id",
+                 "compiled", "compiled_contents")
+
     def __repr__(self):
         return f"CELL[location: {self.location}, value: {self.value}]"
 
-    def __eq__(self, obj):
-        """Override equality for user defined class"""
-        return isinstance(obj, Cell) and obj.__dict__ == self.__dict__
-
     def __lt__(self, obj):
         assert isinstance(obj, Cell)
         if type(self.value) == type(obj.value): # pylint: disable=unidiomatic-typecheck
             return self.value < obj.value
         assert False, "Cannot compare different types"
 
-    def __hash__(self):
-        """Hash based off of the cell's sheet's id and the cell's location"""
-        return hash((self.sheet.uuid, self.uuid))
-
-    def __init__(self, sheet, location: str, contents: str, value: str, cell_type: CellType):
+    def __init__(self, sheet, key: int, contents: str, value: str, cell_type: CellType):
         """
         Initialize a cell object
 
         Args:
             sheet (Sheet): sheet object the cell is located in
-            location (str): location of the cell in the form of `char` + `int`
+            key (int): location of the cell packed by string_conversions.to_key()
             contents (str): user input into the cell before evaluation
             value (str): evaluation of contents into an actual value
             cell_type (CellType): what classification the cell is
         """
         self.sheet = sheet
-        self.location = location
+        self.key = key
         self.contents = contents
         self.value = value
         self.cell_type = cell_type
-        self.uuid = uuid.uuid1()
+        # whether the cells that the formula reads depend on values (IF, IFERROR, CHOOSE,
+        # INDIRECT) rather than only on the formula text
         self.lazy = False
+        # id of the cell within the workbook's dependency graph, if it is in one
+        self.node_id = None
+        # compiled formula of the contents it was compiled from, kept by
+        # lark_module.compiled_formula() so re-evaluating the cell skips the formula cache
+        self.compiled = None
+        self.compiled_contents = None
+
+    @property
+    def location(self) -> str:
+        """Upper-case string location of the cell, e.g. A1."""
+        return string_conversions.key_to_location(self.key)
 
     def set_fields(self, **kwargs) -> None:
         """
         Update specified fields of a cell object.
         """
-        self.__dict__.update(kwargs)
+        for field, value in kwargs.items():
+            setattr(self, field, value)
@@ -0,0 +1,189 @@
+"""Value of a range of cells such as A1:B10 when it is given to a function."""
+import decimal
+from typing import Any, Iterator, Optional, Tuple, Union
+from sheets import cell, cell_error, string_conversions, unitialized_value
+from sheets.column_aggregate import Aggregate, EMPTY_AGGREGATE
+from sheets.column_lookup import Criterion, lookup_key, nearest
+
+
+class CellRange:
+    """
+    Rectangular range of cells on a sheet. Functions that accept ranges read the values
+    of its cells through this object, so the range is never expanded into references.
+
+    A range given to a formula has the evaluator of the formula as its reader, and
+    each method links what it reads to the formula: the whole range when aggregating it
+    or reading all of its values, the searched column or row when matching a value, and
+    a single cell when reading the value of one.
+    """
+
+    def __init__(self, sheet, corners: Tuple[int, int, int, int], reader=None):
+        """
+        Args:
+            sheet (Sheet): sheet the range is on
+            corners (Tuple[int, int, int, int]): top left col, top left row, bottom right
+            col and bottom right row of the range
+            reader (FormulaEvaluator): evaluator of the formula reading the range, or None
+            if the reads aren't linked to a cell
+        """
+        self.sheet = sheet
+        self.corners = corners
+        self.reader = reader
+
+    def __repr__(self):
+        col1, row1, col2, row2 = self.corners
+        return f"CellRange({self.sheet.name}!{string_conversions.num_to_col(col1)}{row1}:" \
+            f"{string_conversions.num_to_col(col2)}{row2})"
+
+    @property
+    def width(self) -> int:
+        """
+        Number of columns in the range.
+        """
+        return self.corners[2] - self.corners[0] + 1
+
+    @property
+    def height(self) -> int:
+        """
+        Number of rows in the range.
+        """
+        return self.corners[3] - self.corners[1] + 1
+
+    def column(self, offset: int) -> "CellRange":
+        """
+        The column of the range at the given offset from its first column.
+        """
+        col1, row1, _, row2 = self.corners
+        return CellRange(self.sheet, (col1 + offset, row1, col1 + offset, row2), self.reader)
+
+    def value(self, col_offset: int, row_offset: int) -> Any:
+        """
+        Value of the cell at the given offsets from the top left corner of the range, as
+        seen by a formula.
+        """
+        col1, row1 = self.corners[:2]
+        key = string_conversions.to_key(col1 + col_offset, row1 + row_offset)
+        if self.reader is not None:
+            return self.reader.cell(self.sheet.name.lower(), key)
+        return self.__value_at(key)
+
+    def match(self, value: Any, match_type: int) -> Optional[int]:
+        """
+        Offset of the cell with the given value in a range that is a single column or a
+        single row. A column is searched with the lookup index of its column and a row is
+        scanned.
+
+        Args:
+            value (Any): value to look for
+            match_type (int): kind of match, as for column_lookup.nearest()
+
+        Returns:
+            Optional[int]: offset of the cell found, or None if no value matches
+        """
+        self.link()
+        col1, row1, col2, row2 = self.corners
+        if col1 == col2:
+            row = self.sheet.lookup(col1).find(value, row1, row2, match_type)
+            return None if row is None else row - row1
+        key = lookup_key(value)
+        if key is None:
+            return None
+        keys = []
+        for offset in range(self.width):
+            other = lookup_key(self.__value_at(string_conversions.to_key(col1 + offset, row1)))
+            if other is not None:
+                keys.append((offset, other))
+        return nearest(keys, key, match_type)
+
+    def aggregate(self) -> Aggregate:
+        """
+        Sum, count, minimum and maximum of the numbers in the range and the number of
+        errors in it, from the aggregates of its columns.
+        """
+        self.link()
+        col1, row1, col2, row2 = self.corners
+        total, count, errors, minimum, maximum = EMPTY_AGGREGATE
+        for col in range(col1, col2 + 1):
+            col_total, col_count, col_errors, col_minimum, col_maximum = \
+                self.sheet.aggregate(col).query(row1, row2)
+            total += col_total
+            count += col_count
+            errors += col_errors
+            minimum = min(minimum, col_minimum)
+            maximum = max(maximum, col_maximum)
+        return total, count, errors, minimum, maximum
+
+    def count_if(self, criterion: Criterion) -> int:
+        """
+        Count the cells in the range whose values satisfy a criterion, from the lookup
+        indexes of its columns.
+        """
+        self.link()
+        col1, row1, col2, row2 = self.corners
+        return sum(self.sheet.lookup(col).count(criterion, row1, row2)
+                   for col in range(col1, col2 + 1))
+
+    def sum_if(self, criterion: Criterion,
+               sum_range: "CellRange") -> Union[decimal.Decimal, cell_error.CellError]:
+        """
+        Sum the numbers in another range of the same size at the offsets of the cells in
+        this range whose values satisfy a criterion, with the lookup indexes of its
+        columns.
+
+        Returns:
+            Union[Decimal, CellError]: the sum, or the highest priority error among the
+            cells that would be summed
+        """
+        self.link()
+        sum_range.link()
+        col1, row1, col2, row2 = self.corners
+        if sum_range.sheet is self.sheet and sum_range.corners == self.corners:
+            # the matching numbers are the keys the rows were found by
+            return sum((self.sheet.lookup(col).total(criterion, row1, row2)
+                        for col in range(col1, col2 + 1)), decimal.Decimal(0))
+        sum_col1, sum_row1 = sum_range.corners[:2]
+        total = decimal.Decimal(0)
+        error = None
+        for col in range(col1, col2 + 1):
+            sum_col = sum_col1 + col - col1
+            for row in self.sheet.lookup(col).matching_rows(criterion, row1, row2):
+                value = sum_range.__value_at(string_conversions.to_key(
+                    sum_col, sum_row1 + row - row1))
+                if isinstance(value, decimal.Decimal):
+                    total += value
+                elif isinstance(value, cell_error.CellError) and (error is None or value < error):
+                    error = value
+        return total if error is None else error
+
+    def values(self) -> Iterator[Any]:
+        """
+        Values of the cells in the range, row by row, as seen by a formula: empty cells
+        are represented by an UninitializedValue.
+        """
+        self.link()
+        col1, row1, col2, row2 = self.corners
+        for row in range(row1, row2 + 1):
+            for col in range(col1, col2 + 1):
+                yield self.__value_at(string_conversions.to_key(col, row))
+
+    def link(self) -> None:
+        """
+        Link the whole range to the formula reading it.
+        """
+        if self.reader is not None:
+            self.reader.link_range(self.sheet, self.corners)
+
+    def __value_at(self, key: int) -> Any:
+        c = self.sheet.cells.get(key)
+        if c is not None:
+            return _value_of(c.value)
+        columns = self.sheet.columns
+        if columns is not None and key in columns:
+            return cell.literal_value(columns.get(key))[0]
+        return unitialized_value.UninitializedValue()
+
+
+def _value_of(val: Any) -> Any:
+    if not val and not isinstance(val, bool):
+        return val if val in (decimal.Decimal(0), "") else unitialized_value.UninitializedValue()
+    return val
@@ -0,0 +1,120 @@
+"""Aggregates over the values of a column of cells, maintained as cell values change."""
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+from sheets.cell_error import CellError
+from sheets.range_index import segments
+
+ZERO = Decimal(0)
+INFINITY = Decimal("Infinity")
+NEGATIVE_INFINITY = Decimal("-Infinity")
+
+# (sum of the numbers, number of numbers, number of errors, minimum number, maximum number)
+# over a range of rows. The minimum and maximum are infinite if there are no numbers.
+Aggregate = Tuple[Decimal, int, int, Decimal, Decimal]
+
+EMPTY_AGGREGATE: Aggregate = (ZERO, 0, 0, INFINITY, NEGATIVE_INFINITY)
+
+
+class ColumnAggregate:
+    """
+    Segment tree over the rows of a column. Each node holds the sum, count, minimum and
+    maximum of the numbers and the count of the errors among the values of its rows,
+    so setting a value and aggregating a range of rows both take O(log R). Values that
+    are neither numbers nor errors, such as strings, booleans and empty cells, are left
+    out. The tree covers the rows it was built with and doubles in size when a value
+    is set past them.
+    """
+
+    __slots__ = ("size", "sums", "counts", "errors", "minimums", "maximums")
+
+    def __init__(self, values: Dict[int, Any]):
+        """
+        Args:
+            values (Dict[int, Any]): row -> value of the non-empty cells of the column
+        """
+        size = 1
+        while size <= max(values, default=0):
+            size <<= 1
+        self.__build(size)
+        for row, value in values.items():
+            self.__set_leaf(size + row, value)
+        for node in range(size - 1, 0, -1):
+            self.__combine(node)
+
+    def __build(self, size: int) -> None:
+        self.size = size
+        self.sums: List[Decimal] = [ZERO] * (2 * size)
+        self.counts: List[int] = [0] * (2 * size)
+        self.errors: List[int] = [0] * (2 * size)
+        self.minimums: List[Decimal] = [INFINITY] * (2 * size)
+        self.maximums: List[Decimal] = [NEGATIVE_INFINITY] * (2 * size)
+
+    def __set_leaf(self, node: int, value: Any) -> None:
+        if isinstance(value, Decimal):
+            self.sums[node] = self.minimums[node] = self.maximums[node] = value
+            self.counts[node] = 1
+            self.errors[node] = 0
+        else:
+            self.sums[node] = ZERO
+            self.counts[node] = 0
+            self.errors[node] = 1 if isinstance(value, CellError) else 0
+            self.minimums[node] = INFINITY
+            self.maximums[node] = NEGATIVE_INFINITY
+
+    def __combine(self, node: int) -> None:
+        left = 2 * node
+        right = left + 1
+        self.sums[node] = self.sums[left] + self.sums[right]
+        self.counts[node] = self.counts[left] + self.counts[right]
+        self.errors[node] = self.errors[left] + self.errors[right]
+        self.minimums[node] = min(self.minimums[left], self.minimums[right])
+        self.maximums[node] = max(self.maximums[left], self.maximums[right])
+
+    def __grow(self, row: int) -> None:
+        """
+        Rebuild the tree with room for the given row, keeping the values of its leaves.
+        """
+        old_size = self.size
+        old = (self.sums, self.counts, self.errors, self.minimums, self.maximums)
+        size = old_size
+        while size <= row:
+            size <<= 1
+        self.__build(size)
+        new = (self.sums, self.counts, self.errors, self.minimums, self.maximums)
+        for old_nodes, new_nodes in zip(old, new):
+            new_nodes[size:size + old_size] = old_nodes[old_size:]
+        for node in range(size - 1, 0, -1):
+            self.__combine(node)
+
+    def set(self, row: int, value: Any) -> None:
+        """
+        Update the value of a row, which is None if the cell is empty.
+        """
+        if row >= self.size:
+            if not isinstance(value, (Decimal, CellError)):
+                return
+            self.__grow(row)
+        node = self.size + row
+        self.__set_leaf(node, value)
+        node >>= 1
+        while node:
+            self.__combine(node)
+            node >>= 1
+
+    def query(self, low: int, high: int) -> Aggregate:
+        """
+        Aggregate the values of the rows [low, high].
+        """
+        high = min(high, self.size - 1)
+        if low > high:
+            return EMPTY_AGGREGATE
+        total, count, errors, minimum, maximum = EMPTY_AGGREGATE
+        for node in segments(low, high, self.size.bit_length() - 1):
+            total += self.sums[node]
+            count += self.counts[node]
+            errors += self.errors[node]
+            if self.minimums[node] < minimum:
+                minimum = self.minimums[node]
+            if self.maximums[node] > maximum:
+                maximum = self.maximums[node]
+        return total, count, errors, minimum, maximum
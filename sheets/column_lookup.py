@@ -0,0 +1,267 @@
+"""Indexes for finding the rows of a column by value, maintained as cell values change."""
+import bisect
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# (rank of the type, value) of a value that can be looked up. Numbers rank below strings
+# and strings below booleans, like in comparisons, and strings are compared ignoring case.
+LookupKey = Tuple[int, Any]
+
+# kinds of matches, as given to MATCH
+EXACT = 0
+AT_MOST = 1
+AT_LEAST = -1
+
+# (comparison operator, key) of a condition on values, as given to COUNTIF, where the
+# operator is one of "=", "<>", "<", "<=", ">" and ">="
+Criterion = Tuple[str, LookupKey]
+
+# past every row
+END_ROW = float("inf")
+
+
+def lookup_key(value: Any) -> Optional[LookupKey]:
+    """
+    Key that a value is looked up and ordered by, or None if the value can't be looked
+    up, such as an error or an empty cell.
+    """
+    if isinstance(value, bool):
+        return 2, value
+    if isinstance(value, Decimal):
+        return 0, value
+    if isinstance(value, str):
+        return 1, value.lower()
+    return None
+
+
+def nearest(keys: Iterable[Tuple[int, LookupKey]], key: LookupKey,
+            match_type: int) -> Optional[int]:
+    """
+    Find the position of a key among positions and keys by scanning all of them.
+
+    Args:
+        keys (Iterable[Tuple[int, LookupKey]]): positions in increasing order and the
+        keys at them
+        key (LookupKey): key to look for
+        match_type (int): EXACT for the first position with an equal key, AT_MOST for the
+        last position with the largest key of the same type that isn't greater, and
+        AT_LEAST for the first position with the smallest key of the same type that
+        isn't less
+
+    Returns:
+        Optional[int]: the position found, or None if no key matches
+    """
+    found = None
+    found_key = None
+    for position, other in keys:
+        if other[0] != key[0]:
+            continue
+        if match_type == EXACT:
+            if other == key:
+                return position
+        elif match_type == AT_MOST:
+            if other <= key and (found_key is None or other >= found_key):
+                found, found_key = position, other
+        elif other >= key and (found_key is None or other < found_key):
+            found, found_key = position, other
+    return found
+
+
+def matches(criterion: Criterion, key: LookupKey) -> bool:
+    """
+    Whether a key satisfies a criterion. Keys are only less or greater than keys of the
+    same type, but are unequal to keys of other types.
+    """
+    operator, other = criterion
+    if operator == "=":
+        return key == other
+    if operator == "<>":
+        return key != other
+    if key[0] != other[0]:
+        return False
+    if operator == "<":
+        return key < other
+    if operator == "<=":
+        return key <= other
+    if operator == ">":
+        return key > other
+    return key >= other
+
+
+def _count_between(rows: Sequence[int], low: int, high: int) -> int:
+    return bisect.bisect_right(rows, high) - bisect.bisect_left(rows, low)
+
+
+class ColumnLookup:
+    """
+    Hash index from the values of a column to the rows they are in, for exact matches,
+    and the rows of the column ordered by value, for approximate matches. Setting a value
+    updates both with binary searches instead of rebuilding them, and a lookup within a
+    range of rows is a binary search followed by a walk over the rows with the nearest
+    values, which ends at once unless those rows are outside of the range.
+
+    Approximate matches don't assume that the column is sorted: an AT_MOST match finds
+    the largest value that isn't greater than the one looked up, which is what a binary
+    search finds when the column is sorted in increasing order.
+
+    Rows are counted and listed by criterion in the same way, so that conditional
+    aggregates such as COUNTIF over a whole column take O(log R) for any criterion.
+    """
+
+    __slots__ = ("keys", "rows", "ordered", "all_rows")
+
+    def __init__(self, values: Dict[int, Any]):
+        """
+        Args:
+            values (Dict[int, Any]): row -> value of the non-empty cells of the column
+        """
+        # row -> key of its value
+        self.keys: Dict[int, LookupKey] = {}
+        # key -> rows with that key, in increasing order
+        self.rows: Dict[LookupKey, List[int]] = {}
+        # (key, row) for every row with a key, in increasing order
+        self.ordered: List[Tuple[LookupKey, int]] = []
+        for row in sorted(values):
+            key = lookup_key(values[row])
+            if key is not None:
+                self.keys[row] = key
+                self.rows.setdefault(key, []).append(row)
+                self.ordered.append((key, row))
+        self.ordered.sort()
+        # rows with a key, in increasing order
+        self.all_rows: List[int] = list(self.keys)
+
+    def set(self, row: int, value: Any) -> None:
+        """
+        Update the value of a row, which is None if the cell is empty.
+        """
+        old = self.keys.pop(row, None)
+        if old is not None:
+            rows = self.rows[old]
+            del rows[bisect.bisect_left(rows, row)]
+            if not rows:
+                del self.rows[old]
+            del self.ordered[bisect.bisect_left(self.ordered, (old, row))]
+        key = lookup_key(value)
+        if key is not None:
+            self.keys[row] = key
+            bisect.insort(self.rows.setdefault(key, []), row)
+            bisect.insort(self.ordered, (key, row))
+        if old is None and key is not None:
+            bisect.insort(self.all_rows, row)
+        elif old is not None and key is None:
+            del self.all_rows[bisect.bisect_left(self.all_rows, row)]
+
+    def find(self, value: Any, low: int, high: int, match_type: int) -> Optional[int]:
+        """
+        Find a row within [low, high] by its value, as nearest() would.
+
+        Args:
+            value (Any): value to look for
+            low (int): first row to look in
+            high (int): last row to look in
+            match_type (int): EXACT, AT_MOST or AT_LEAST
+
+        Returns:
+            Optional[int]: the row found, or None if no value matches
+        """
+        key = lookup_key(value)
+        if key is None:
+            return None
+        if match_type == EXACT:
+            rows = self.rows.get(key)
+            if rows is None:
+                return None
+            i = bisect.bisect_left(rows, low)
+            return rows[i] if i < len(rows) and rows[i] <= high else None
+        # walk away from the value looked up until a row within the range is found, for
+        # at most as many steps as there are rows in the range
+        if match_type == AT_MOST:
+            i = bisect.bisect_right(self.ordered, (key, high))
+            steps = range(i - 1, max(i - 1 - (high - low + 1), -1), -1)
+        else:
+            i = bisect.bisect_left(self.ordered, (key, low))
+            steps = range(i, min(i + high - low + 1, len(self.ordered)))
+        for i in steps:
+            other, row = self.ordered[i]
+            if other[0] != key[0]:
+                return None
+            if low <= row <= high:
+                return row
+        if len(steps) <= high - low:
+            return None
+        return nearest(((row, self.keys[row]) for row in range(low, high + 1)
+                        if row in self.keys), key, match_type)
+
+    def count(self, criterion: Criterion, low: int, high: int) -> int:
+        """
+        Count the rows within [low, high] whose values satisfy a criterion. Empty rows
+        never do.
+        """
+        operator, key = criterion
+        if operator == "=":
+            return _count_between(self.rows.get(key, ()), low, high)
+        in_range = _count_between(self.all_rows, low, high)
+        if operator == "<>":
+            return in_range - _count_between(self.rows.get(key, ()), low, high)
+        start, stop = self.__bounds(criterion)
+        if in_range == len(self.all_rows):
+            return stop - start
+        return sum(1 for _ in self.__rows_between(criterion, start, stop, low, high))
+
+    def matching_rows(self, criterion: Criterion, low: int, high: int) -> Iterator[int]:
+        """
+        Rows within [low, high] whose values satisfy a criterion, in no particular order.
+        """
+        operator, key = criterion
+        if operator == "=":
+            rows = self.rows.get(key, [])
+            return iter(rows[bisect.bisect_left(rows, low):bisect.bisect_right(rows, high)])
+        if operator == "<>":
+            rows = self.all_rows
+            return (row for row in
+                    rows[bisect.bisect_left(rows, low):bisect.bisect_right(rows, high)]
+                    if self.keys[row] != key)
+        start, stop = self.__bounds(criterion)
+        return self.__rows_between(criterion, start, stop, low, high)
+
+    def total(self, criterion: Criterion, low: int, high: int) -> Decimal:
+        """
+        Sum the numbers in the rows within [low, high] whose values satisfy a criterion,
+        from their keys.
+        """
+        operator, key = criterion
+        if operator == "=":
+            return key[1] * self.count(criterion, low, high) if key[0] == 0 else Decimal(0)
+        return sum((self.keys[row][1] for row in self.matching_rows(criterion, low, high)
+                    if self.keys[row][0] == 0), Decimal(0))
+
+    def __bounds(self, criterion: Criterion) -> Tuple[int, int]:
+        """
+        Slice of the ordered rows whose values satisfy an ordering criterion.
+        """
+        operator, key = criterion
+        # (rank,) sorts before every key of that rank
+        if operator in ("<", "<="):
+            start = bisect.bisect_left(self.ordered, ((key[0],),))
+            stop = bisect.bisect_left(self.ordered, (key, -1)) if operator == "<" \
+                else bisect.bisect_right(self.ordered, (key, END_ROW))
+        else:
+            start = bisect.bisect_right(self.ordered, (key, END_ROW)) if operator == ">" \
+                else bisect.bisect_left(self.ordered, (key, -1))
+            stop = bisect.bisect_left(self.ordered, ((key[0] + 1,),))
+        return start, stop
+
+    def __rows_between(self, criterion: Criterion, start: int, stop: int, low: int,
+                       high: int) -> Iterator[int]:
+        """
+        Rows within [low, high] among the ordered rows [start, stop), which satisfy the
+        criterion, visiting either those ordered rows or the rows within [low, high],
+        whichever are fewer.
+        """
+        rows = self.all_rows
+        first = bisect.bisect_left(rows, low)
+        last = bisect.bisect_right(rows, high)
+        if stop - start <= last - first:
+            return (row for _, row in self.ordered[start:stop] if low <= row <= high)
+        return (row for row in rows[first:last] if matches(criterion, self.keys[row]))
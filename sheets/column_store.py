@@ -0,0 +1,204 @@
+"""Columnar storage for the literal contents of cells that don't need a Cell object."""
+from array import array
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterator, List, Optional, Tuple
+from sheets import string_conversions
+
+# type tags of the locations in a column
+EMPTY = 0
+NUMBER = 1
+TEXT = 2
+
+# range of the coefficients and exponents that numbers are stored with
+MAX_COEFFICIENT = (1 << 63) - 1
+MAX_EXPONENT = 127
+
+
+def encode_number(contents: str) -> Optional[Tuple[int, int]]:
+    """
+    Encode number contents as an integer coefficient and decimal exponent, if the
+    contents can be written back exactly from them (e.g. "-12.50" but not "007" or ".5").
+
+    Args:
+        contents (str): stripped literal contents of a cell
+
+    Returns:
+        Optional[Tuple[int, int]]: coefficient and exponent, or None if the contents
+        have to be stored as text
+    """
+    if not string_conversions.is_number(contents):
+        return None
+    try:
+        sign, digits, exponent = Decimal(contents).as_tuple()
+    except InvalidOperation:
+        return None
+    coefficient = int("".join(map(str, digits)))
+    if sign:
+        coefficient = -coefficient
+    if abs(coefficient) > MAX_COEFFICIENT or abs(exponent) > MAX_EXPONENT \
+            or decode_number(coefficient, exponent) != contents:
+        return None
+    return coefficient, exponent
+
+
+def decode_number(coefficient: int, exponent: int) -> str:
+    """
+    Contents of a number stored by encode_number().
+    """
+    if exponent == 0:
+        return str(coefficient)
+    return str(Decimal(coefficient).scaleb(exponent))
+
+
+class Column:
+    """
+    Literal contents of the locations in one column of a sheet. Each row has a type tag,
+    numbers are kept in typed arrays indexed by row, and other contents by row in a dict.
+    """
+
+    __slots__ = ("tags", "coefficients", "exponents", "text", "count")
+
+    def __init__(self):
+        self.tags = bytearray()
+        self.coefficients = array("q")
+        self.exponents = array("b")
+        self.text: Dict[int, str] = {}
+        # number of non-empty rows
+        self.count = 0
+
+    def get(self, row: int) -> Optional[str]:
+        """
+        Contents of the given row, or None if it is empty.
+        """
+        if row >= len(self.tags):
+            return None
+        tag = self.tags[row]
+        if tag == NUMBER:
+            return decode_number(self.coefficients[row], self.exponents[row])
+        if tag == TEXT:
+            return self.text[row]
+        return None
+
+    def set(self, row: int, contents: str) -> None:
+        """
+        Store the contents of the given row.
+        """
+        if row >= len(self.tags):
+            grow = row + 1 - len(self.tags)
+            self.tags.extend(bytes(grow))
+            self.coefficients.frombytes(bytes(grow * self.coefficients.itemsize))
+            self.exponents.frombytes(bytes(grow))
+        tag = self.tags[row]
+        if tag == EMPTY:
+            self.count += 1
+        elif tag == TEXT:
+            del self.text[row]
+        number = encode_number(contents)
+        if number:
+            self.tags[row] = NUMBER
+            self.coefficients[row], self.exponents[row] = number
+        else:
+            self.tags[row] = TEXT
+            self.text[row] = contents
+
+    def remove(self, row: int) -> None:
+        """
+        Empty the given row, which must have contents.
+        """
+        if self.tags[row] == TEXT:
+            del self.text[row]
+        self.tags[row] = EMPTY
+        self.count -= 1
+
+    def rows(self) -> Iterator[int]:
+        """
+        Non-empty rows of the column in increasing order.
+        """
+        if not self.count:
+            return iter(())
+        return (row for row, tag in enumerate(self.tags) if tag != EMPTY)
+
+
+class ColumnStore:
+    """
+    Literal contents of cells in a sheet, keyed like Sheet.cells by
+    string_conversions.to_key() but stored column by column.
+    """
+
+    def __init__(self):
+        # {column number: Column}
+        self.columns: Dict[int, Column] = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, key: int) -> bool:
+        column = self.columns.get(key >> string_conversions.ROW_BITS)
+        return column is not None and column.get(key & string_conversions.ROW_MASK) is not None
+
+    def get(self, key: int) -> Optional[str]:
+        """
+        Contents stored at the location given by key, or None if there aren't any.
+        """
+        column = self.columns.get(key >> string_conversions.ROW_BITS)
+        if column is None:
+            return None
+        return column.get(key & string_conversions.ROW_MASK)
+
+    def set(self, key: int, contents: str) -> None:
+        """
+        Store the literal contents of the location given by key.
+        """
+        col = key >> string_conversions.ROW_BITS
+        column = self.columns.get(col)
+        if column is None:
+            column = self.columns[col] = Column()
+        count = column.count
+        column.set(key & string_conversions.ROW_MASK, contents)
+        self.size += column.count - count
+
+    def pop(self, key: int) -> Optional[str]:
+        """
+        Remove the contents stored at the location given by key and return them.
+        """
+        contents = self.get(key)
+        if contents is not None:
+            col = key >> string_conversions.ROW_BITS
+            column = self.columns[col]
+            column.remove(key & string_conversions.ROW_MASK)
+            self.size -= 1
+            if not column.count:
+                del self.columns[col]
+        return contents
+
+    def keys(self) -> Iterator[int]:
+        """
+        Keys of the stored locations, column by column.
+        """
+        for col in sorted(self.columns):
+            for row in self.columns[col].rows():
+                yield string_conversions.to_key(col, row)
+
+    def keys_in(self, top_left_col: int, top_left_row: int, bottom_right_col: int,
+                bottom_right_row: int) -> List[int]:
+        """
+        Keys of the stored locations within a rectangular region.
+        """
+        keys = []
+        for col in range(top_left_col, bottom_right_col + 1):
+            column = self.columns.get(col)
+            if column is None:
+                continue
+            tags = column.tags
+            for row in range(top_left_row, min(bottom_right_row + 1, len(tags))):
+                if tags[row] != EMPTY:
+                    keys.append(string_conversions.to_key(col, row))
+        return keys
+
+    def items(self) -> Iterator[Tuple[int, str]]:
+        """
+        Keys and contents of the stored locations, column by column.
+        """
+        for key in self.keys():
+            yield key, self.get(key)
@@ -0,0 +1,367 @@
+"""Graph of dependencies between Cells, stored with dense integer node ids."""
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from sheets import string_conversions
+from sheets.cell import Cell
+from sheets.range_index import Corners, RangeIndex, RangeNode
+from sheets.tarjan import strongly_connected_components
+
+
+class DependencyGraph:
+    """
+    Directed graph whose edges point from a cell to the cells that depend on it.
+
+    Every cell in the graph is assigned a dense integer id, which is stored on the
+    cell itself. Dependents and precedents are kept as sets of ids so membership
+    tests, insertions and removals are constant time regardless of fan-out. Ids of
+    removed cells are recycled so the id space stays dense.
+
+    The graph also tracks a topological level for every cell, such that a cell's
+    level is greater than the level of each of its precedents outside of its own
+    strongly connected component, and the set of cells that are part of a cycle.
+    Levels let recalculation visit dirty cells in topological order without
+    sorting the whole reachable subgraph.
+
+    A formula that chooses what to read by value, such as with IF or INDIRECT, records
+    which of its precedents only those reads linked. When it is evaluated again because
+    a value changed, only those edges can change, so they are the only ones rewired.
+
+    Ranges of cells read by formulas are RangeNodes in the graph, with an edge to each
+    formula reading them. Only cells within a range that have precedents of their own
+    have an edge into it; the ranges containing any other cell are looked up in a
+    RangeIndex, so a range costs the same no matter how many cells it spans.
+    """
+
+    def __init__(self):
+        # id -> Cell; None for ids that are free to be reused
+        self.nodes: List[Optional[Cell]] = []
+        # id -> {ids of cells that depend on this cell}
+        self.dependents: List[Set[int]] = []
+        # id -> {ids of cells that this cell reads}
+        self.precedents: List[Set[int]] = []
+        # ids that have been released by remove_cell()
+        self.free_ids: List[int] = []
+        # id -> topological level
+        self.levels: List[int] = []
+        # ids of cells that are part of a cycle
+        self.cyclic: Set[int] = set()
+        # id -> {ids of precedents that were only read by value}, for cells with any
+        self.dynamic: Dict[int, Set[int]] = {}
+        # node ids of the ranges in the graph by the locations they contain
+        self.ranges = RangeIndex()
+        # (Sheet, corners) -> RangeNode
+        self.range_nodes: Dict[Tuple[object, Corners], RangeNode] = {}
+
+    def __contains__(self, c: Union[Cell, RangeNode]) -> bool:
+        node_id = c.node_id
+        return node_id is not None and node_id < len(self.nodes) \
+            and self.nodes[node_id] is c
+
+    def __iter__(self) -> Iterator[Cell]:
+        return (c for c in self.nodes if c is not None)
+
+    def __len__(self) -> int:
+        return len(self.nodes) - len(self.free_ids)
+
+    def add_cell(self, c: Cell) -> int:
+        """
+        Add a cell to the graph if it isn't already in it.
+
+        Args:
+            c (Cell): cell to add
+
+        Returns:
+            int: id of the cell within the graph
+        """
+        if c in self:
+            return c.node_id
+        if self.free_ids:
+            node_id = self.free_ids.pop()
+            self.nodes[node_id] = c
+            self.levels[node_id] = 0
+        else:
+            node_id = len(self.nodes)
+            self.nodes.append(c)
+            self.dependents.append(set())
+            self.precedents.append(set())
+            self.levels.append(0)
+        c.node_id = node_id
+        return node_id
+
+    def remove_cell(self, c: Cell) -> None:
+        """
+        Remove a cell from the graph along with every edge into or out of it.
+
+        Args:
+            c (Cell): cell to remove
+        """
+        if c not in self:
+            return
+        node_id = c.node_id
+        for precedent in self.precedents[node_id]:
+            self.dependents[precedent].discard(node_id)
+        self.__release_ranges(self.precedents[node_id])
+        for dependent in self.dependents[node_id]:
+            self.precedents[dependent].discard(node_id)
+            self.__discard_dynamic(dependent, (node_id,))
+        self.dynamic.pop(node_id, None)
+        self.dependents[node_id] = set()
+        self.precedents[node_id] = set()
+        self.nodes[node_id] = None
+        self.cyclic.discard(node_id)
+        self.free_ids.append(node_id)
+        c.node_id = None
+
+    def add_edge(self, precedent: Cell, dependent: Cell) -> None:
+        """
+        Record that dependent reads the value of precedent. Both cells are added to
+        the graph if necessary.
+        """
+        precedent_id = self.add_cell(precedent)
+        dependent_id = self.add_cell(dependent)
+        self.dependents[precedent_id].add(dependent_id)
+        self.precedents[dependent_id].add(precedent_id)
+
+    def unlink_precedents(self, c: Cell, relies_on: Iterable[Cell]) -> None:
+        """
+        Remove every edge into c from a cell that c no longer relies on. Only the
+        cell's own precedents are visited.
+
+        Args:
+            c (Cell): Cell whose references may have changed
+            relies_on (Iterable[Cell]): cells that c currently relies on
+        """
+        if c not in self:
+            return
+        node_id = c.node_id
+        precedents = self.precedents[node_id]
+        stale = precedents.difference([p.node_id for p in relies_on])
+        for precedent in stale:
+            self.dependents[precedent].discard(node_id)
+        precedents.difference_update(stale)
+        self.__discard_dynamic(node_id, stale)
+        self.__release_ranges(stale)
+
+    def link_precedents(self, c: Cell, relies_on: Sequence[Cell],
+                        dynamic: Sequence[Cell]) -> bool:
+        """
+        Replace the edges into c with edges from the cells it read when it was evaluated,
+        after its contents changed.
+
+        Args:
+            c (Cell): cell that was evaluated
+            relies_on (Iterable[Cell]): cells and ranges c reads whatever the values are
+            dynamic (Iterable[Cell]): cells and ranges c read because of the values it
+            read, such as the branch taken by IF or the target of INDIRECT
+
+        Returns:
+            bool: whether the precedents of c changed
+        """
+        if c not in self and not relies_on and not dynamic:
+            return False
+        node_id = self.add_cell(c)
+        static_ids = {self.add_cell(p) for p in relies_on}
+        dynamic_ids = {self.add_cell(p) for p in dynamic}.difference(static_ids)
+        precedents = self.precedents[node_id]
+        current = static_ids | dynamic_ids
+        added = current - precedents
+        stale = precedents - current
+        self.__rewire(node_id, added, stale)
+        if dynamic_ids:
+            self.dynamic[node_id] = dynamic_ids
+        else:
+            self.dynamic.pop(node_id, None)
+        return bool(added or stale)
+
+    def relink_dynamic(self, c: Cell, dynamic: Iterable[Cell]) -> bool:
+        """
+        Rewire only the edges into c that reads by value linked, after c was evaluated
+        again with the same contents. The precedents it reads whatever the values are
+        are still linked and aren't visited.
+
+        Args:
+            c (Cell): cell that was evaluated
+            dynamic (Iterable[Cell]): cells and ranges c read because of the values it
+            read
+
+        Returns:
+            bool: whether the precedents of c changed
+        """
+        node_id = c.node_id
+        precedents = self.precedents[node_id]
+        old = self.dynamic.get(node_id, set())
+        # a cell that is already a precedent without being a dynamic one is read anyway
+        current = {p for p in (self.add_cell(p) for p in dynamic)
+                   if p in old or p not in precedents}
+        added = current - old
+        stale = old - current
+        if not added and not stale:
+            return False
+        self.__rewire(node_id, added, stale)
+        if current:
+            self.dynamic[node_id] = current
+        else:
+            del self.dynamic[node_id]
+        return True
+
+    def __rewire(self, node_id: int, added: Set[int], stale: Set[int]) -> None:
+        """
+        Add the edges from the given added ids into a node and remove those from the
+        given stale ids.
+        """
+        precedents = self.precedents[node_id]
+        for precedent in added:
+            self.dependents[precedent].add(node_id)
+        precedents.update(added)
+        for precedent in stale:
+            self.dependents[precedent].discard(node_id)
+        precedents.difference_update(stale)
+        self.__release_ranges(stale)
+
+    def __discard_dynamic(self, node_id: int, ids: Iterable[int]) -> None:
+        """
+        Forget that the given ids are dynamic precedents of a node once their edges are
+        gone, since ids are reused.
+        """
+        dynamic = self.dynamic.get(node_id)
+        if dynamic is not None:
+            dynamic.difference_update(ids)
+            if not dynamic:
+                del self.dynamic[node_id]
+
+    def range_node(self, sheet, corners: Corners) -> RangeNode:
+        """
+        Get the node of a range of cells, adding it to the graph and linking the cells
+        within it that have precedents if it isn't in the graph yet.
+
+        Args:
+            sheet (Sheet): sheet the range is on
+            corners (Corners): normalized corners of the range
+
+        Returns:
+            RangeNode: node of the range
+        """
+        node = self.range_nodes.get((sheet, corners))
+        if node is not None:
+            return node
+        node = self.range_nodes[(sheet, corners)] = RangeNode(sheet, corners)
+        node_id = self.add_cell(node)
+        self.ranges.add(sheet, corners, node_id)
+        col1, row1, col2, row2 = corners
+        if (col2 - col1 + 1) * (row2 - row1 + 1) < len(sheet.cells):
+            cells = (sheet.cells.get(string_conversions.to_key(col, row))
+                     for col in range(col1, col2 + 1) for row in range(row1, row2 + 1))
+        else:
+            cells = (c for key, c in sheet.cells.items()
+                     if col1 <= key >> string_conversions.ROW_BITS <= col2
+                     and row1 <= key & string_conversions.ROW_MASK <= row2)
+        for c in cells:
+            if c is not None and c in self and self.precedents[c.node_id]:
+                self.dependents[c.node_id].add(node_id)
+                self.precedents[node_id].add(c.node_id)
+                self.levels[node_id] = max(self.levels[node_id], self.levels[c.node_id] + 1)
+        return node
+
+    def ranges_containing(self, node_id: int) -> List[int]:
+        """
+        Node ids of the ranges that contain the cell with the given id.
+        """
+        c = self.nodes[node_id]
+        if not self.ranges or c.key is None:
+            return []
+        return self.ranges.query(c.sheet, c.key)
+
+    def ranges_on(self, sheet) -> List[RangeNode]:
+        """Ranges of cells on the given sheet."""
+        return [node for (range_sheet, _), node in self.range_nodes.items()
+                if range_sheet is sheet]
+
+    def link_ranges(self, c: Cell) -> List[int]:
+        """
+        Update the edges from a cell to the ranges containing it after its precedents
+        changed. The cell has an edge into each of those ranges while it has precedents.
+
+        Args:
+            c (Cell): cell whose precedents changed
+
+        Returns:
+            List[int]: ids of the ranges containing the cell, whose precedents may have
+            changed as well
+        """
+        if c not in self:
+            return []
+        node_id = c.node_id
+        linked = bool(self.precedents[node_id])
+        range_ids = self.ranges_containing(node_id)
+        for range_id in range_ids:
+            if linked:
+                self.dependents[node_id].add(range_id)
+                self.precedents[range_id].add(node_id)
+            else:
+                self.dependents[node_id].discard(range_id)
+                self.precedents[range_id].discard(node_id)
+        return range_ids
+
+    def __release_ranges(self, ids: Iterable[int]) -> None:
+        """
+        Remove the ranges among the given ids that no formula reads anymore.
+        """
+        for node_id in list(ids):
+            node = self.nodes[node_id]
+            if isinstance(node, RangeNode) and not self.dependents[node_id]:
+                self.ranges.remove(node.sheet, node.corners, node_id)
+                del self.range_nodes[(node.sheet, node.corners)]
+                self.remove_cell(node)
+
+    def has_dependents(self, c: Cell) -> bool:
+        return c in self and bool(self.dependents[c.node_id])
+
+    def dependents_of(self, c: Cell) -> List[Cell]:
+        """Cells that read the value of c."""
+        if c not in self:
+            return []
+        return [self.nodes[i] for i in self.dependents[c.node_id]]
+
+    def precedents_of(self, c: Cell) -> List[Cell]:
+        """Cells whose values c reads."""
+        if c not in self:
+            return []
+        return [self.nodes[i] for i in self.precedents[c.node_id]]
+
+    def cells_of(self, ids: Iterable[int]) -> List[Cell]:
+        """Map node ids back to their cells."""
+        return [self.nodes[i] for i in ids]
+
+    def relevel(self, roots: Iterable[int]) -> Tuple[List[int], List[int]]:
+        """
+        Recompute the levels and cycle membership of every cell reachable from the
+        given roots. This only needs to be called when the precedents of a root change;
+        cells that aren't reachable from a root keep valid levels.
+
+        Args:
+            roots (Iterable[int]): ids of cells whose precedents changed
+
+        Returns:
+            Tuple[List[int], List[int]]: ids of cells that became part of a cycle, and ids
+            of cells that were part of a cycle but no longer are.
+        """
+        components = strongly_connected_components(roots, self.dependents)
+        newly_cyclic = []
+        no_longer_cyclic = []
+        # strongly_connected_components returns components in reverse topological order
+        for scc in reversed(components):
+            members = set(scc)
+            level = 0
+            for v in scc:
+                for p in self.precedents[v]:
+                    if p not in members and self.levels[p] >= level:
+                        level = self.levels[p] + 1
+            in_cycle = len(scc) > 1
+            for v in scc:
+                self.levels[v] = level
+                if in_cycle and v not in self.cyclic:
+                    self.cyclic.add(v)
+                    newly_cyclic.append(v)
+                elif not in_cycle and v in self.cyclic:
+                    self.cyclic.remove(v)
+                    no_longer_cyclic.append(v)
+        return newly_cyclic, no_longer_cyclic
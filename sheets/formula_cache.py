@@ -0,0 +1,75 @@
+"""Bounded cache of compiled formulas."""
+from collections import OrderedDict
+from typing import Optional
+from sheets.lark_module import CompiledFormula, compile_formula
+from sheets.formula_template import DEFAULT_ANCHOR, RelativeForm, relative_form
+
+DEFAULT_FORMULA_CACHE_SIZE = 10000
+
+
+class FormulaCache:
+    """
+    Least recently used cache mapping formulas to their compiled form. Formulas are
+    keyed by their relative form, so a formula filled down a column or copied between
+    cells is compiled once and shared by all of them.
+
+    Formulas that fail to parse are cached as well (as None), so invalid input isn't
+    parsed again every time it is evaluated. Once the cache holds maxsize formulas, the
+    least recently used formula is evicted. A maxsize of None never evicts, and a
+    maxsize of 0 disables caching. Hits, misses and evictions are counted so the size
+    can be tuned.
+    """
+
+    def __init__(self, maxsize: Optional[int] = DEFAULT_FORMULA_CACHE_SIZE):
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("Formula cache size must be non-negative")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # relative form -> compiled formula, or None if the formula doesn't parse
+        self.__entries: OrderedDict[RelativeForm, Optional[CompiledFormula]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, contents: str) -> bool:
+        return relative_form(contents) in self.__entries
+
+    def __deepcopy__(self, memo):
+        # compiled formulas don't depend on a workbook, so a copy starts out empty
+        # rather than paying to copy every entry
+        return FormulaCache(self.maxsize)
+
+    def get(self, contents: str, anchor: int = DEFAULT_ANCHOR) -> Optional[CompiledFormula]:
+        """
+        Get the compiled form of a formula, compiling it if it isn't cached.
+
+        Args:
+            contents (str): formula starting with "="
+            anchor (int): key of the location of the formula, which the references of the
+            compiled formula are resolved relative to
+
+        Returns:
+            Optional[CompiledFormula]: function evaluating the formula, or None if the
+            formula doesn't parse
+        """
+        key = relative_form(contents, anchor)
+        try:
+            formula = self.__entries[key]
+        except KeyError:
+            self.misses += 1
+            formula = compile_formula(contents, anchor)
+            if self.maxsize != 0:
+                self.__entries[key] = formula
+                if self.maxsize is not None and len(self.__entries) > self.maxsize:
+                    self.__entries.popitem(last=False)
+                    self.evictions += 1
+            return formula
+        self.hits += 1
+        self.__entries.move_to_end(key)
+        return formula
+
+    def clear(self) -> None:
+        """Remove every cached formula. The hit, miss and eviction counts are kept."""
+        self.__entries.clear()
@@ -0,0 +1,119 @@
+"""Relative (R1C1) form of formulas, in which a cell reference is an offset from the cell
+containing the formula, so that formulas filled or copied from one another are the same."""
+import re
+from typing import Optional, Tuple
+from sheets import string_conversions
+
+# (column, row, whether the column is absolute, whether the row is absolute) of a cell
+# reference, where a column or row that isn't absolute is an offset from the location of
+# the formula
+Reference = Tuple[int, int, bool, bool]
+
+# (text between the cell references, cell references) of a formula. Formulas in the same
+# relative form only differ in where they are, so they compile to the same template.
+RelativeForm = Tuple[Tuple[str, ...], Tuple[Reference, ...]]
+
+# key of A1, which formulas that aren't in a cell are relative to
+DEFAULT_ANCHOR = string_conversions.to_key(1, 1)
+
+# Tokens of a formula that can contain a cell reference, like the terminals of
+# formulas.lark: strings and quoted sheet names are skipped whole, names followed by "!"
+# or "(" are sheet or function names, and anything else that looks like a CELLREF is one.
+_TOKENS = re.compile(r'"[^"]*"|\'[^\']*\'|[A-Za-z_][A-Za-z0-9_]*(?=\s*(?:!(?!=)|\())'
+                     r'|(\$?[A-Za-z]+\$?[1-9][0-9]*)')
+_CELLREF = re.compile(r'([A-Za-z]+)(\$?)([0-9]+)')
+
+
+def to_reference(cellref: str, anchor: int) -> Reference:
+    """
+    Convert a CELLREF such as B2 or $B$2 in the formula at the anchor to a reference.
+    """
+    col_absolute = cellref[0] == "$"
+    letters, row_absolute, digits = _CELLREF.match(cellref, col_absolute).groups()
+    col = string_conversions.col_to_num(letters.upper())
+    row = int(digits)
+    if not col_absolute:
+        col -= anchor >> string_conversions.ROW_BITS
+    if not row_absolute:
+        row -= anchor & string_conversions.ROW_MASK
+    return col, row, col_absolute, bool(row_absolute)
+
+
+def relative_form(contents: str, anchor: int = DEFAULT_ANCHOR) -> RelativeForm:
+    """
+    Get the relative form of a formula in the cell at a location.
+
+    Args:
+        contents (str): formula starting with "="
+        anchor (int): key of the location of the formula
+
+    Returns:
+        RelativeForm: the text between the formula's cell references and the references
+        relative to the anchor
+    """
+    segments = []
+    references = []
+    start = 0
+    for match in _TOKENS.finditer(contents):
+        cellref = match.group(1)
+        if cellref is None:
+            continue
+        segments.append(contents[start:match.start()])
+        references.append(to_reference(cellref, anchor))
+        start = match.end()
+    segments.append(contents[start:])
+    return tuple(segments), tuple(references)
+
+
+def resolve(reference: Reference, anchor: int) -> Optional[int]:
+    """
+    Key of the location a reference points to from a formula at the anchor, or None if
+    the location is outside of the sheet.
+    """
+    col, row, col_absolute, row_absolute = reference
+    if not col_absolute:
+        col += anchor >> string_conversions.ROW_BITS
+    if not row_absolute:
+        row += anchor & string_conversions.ROW_MASK
+    if not 1 <= col <= string_conversions.MAX_COL or not 1 <= row <= string_conversions.MAX_ROW:
+        return None
+    return string_conversions.to_key(col, row)
+
+
+def to_cellref(reference: Reference, anchor: int) -> Optional[str]:
+    """
+    CELLREF of a reference in the formula at the anchor, keeping the "$" of its absolute
+    parts, or None if the location it points to is outside of the sheet.
+    """
+    key = resolve(reference, anchor)
+    if key is None:
+        return None
+    col, row = string_conversions.key_to_tuple(key)
+    return ("$" if reference[2] else "") + string_conversions.num_to_col(col) + \
+        ("$" if reference[3] else "") + str(row)
+
+
+def render(form: RelativeForm, anchor: int) -> Tuple[str, bool]:
+    """
+    Write out a formula in relative form in the cell at a location, as when it is copied
+    there. References that would point outside of the sheet become #REF! errors.
+
+    Args:
+        form (RelativeForm): relative form of the formula
+        anchor (int): key of the location to write the formula in
+
+    Returns:
+        Tuple[str, bool]: the formula, and whether every reference stayed on the sheet,
+        in which case the formula has the same relative form
+    """
+    segments, references = form
+    parts = [segments[0]]
+    on_sheet = True
+    for reference, segment in zip(references, segments[1:]):
+        cellref = to_cellref(reference, anchor)
+        if cellref is None:
+            cellref = "#REF!"
+            on_sheet = False
+        parts.append(cellref)
+        parts.append(segment)
+    return "".join(parts), on_sheet
@@ -1,9 +1,12 @@
 """
 Implementation of simple Function object and FunctionDirectory for the Workbook class. 
 """
-from typing import List, Dict, Callable, Any
+from typing import List, Dict, Callable, Any, Union
 from decimal import Decimal
 from sheets import cell_error, string_conversions, unitialized_value, version
+from sheets.cell_range import CellRange
+from sheets.column_aggregate import Aggregate, EMPTY_AGGREGATE
+from sheets.column_lookup import Criterion, EXACT, AT_MOST, AT_LEAST, lookup_key
 
 
 class Function:
@@ -39,9 +42,25 @@ class FunctionDirectory:
             "INDIRECT": self.indirect,
             "IF": self.if_func,
             "IFERROR": self.if_error,
-            "CHOOSE": self.choose
+            "CHOOSE": self.choose,
+            "SUM": self.sum_func,
+            "AVERAGE": self.average_func,
+            "MIN": self.min_func,
+            "MAX": self.max_func,
+            "COUNT": self.count_func,
+            "VLOOKUP": self.vlookup,
+            "MATCH": self.match,
+            "XLOOKUP": self.xlookup,
+            "COUNTIF": self.countif,
+            "SUMIF": self.sumif
         }
         self.lazy_functions = set(["IF", "IFERROR", "CHOOSE"])
+        # functions that can be given a range of cells, as a CellRange
+        self.range_functions = set(["SUM", "AVERAGE", "MIN", "MAX", "COUNT", "VLOOKUP", "MATCH",
+                                    "XLOOKUP", "COUNTIF", "SUMIF"])
+        # functions that choose which cells of their ranges to read by value, so like
+        # INDIRECT the cells a call depends on can change with values
+        self.lookup_functions = set(["VLOOKUP", "MATCH", "XLOOKUP"])
 
     def get_function_keys(self):
         return self.directory.keys()
@@ -143,8 +162,9 @@ class FunctionDirectory:
         if isinstance(args[0], cell_error.CellError):
             if args[0].get_type() == cell_error.CellErrorType.CIRCULAR_REFERENCE:
                 if args[0].circref_type:
-                    args[0].circref_type = False
-                    return args[0]
+                    # the error may be shared, so it is reported as a new error
+                    return cell_error.CellError(
+                        cell_error.CellErrorType.CIRCULAR_REFERENCE, "circular reference")
                 if args[0].circref_type is False or args[0].circref_type is None:
                     return True
             return True
@@ -167,3 +187,265 @@ class FunctionDirectory:
 
     def choose(self, args: List):
         return args[0]
+
+    def sum_func(self, args: List):
+        aggregate = _aggregate(args)
+        if isinstance(aggregate, cell_error.CellError):
+            return aggregate
+        return aggregate[0]
+
+    def average_func(self, args: List):
+        aggregate = _aggregate(args)
+        if isinstance(aggregate, cell_error.CellError):
+            return aggregate
+        total, count = aggregate[:2]
+        if count == 0:
+            return cell_error.CellError(
+                cell_error.CellErrorType.DIVIDE_BY_ZERO, "No numbers to average")
+        return total / count
+
+    def min_func(self, args: List):
+        aggregate = _aggregate(args)
+        if isinstance(aggregate, cell_error.CellError):
+            return aggregate
+        return aggregate[3] if aggregate[1] else Decimal(0)
+
+    def max_func(self, args: List):
+        aggregate = _aggregate(args)
+        if isinstance(aggregate, cell_error.CellError):
+            return aggregate
+        return aggregate[4] if aggregate[1] else Decimal(0)
+
+    def count_func(self, args: List):
+        aggregate = _aggregate(args, True)
+        if isinstance(aggregate, cell_error.CellError):
+            return aggregate
+        return Decimal(aggregate[1])
+
+    def vlookup(self, args: List):
+        # VLOOKUP(value, range, column index, [approximate match = TRUE])
+        if len(args) not in [3, 4]:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
+        value, table = args[:2]
+        if isinstance(table, cell_error.CellError):
+            return table
+        if not isinstance(table, CellRange):
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid range")
+        if isinstance(value, cell_error.CellError):
+            return value
+        index = _to_integer(args[2])
+        if isinstance(index, cell_error.CellError):
+            return index
+        if index < 1 or index > table.width:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid index")
+        approximate = string_conversions.check_for_true_arg(args[3]) if len(args) == 4 else True
+        if isinstance(approximate, cell_error.CellError):
+            return approximate
+        row = table.column(0).match(value, AT_MOST if approximate else EXACT)
+        if row is None:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Value not found")
+        return table.value(index - 1, row)
+
+    def match(self, args: List):
+        # MATCH(value, range, [match type = 1]), where the match type is 1 for the largest
+        # value that isn't greater, 0 for an equal value and -1 for the smallest value
+        # that isn't less
+        if len(args) not in [2, 3]:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
+        value, cells = args[:2]
+        if isinstance(cells, cell_error.CellError):
+            return cells
+        if not isinstance(cells, CellRange) or min(cells.width, cells.height) != 1:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid range")
+        if isinstance(value, cell_error.CellError):
+            return value
+        match_type = _to_integer(args[2]) if len(args) == 3 else AT_MOST
+        if isinstance(match_type, cell_error.CellError):
+            return match_type
+        match_type = AT_MOST if match_type > 0 else AT_LEAST if match_type < 0 else EXACT
+        offset = cells.match(value, match_type)
+        if offset is None:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Value not found")
+        return Decimal(offset + 1)
+
+    def xlookup(self, args: List):
+        # XLOOKUP(value, lookup range, return range, [if not found], [match mode = 0]),
+        # where the match mode is 0 for an equal value, -1 for an equal value or else the
+        # next smaller one and 1 for an equal value or else the next larger one
+        if len(args) not in [3, 4, 5]:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
+        value, cells, results = args[:3]
+        for arg in (cells, results):
+            if isinstance(arg, cell_error.CellError):
+                return arg
+        if not isinstance(cells, CellRange) or not isinstance(results, CellRange) \
+                or min(cells.width, cells.height) != 1 \
+                or (cells.width, cells.height) != (results.width, results.height):
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid range")
+        if isinstance(value, cell_error.CellError):
+            return value
+        match_mode = _to_integer(args[4]) if len(args) == 5 else EXACT
+        if isinstance(match_mode, cell_error.CellError):
+            return match_mode
+        if match_mode not in [-1, 0, 1]:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid match mode")
+        offset = cells.match(value, EXACT)
+        if offset is None and match_mode != 0:
+            offset = cells.match(value, AT_MOST if match_mode < 0 else AT_LEAST)
+        if offset is None:
+            if len(args) >= 4:
+                return args[3]
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Value not found")
+        if cells.width == 1:
+            return results.value(0, offset)
+        return results.value(offset, 0)
+
+    def countif(self, args: List):
+        # COUNTIF(range, criterion), where the criterion is a value to compare equal to,
+        # or a string starting with a comparison operator such as ">=10" or "<>text"
+        if len(args) != 2:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
+        cells = args[0]
+        if isinstance(cells, cell_error.CellError):
+            return cells
+        if not isinstance(cells, CellRange):
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid range")
+        cells.link()
+        criterion = _criterion(args[1])
+        if isinstance(criterion, cell_error.CellError):
+            return criterion
+        return Decimal(cells.count_if(criterion))
+
+    def sumif(self, args: List):
+        # SUMIF(range, criterion, [sum range = range]), where the sum range has the same
+        # size as the range and its numbers are summed where the range meets the criterion
+        if len(args) not in [2, 3]:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
+        cells = args[0]
+        totals = args[2] if len(args) == 3 else cells
+        for arg in (cells, totals):
+            if isinstance(arg, cell_error.CellError):
+                return arg
+        if not isinstance(cells, CellRange) or not isinstance(totals, CellRange) \
+                or (cells.width, cells.height) != (totals.width, totals.height):
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid range")
+        cells.link()
+        totals.link()
+        criterion = _criterion(args[1])
+        if isinstance(criterion, cell_error.CellError):
+            return criterion
+        return cells.sum_if(criterion, totals)
+
+
+def _criterion(arg: Any) -> Union[Criterion, cell_error.CellError]:
+    """
+    Parse the criterion given to COUNTIF or SUMIF. A string may start with a comparison
+    operator, and what follows is a number or a boolean if it reads as one. An empty
+    criterion matches empty strings, since empty cells never match.
+    """
+    if isinstance(arg, cell_error.CellError):
+        return arg
+    if isinstance(arg, unitialized_value.UninitializedValue):
+        arg = ""
+    operator = "="
+    if isinstance(arg, str):
+        for prefix in ("<=", ">=", "<>", "<", ">", "="):
+            if arg.startswith(prefix):
+                operator, arg = prefix, arg[len(prefix):]
+                break
+        if arg.strip() and string_conversions.is_number(arg):
+            arg = Decimal(arg)
+        elif arg.lower() in ("true", "false"):
+            arg = arg.lower() == "true"
+    return operator, lookup_key(arg)
+
+
+def _to_integer(arg: Any) -> Union[int, cell_error.CellError]:
+    """
+    Convert an index or mode given to a function to an integer, truncating numbers.
+    """
+    if isinstance(arg, cell_error.CellError):
+        return arg
+    if isinstance(arg, bool):
+        return int(arg)
+    if isinstance(arg, str) and arg.strip() and string_conversions.is_number(arg):
+        arg = Decimal(arg)
+    if isinstance(arg, Decimal):
+        return int(arg)
+    return cell_error.CellError(
+        cell_error.CellErrorType.TYPE_ERROR, "Invalid index")
+
+
+def _aggregate(args: List, count_only: bool = False) -> Union[Aggregate, cell_error.CellError]:
+    """
+    Aggregate the numbers among the arguments of SUM, AVERAGE, MIN, MAX or COUNT.
+    Ranges are aggregated by the aggregates of their columns, without visiting their
+    cells, and only the numbers and errors within them are counted. Booleans and
+    numeric strings given directly are numbers as well.
+
+    Args:
+        args (List): arguments of the function, which may be CellRanges
+        count_only (bool): whether only the count of the numbers is needed, in which
+        case errors and other strings are skipped like in a range
+
+    Returns:
+        Union[Aggregate, CellError]: aggregate of the numbers, or the highest priority
+        error among the arguments
+    """
+    if len(args) == 0:
+        return cell_error.CellError(
+            cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
+    total, count, _, minimum, maximum = EMPTY_AGGREGATE
+    error = None
+    for arg in args:
+        if isinstance(arg, CellRange):
+            range_total, range_count, range_errors, range_minimum, range_maximum = \
+                arg.aggregate()
+            total += range_total
+            count += range_count
+            minimum = min(minimum, range_minimum)
+            maximum = max(maximum, range_maximum)
+            if range_errors and not count_only:
+                for value in arg.values():
+                    if isinstance(value, cell_error.CellError) and \
+                            (error is None or value < error):
+                        error = value
+            continue
+        if isinstance(arg, unitialized_value.UninitializedValue):
+            continue
+        if isinstance(arg, bool):
+            arg = Decimal(int(arg))
+        elif isinstance(arg, str):
+            if not arg.strip() or not string_conversions.is_number(arg):
+                if count_only:
+                    continue
+                arg = cell_error.CellError(
+                    cell_error.CellErrorType.TYPE_ERROR, "Invalid number")
+            else:
+                arg = Decimal(arg)
+        if isinstance(arg, cell_error.CellError):
+            if not count_only and (error is None or arg < error):
+                error = arg
+            continue
+        total += arg
+        count += 1
+        minimum = min(minimum, arg)
+        maximum = max(maximum, arg)
+    if error is not None:
+        return cell_error.CellError(error.get_type(), error.get_detail())
+    return total, count, 0, minimum, maximum
@@ -0,0 +1,174 @@
+"""Incremental reader for JSON documents that are too large to load at once."""
+import json
+import re
+from json.decoder import WHITESPACE
+from typing import Any, Iterator, TextIO, Tuple
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+# text that could be the rest of a number, e.g. the exponent of "1e+20" after "1"
+NUMBER_TAIL = re.compile(r'[0-9eE.+-]*\Z')
+
+
+class JsonReader:
+    """
+    Pull parser that reads a JSON document from a text file a chunk at a time.
+
+    Objects and arrays can be walked one member at a time with iter_object() and
+    iter_array(), and any other value is decoded whole with read_value(), so only the
+    part of the document currently being read is held in memory. Malformed input raises
+    a json.JSONDecodeError, like json.load().
+    """
+
+    def __init__(self, fp: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.__fp = fp
+        self.__chunk_size = chunk_size
+        self.__decoder = json.JSONDecoder()
+        # text that has been read from fp but not consumed yet starts at __pos
+        self.__buffer = ""
+        self.__pos = 0
+        self.__eof = False
+        # characters and lines that were dropped from the front of the buffer, and the
+        # number of characters dropped since the last line break, for error positions
+        self.__dropped = 0
+        self.__dropped_lines = 0
+        self.__dropped_col = 0
+
+    def __fill(self, size: int) -> bool:
+        """Read at least size more characters from the file. Returns False at the end."""
+        if self.__eof:
+            return False
+        # drop consumed text so the buffer stays about the size of one chunk
+        consumed = self.__buffer[:self.__pos]
+        newlines = consumed.count("\n")
+        if newlines:
+            self.__dropped_lines += newlines
+            self.__dropped_col = len(consumed) - consumed.rfind("\n") - 1
+        else:
+            self.__dropped_col += len(consumed)
+        self.__dropped += self.__pos
+        self.__buffer = self.__buffer[self.__pos:]
+        self.__pos = 0
+        chunk = self.__fp.read(max(size, self.__chunk_size))
+        if not chunk:
+            self.__eof = True
+            return False
+        self.__buffer += chunk
+        return True
+
+    def __error(self, msg: str, pos: int) -> json.JSONDecodeError:
+        """Create a decode error for a position in the buffer, counted from the start of
+        the document."""
+        error = json.JSONDecodeError(msg, self.__buffer, pos)
+        line_start = self.__buffer.rfind("\n", 0, pos)
+        if line_start == -1:
+            error.colno = self.__dropped_col + pos + 1
+        error.lineno += self.__dropped_lines
+        error.pos = self.__dropped + pos
+        error.args = (f"{msg}: line {error.lineno} column {error.colno} (char {error.pos})",)
+        return error
+
+    def peek(self) -> str:
+        """
+        Skip whitespace and return the next character without consuming it.
+
+        Returns:
+            str: next character, or "" at the end of the document
+        """
+        while True:
+            self.__pos = WHITESPACE.match(self.__buffer, self.__pos).end()
+            if self.__pos < len(self.__buffer):
+                return self.__buffer[self.__pos]
+            if not self.__fill(0):
+                return ""
+
+    def __expect(self, chars: str, msg: str) -> str:
+        """Consume the next character, which must be one of chars."""
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise self.__error(msg, self.__pos)
+        self.__pos += 1
+        return ch
+
+    def read_value(self) -> Any:
+        """
+        Decode the next value in full.
+
+        Returns:
+            Any: the value, as json.load() would return it
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buffer, self.__pos)
+            except json.JSONDecodeError as e:
+                # the value may continue past the end of the buffer. Reading more moves
+                # the buffer, so decode again before reporting an error.
+                if not self.__eof:
+                    self.__fill(len(self.__buffer))
+                    continue
+                raise self.__error(e.msg, e.pos) from None
+            # a number at the end of the buffer may have more digits still to be read
+            if not self.__eof and NUMBER_TAIL.match(self.__buffer, end):
+                self.__fill(len(self.__buffer))
+                continue
+            self.__pos = end
+            return value
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Walk the members of the next value, which must be an object. Each key is
+        yielded before its value, which the caller must consume (e.g. with read_value())
+        before asking for the next key.
+
+        Yields:
+            str: key of each member, in the order they appear in the document
+        """
+        self.__expect("{", "Expecting '{'")
+        if self.peek() == "}":
+            self.__pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self.__error(
+                    "Expecting property name enclosed in double quotes", self.__pos)
+            key = self.read_value()
+            self.__expect(":", "Expecting ':' delimiter")
+            yield key
+            if self.__expect(",}", "Expecting ',' delimiter") == "}":
+                return
+
+    def iter_items(self) -> Iterator[Tuple[str, Any]]:
+        """
+        Walk the members of the next value, which must be an object, decoding each value
+        in full.
+
+        Yields:
+            Tuple[str, Any]: key and value of each member
+        """
+        for key in self.iter_object():
+            yield key, self.read_value()
+
+    def iter_array(self) -> Iterator[int]:
+        """
+        Walk the elements of the next value, which must be an array. The index of each
+        element is yielded before the element, which the caller must consume before
+        asking for the next one.
+
+        Yields:
+            int: index of each element
+        """
+        self.__expect("[", "Expecting '['")
+        if self.peek() == "]":
+            self.__pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self.__expect(",]", "Expecting ',' delimiter") == "]":
+                return
+
+    def end(self) -> None:
+        """Check that nothing but whitespace follows the document."""
+        if self.peek():
+            raise self.__error("Extra data", self.__pos)
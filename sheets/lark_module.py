@@ -1,390 +1,175 @@
 """Module containing functionality to parse spreadsheet formulas."""
 import decimal
 import re
-from typing import Any, Union, Callable
+from typing import Any, Union, Callable, List, Optional
 from functools import lru_cache
 from contextlib import contextmanager
 import lark
-from lark.visitors import visit_children_decor
 from lark.exceptions import UnexpectedInput
 from sheets import cell_error, cell, string_conversions, unitialized_value, functions
+from sheets.cell_range import CellRange
+from sheets.formula_template import DEFAULT_ANCHOR, to_reference, resolve
 
+# A compiled formula takes the evaluator of the cell it is evaluated in and returns a value.
+# Cell references are resolved relative to the location of that cell, so formulas in the
+# same relative form share one compiled formula. compile_formula() also stores the
+# (lower-case sheet name or None, Reference) pairs that the formula references in the
+# "references" attribute of the returned function, the lower-case names of the sheets that
+# its cell and range references name, whether or not they exist, in the "sheet_names"
+# attribute, and the relative form of the formula, read from the positions of its CELLREF
+# tokens, in the "form" attribute.
+CompiledFormula = Callable[['FormulaEvaluator'], Any]
 
-class FormulaEvaluator(lark.visitors.Interpreter):
+
+class FormulaEvaluator:
     """
-    This class evaluates cell contents that begin with "=".
-    It also tracks which cells the calling cell relies on.
+    This class holds the state needed to evaluate a compiled formula within a cell. It
+    resolves cell references and tracks which cells the calling cell relies on, apart
+    from the cells that functions such as IF and INDIRECT choose to read by value,
+    which are tracked separately.
     """
 
-    def __init__(self, workbook, sheet, calling_cell):
-        self.sub_evaluator = None
+    def __init__(self, workbook, sheet, calling_cell, link_static: bool = True):
         self.wb = workbook
         self.sheet = sheet
         self.calling_cell = calling_cell
+        # location that the references of the formula are relative to
+        self.anchor = calling_cell.key if calling_cell else DEFAULT_ANCHOR
+        # cells and ranges read whatever the values are, which are only tracked if
+        # link_static is set, since they are the same every time a formula is evaluated
         self.calling_cell_relies_on = []
-        self.parser = None
-        self.__convert_literal_to_error = True
+        self.link_static = link_static
+        # cells and ranges read because of the values of other cells
+        self.dynamic_reads = []
+        self.dynamic_depth = 0
+        self.convert_literal_to_error = True
 
     @contextmanager
-    def __ignore_error_literals(self):
+    def ignore_error_literals(self):
         """
         Disable automatic conversions of error equivalent literals to CellError objects
         """
-        self.__convert_literal_to_error = False
+        self.convert_literal_to_error = False
         yield
-        self.__convert_literal_to_error = True
+        self.convert_literal_to_error = True
 
-    def __check_sheet_name(self, sheet_name) -> Union[str, cell_error.CellError]:
+    @contextmanager
+    def reading_by_value(self):
         """
-        Check if a sheet name is valid (comprised of valid characters and formatting).
-
-        Args:
-            sheet_name (str): sheet name to validate
-
-        Returns:
-            Union[str, cell_error.CellError]: lower-case form of the sheet name or an instance
-            of a Parse Error if the sheet name is found to be invalid. 
+        Track the cells read within the block as dynamic reads, for the branches of IF,
+        IFERROR and CHOOSE, the targets of INDIRECT and the cells lookups read.
         """
-        if sheet_name[0] == " ":
-            return cell_error.CellError(cell_error.CellErrorType.PARSE_ERROR, "invalid sheet name")
-        if sheet_name[-1] == " ":
-            return cell_error.CellError(cell_error.CellErrorType.PARSE_ERROR, "invalid sheet name")
-        if re.match("\'[^']*\'", sheet_name):  # quoted sheet name
-            sheet_name = sheet_name.lower()[1:-1]
-        elif re.match("[A-Za-z_][A-Za-z0-9_]*", sheet_name):  # unquoted sheet name
-            sheet_name = sheet_name.lower()
-        else:
-            return cell_error.CellError(cell_error.CellErrorType.PARSE_ERROR, "invalid sheet name")
-        return sheet_name
+        self.dynamic_depth += 1
+        yield
+        self.dynamic_depth -= 1
 
-    def __check_string_arithmetic(self, values, *args) -> Union[list, cell_error.CellError]:
+    def __relies_on(self, precedent) -> None:
         """
-        Check a list of string values to confirm that they are all castable to the
-        `decimal.Decimal` type. If they are, return the list of casted values. Otherwise, 
-        return a Type Error indicating string arithmetic. 
-
-        Args:
-            values (list): input list of values generated by the parser
-            args: indices of values array to check for string arithmetic
-
-        Returns:
-            Union[list, cell_error.CellError]: Either an updated list of decimal values with their
-            corresponding operationg in string form, or an instance of a type error. 
+        Track a cell or range that the calling cell read.
         """
-        for arg in args:
-            assert isinstance(arg, int)
-        assert len(args) in [1, 2]
-        res = [decimal.Decimal(0), values[1], decimal.Decimal(0)] if len(
-            args) == 2 else [values[0], decimal.Decimal(0)]
-        for i in args:
-            value = values[i]
-            if isinstance(value, decimal.Decimal):
-                res[i] = value
-            elif isinstance(value, bool):
-                res[i] = decimal.Decimal(1) if value else decimal.Decimal(0)
-            elif isinstance(value, unitialized_value.UninitializedValue):
-                continue
-            elif value and string_conversions.is_number(value):
-                res[i] = decimal.Decimal(value)
-            elif isinstance(value, str):
-                return cell_error.CellError(
-                    cell_error.CellErrorType.TYPE_ERROR, "string arithmetic")
-        return res
+        if self.dynamic_depth:
+            self.dynamic_reads.append(precedent)
+        elif self.link_static:
+            self.calling_cell_relies_on.append(precedent)
 
-    def __check_for_error(self, values, *args) -> Union[bool, cell_error.CellError]:
+    def cell(self, sheet_name: Union[str, None], key: Optional[int]) -> Any:
         """
-        Check if input values is are instance of a cell error. If so, return the error with
-        the highest priority. Otherwise, return False. 
+        Get the value of a referenced cell, tracking that the calling cell relies on it.
 
         Args:
-            values (List): array of input values for artithmetic evaluation
-            args: indices of values array to check for cell error instances. If no arguments are
-            provided, check the whole array.
+            sheet_name (str or None): lower-case name of the referenced sheet, or None for
+            the sheet the formula is in
+            key (int or None): key of the referenced location, or None if the location
+            is outside of the sheet
 
         Returns:
-            bool or CellError: return self.error if an error is found. Otherwise, return false
+            Any: value of the referenced cell, or a CellError for an invalid reference
         """
-        errs = {}  # {int error enum : CellError object}
-        for arg in args:
-            assert isinstance(arg, int)
-        if len(args) == 0:
-            args = range(len(values))
-        for i in args:
-            if isinstance(values[i], cell_error.CellError):
-                match values[i].get_type():
-                    case cell_error.CellErrorType.PARSE_ERROR:
-                        errs[cell_error.CellErrorType.PARSE_ERROR.value] = cell_error.CellError(
-                            cell_error.CellErrorType.PARSE_ERROR, "parsing error")
-                    case cell_error.CellErrorType.CIRCULAR_REFERENCE:
-                        ce = cell_error.CellError(
-                            cell_error.CellErrorType.CIRCULAR_REFERENCE, "circular reference")
-                        ce.circref_type = values[i].circref_type
-                        errs[cell_error.CellErrorType.CIRCULAR_REFERENCE.value] = ce
-                    case cell_error.CellErrorType.BAD_REFERENCE:
-                        errs[cell_error.CellErrorType.BAD_REFERENCE.value] = cell_error.CellError(
-                            cell_error.CellErrorType.BAD_REFERENCE, "bad reference")
-                    case cell_error.CellErrorType.BAD_NAME:
-                        errs[cell_error.CellErrorType.BAD_NAME.value] = cell_error.CellError(
-                            cell_error.CellErrorType.BAD_NAME, "bad name")
-                    case cell_error.CellErrorType.TYPE_ERROR:
-                        errs[cell_error.CellErrorType.TYPE_ERROR.value] = cell_error.CellError(
-                            cell_error.CellErrorType.TYPE_ERROR, "invalid operation")
-                    case cell_error.CellErrorType.DIVIDE_BY_ZERO:
-                        errs[cell_error.CellErrorType.DIVIDE_BY_ZERO.value] = cell_error.CellError(
-                            cell_error.CellErrorType.DIVIDE_BY_ZERO, "divide by zero")
-        if len(errs) > 0:
-            return errs[min(list(errs.keys()))]
-        return False
-
-    def __bool_cmpr(self, left: Any, right: Any,
-                    operand: Callable[[str, str], bool], string_op: str) -> bool:
-        # booleans > strings > numbers
-        if type(left) == type(right):  # pylint: disable=unidiomatic-typecheck
-            return operand(left, right)
-        if isinstance(left, bool):
-            return string_op in ['>', '>=']
-        if isinstance(left, str):
-            if isinstance(right, decimal.Decimal):
-                return string_op in ['>', '>=']
-            return string_op not in ['>', '>=']
-        if isinstance(left, decimal.Decimal):
-            return string_op not in ['>', '>=']
-        assert False, "Unrecognized inputs"
-
-    @visit_children_decor
-    def add_expr(self, values):
-        potential_error = self.__check_for_error(values, 0, 2)
-        if potential_error:
-            return potential_error
-        updated_values = self.__check_string_arithmetic(values, 0, 2)
-        if isinstance(updated_values, cell_error.CellError):
-            return updated_values
-        if updated_values[1] == '+':
-            return updated_values[0] + updated_values[2]
-        if updated_values[1] == '-':
-            return updated_values[0] - updated_values[2]
-        assert False, 'Unexpected operator: ' + values[1]
-
-    @visit_children_decor
-    def mul_expr(self, values):
-        potential_error = self.__check_for_error(values, 0, 2)
-        if potential_error:
-            return potential_error
-        updated_values = self.__check_string_arithmetic(values, 0, 2)
-        if isinstance(updated_values, cell_error.CellError):
-            return updated_values
-        if updated_values[1] == '*':
-            res = updated_values[0] * updated_values[2]
-            return abs(res) if res == 0 else res
-        if updated_values[1] == '/':
-            if updated_values[2] == 0:
-                return cell_error.CellError(
-                    cell_error.CellErrorType.DIVIDE_BY_ZERO, 'divide by zero')
-            return updated_values[0] / updated_values[2]
-        assert False, 'Unexpected operator: ' + updated_values[1]
-
-    @visit_children_decor
-    def unary_op(self, values):
-        potential_error = self.__check_for_error(values, 1)
-        if potential_error:
-            return potential_error
-        updated_values = self.__check_string_arithmetic(values, 1)
-        if isinstance(updated_values, cell_error.CellError):
-            return updated_values
-        if updated_values[0] == "+":
-            return updated_values[1]
-        if updated_values[0] == "-":
-            return -1 * updated_values[1]
-        return None
-
-    @visit_children_decor
-    def concat_expr(self, values):
-        potential_error = self.__check_for_error(values, 0, 1)
-        if potential_error:
-            return potential_error
-        if isinstance(values[1], decimal.Decimal) and values[1] == decimal.Decimal(0):
-            values[1] = "0"
-        elif isinstance(values[1], bool):
-            values[1] = "TRUE" if values[1] else "FALSE"
-        elif not values[1] or isinstance(values[1], unitialized_value.UninitializedValue):
-            values[1] = ""
-        if isinstance(values[0], decimal.Decimal) and values[0] == decimal.Decimal(0):
-            values[0] = "0"
-        elif isinstance(values[0], bool):
-            values[0] = "TRUE" if values[0] else "FALSE"
-        elif not values[0] or isinstance(values[0], unitialized_value.UninitializedValue):
-            values[0] = ""
-        res = str(values[0]) + str(values[1])
-        return res
-
-    @visit_children_decor
-    def bool_expr(self, values):
-        potential_error = self.__check_for_error(values, 0, 2)
-        if potential_error:
-            return potential_error
-        left, operator, right = values
-        original_types_equal = False
-        if type(left) == type(right):
-            original_types_equal = True
-        if isinstance(left, str):
-            left = left.lower()
-            if left == "true" and not isinstance(right, bool):
-                left = True
-            elif left == "false" and not isinstance(right, bool):
-                left = False
-        elif isinstance(left, unitialized_value.UninitializedValue):
-            if isinstance(right, str):
-                left = ""
-            elif isinstance(right, decimal.Decimal):
-                left = decimal.Decimal(0)
-            elif isinstance(right, bool):
-                left = False
-        if isinstance(right, str):
-            right = right.lower()
-            if right == "true" and not isinstance(left, bool):
-                right = True
-            elif right == "false" and not isinstance(left, bool):
-                right = False
-        elif isinstance(right, unitialized_value.UninitializedValue):
-            if isinstance(left, str):
-                right = ""
-            elif isinstance(left, decimal.Decimal):
-                right = decimal.Decimal(0)
-            elif isinstance(left, bool):
-                right = False
-        if operator in ("=", "=="):
-            return left == right and original_types_equal
-        if operator in ("<>", "!="):
-            return left != right or not original_types_equal
-        if operator == ">":
-            return self.__bool_cmpr(left, right, lambda x, y: x > y, '>')
-        if operator == ">=":
-            return self.__bool_cmpr(left, right, lambda x, y: x >= y, '>=')
-        if operator == "<":
-            return self.__bool_cmpr(left, right, lambda x, y: x < y, '<')
-        if operator == "<=":
-            return self.__bool_cmpr(left, right, lambda x, y: x <= y, '<=')
-        assert False, 'Unexpected operator: ' + operator
-
-    def function(self, values):
-        name = values.children[0].strip().upper()
-        func = functions.Function(name, [], False)
-        if name not in self.wb.function_directory.get_function_keys():
-            return cell_error.CellError(cell_error.CellErrorType.BAD_NAME, "Invalid function name")
-        if name in self.wb.function_directory.lazy_functions:
-            func.lazy_eval = True
-        if not func.lazy_eval:
-            for child in values.children[1:]:
-                func.args.append(self.visit(child))
-        else:  # lazy evaluation
-            self.calling_cell.lazy = True
-            if func.name == "IF":
-                if len(values.children[1:]) not in [2, 3]:
-                    return cell_error.CellError(
-                        cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
-                condition = string_conversions.check_for_true_arg(
-                    self.visit(values.children[1]))
-                if isinstance(condition, cell_error.CellError):
-                    return condition
-                if condition:
-                    func.args.append(self.visit(values.children[2]))
-                elif len(values.children[1:]) == 3:
-                    func.args.append(self.visit(values.children[3]))
-                else:
-                    func.args.append(False)
-            elif func.name == "IFERROR":
-                if len(values.children[1:]) not in [1, 2]:
-                    return cell_error.CellError(
-                        cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
-                with self.__ignore_error_literals():
-                    res = self.visit(values.children[1])
-                if isinstance(res, cell_error.CellError
-                              ) and res.get_type() == cell_error.CellErrorType.CIRCULAR_REFERENCE:
-                    return cell_error.CellError(
-                        cell_error.CellErrorType.CIRCULAR_REFERENCE, "Circular Reference")
-                if not isinstance(res, cell_error.CellError):
-                    func.args.append(res)
-                elif len(values.children[1:]) == 2:
-                    func.args.append(self.visit(values.children[2]))
-                else:
-                    func.args.append("")
-            elif func.name == "CHOOSE":
-                if len(values.children) < 3:
-                    return cell_error.CellError(
-                        cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
-                index = self.visit(values.children[1])
-                if isinstance(index, cell_error.CellError):
-                    return cell_error.CellError(
-                        cell_error.CellErrorType.TYPE_ERROR, "Invalid index")
-                if not isinstance(index, decimal.Decimal
-                                  ) or index <= 0 or index + 2 > len(values.children):
-                    return cell_error.CellError(
-                        cell_error.CellErrorType.TYPE_ERROR, "Invalid index")
-                func.args = [self.visit(values.children[int(index) + 1])]
-        if func.name == "INDIRECT":
-            if len(func.args) != 1:
-                return cell_error.CellError(
-                    cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
-            if isinstance(func.args[0], unitialized_value.UninitializedValue):
-                return cell_error.CellError(
-                    cell_error.CellErrorType.BAD_REFERENCE, "Bad reference")
-            if not isinstance(func.args[0], str):
-                return cell_error.CellError(
-                    cell_error.CellErrorType.BAD_REFERENCE, "Bad reference")
-            if '!' in func.args[0]:
-                exclamation_idx = func.args[0].index('!')
-            else:
-                exclamation_idx = -1
-            if not string_conversions.check_valid_location(func.args[0][exclamation_idx + 1:]):
-                return cell_error.CellError(
-                    cell_error.CellErrorType.BAD_REFERENCE, "Bad reference")
-            cell_ref = self.visit(
-                get_tree(self.parser, "=" + func.args[0]))
-            func.args[0] = cell_ref
-        return self.wb.function_directory.call_function(func)
-
-    @visit_children_decor
-    def cell(self, values):
-        # handle different input formats for value
-        if len(values) > 1:  # =[sheet]![col][row]
-            sheet_name = self.__check_sheet_name(values[0].value)
-            if isinstance(sheet_name, cell_error.CellError):
-                return sheet_name
-            location = values[1].value.upper().replace("$", "")
-        else:  # = [col][row]
+        if sheet_name is None:
             sheet_name = self.sheet.name.lower()
-            location = values[0].value.upper().replace("$", "")
 
         # check for invalid references or errors
         if sheet_name not in self.wb.spreadsheets:
             return cell_error.CellError(
                 cell_error.CellErrorType.BAD_REFERENCE, "sheet name not found")
         sheet = self.wb.spreadsheets[sheet_name]
-        if not string_conversions.check_valid_location(location):
+        if key is None:
             return cell_error.CellError(cell_error.CellErrorType.BAD_REFERENCE, "invalid location")
-        if self.calling_cell and self.calling_cell.sheet.name.lower() == sheet_name \
-                and self.calling_cell.location == location:
+        if self.calling_cell and self.calling_cell.key == key \
+                and self.calling_cell.sheet.name.lower() == sheet_name:
             ce = cell_error.CellError(
                 cell_error.CellErrorType.CIRCULAR_REFERENCE, "circular reference")
             ce.circref_type = True
             return ce
 
+        # expressions evaluated outside of a cell don't take part in the dependency graph
+        if not self.calling_cell:
+            if key not in sheet.cells:
+                if sheet.columns is not None and key in sheet.columns:
+                    return cell.literal_value(sheet.columns.get(key))[0]
+                return unitialized_value.UninitializedValue()
+            return self.__cell_value(sheet.cells[key])
+
+        # literals of columnar sheets get a Cell object once a formula reads them
+        if key not in sheet.cells and sheet.columns is not None:
+            sheet.materialize(key)
         # no cell in this location yet
-        if location not in sheet.cells:
+        if key not in sheet.cells:
             new_empty_cell = cell.Cell(
-                sheet, location, None, None, cell.CellType.EMPTY)
-            sheet.cells[location] = new_empty_cell
-            self.wb.adjacency_list[new_empty_cell] = [self.calling_cell]
-            self.calling_cell_relies_on.append(new_empty_cell)
+                sheet, key, None, None, cell.CellType.EMPTY)
+            sheet.cells[key] = new_empty_cell
+            self.__relies_on(new_empty_cell)
             return unitialized_value.UninitializedValue()
 
-        # add calling_cell to the neighbors of Cell from values argument
-        if self.calling_cell not in self.wb.adjacency_list[sheet.cells[location]]:
-            self.wb.adjacency_list[sheet.cells[location]].append(
-                self.calling_cell)
-        self.calling_cell_relies_on.append(sheet.cells[location])
+        referenced_cell = sheet.cells[key]
+        self.__relies_on(referenced_cell)
+        return self.__cell_value(referenced_cell)
+
+    def cell_range(self, sheet_name: Union[str, None],
+                   corners: Optional[tuple]) -> Union[CellRange, cell_error.CellError]:
+        """
+        Get a range of cells given to a function. The range reads its cells through this
+        evaluator, which links the parts of the range that the function reads to the
+        calling cell in the workbook's dependency graph, so that a lookup only depends
+        on the column it searches and the cell it returns. The cells within the range
+        aren't linked individually.
+
+        Args:
+            sheet_name (str or None): lower-case name of the referenced sheet, or None for
+            the sheet the formula is in
+            corners (tuple or None): normalized corners of the range, or None if a corner
+            is outside of the sheet
+
+        Returns:
+            Union[CellRange, CellError]: the range, or a CellError for an invalid reference
+        """
+        if sheet_name is None:
+            sheet_name = self.sheet.name.lower()
+        if sheet_name not in self.wb.spreadsheets:
+            return cell_error.CellError(
+                cell_error.CellErrorType.BAD_REFERENCE, "sheet name not found")
+        sheet = self.wb.spreadsheets[sheet_name]
+        if corners is None:
+            return cell_error.CellError(cell_error.CellErrorType.BAD_REFERENCE, "invalid location")
+        return CellRange(sheet, corners, self if self.calling_cell else None)
+
+    def link_range(self, sheet, corners: tuple) -> None:
+        """
+        Link a range of cells read by a function to the calling cell.
+
+        Args:
+            sheet (Sheet): sheet the range is on
+            corners (tuple): normalized corners of the range
+        """
+        self.__relies_on(self.wb.graph.range_node(sheet, corners))
+
+    def __cell_value(self, referenced_cell):
+        """
+        Get the value of a referenced cell as seen by a formula, where empty cells
+        are represented by an UninitializedValue.
+        """
         # cell exists at location but is empty
-        val = sheet.cells[location].value
+        val = referenced_cell.value
         if not val and not isinstance(val, bool):
             ret_val = val if val in (
                 decimal.Decimal(0), "") else unitialized_value.UninitializedValue()
@@ -392,95 +177,583 @@ class FormulaEvaluator(lark.visitors.Interpreter):
             ret_val = val
         return ret_val
 
-    def parens(self, tree):
-        self.sub_evaluator = FormulaEvaluator(
-            self.wb, self.sheet, self.calling_cell)
-        self.calling_cell_relies_on.extend(
-            self.sub_evaluator.calling_cell_relies_on)
-        return self.sub_evaluator.visit(tree.children[0])
 
-    def number(self, tree):
-        number = decimal.Decimal(tree.children[0])
-        if number == decimal.Decimal('NaN'):
-            return "NaN"
-        if number == decimal.Decimal('Infinity'):
-            return "Infinity"
-        return decimal.Decimal(string_conversions.strip_zeros(tree.children[0]))
-
-    def string(self, tree):
-        value = tree.children[0].value[1:-1]
-        if self.__convert_literal_to_error:
-            potential_error = string_conversions.str_to_error(value)
+def _check_sheet_name(sheet_name) -> Union[str, cell_error.CellError]:
+    """
+    Check if a sheet name is valid (comprised of valid characters and formatting).
+
+    Args:
+        sheet_name (str): sheet name to validate
+
+    Returns:
+        Union[str, cell_error.CellError]: lower-case form of the sheet name or an instance
+        of a Parse Error if the sheet name is found to be invalid.
+    """
+    if sheet_name[0] == " ":
+        return cell_error.CellError(cell_error.CellErrorType.PARSE_ERROR, "invalid sheet name")
+    if sheet_name[-1] == " ":
+        return cell_error.CellError(cell_error.CellErrorType.PARSE_ERROR, "invalid sheet name")
+    if re.match("\'[^']*\'", sheet_name):  # quoted sheet name
+        sheet_name = sheet_name.lower()[1:-1]
+    elif re.match("[A-Za-z_][A-Za-z0-9_]*", sheet_name):  # unquoted sheet name
+        sheet_name = sheet_name.lower()
+    else:
+        return cell_error.CellError(cell_error.CellErrorType.PARSE_ERROR, "invalid sheet name")
+    return sheet_name
+
+
+def _check_string_arithmetic(values, *args) -> Union[list, cell_error.CellError]:
+    """
+    Check a list of string values to confirm that they are all castable to the
+    `decimal.Decimal` type. If they are, return the list of casted values. Otherwise,
+    return a Type Error indicating string arithmetic.
+
+    Args:
+        values (list): input list of values generated by the parser
+        args: indices of values array to check for string arithmetic
+
+    Returns:
+        Union[list, cell_error.CellError]: Either an updated list of decimal values with their
+        corresponding operationg in string form, or an instance of a type error.
+    """
+    res = [decimal.Decimal(0), values[1], decimal.Decimal(0)] if len(
+        args) == 2 else [values[0], decimal.Decimal(0)]
+    for i in args:
+        value = values[i]
+        if isinstance(value, decimal.Decimal):
+            res[i] = value
+        elif isinstance(value, bool):
+            res[i] = decimal.Decimal(1) if value else decimal.Decimal(0)
+        elif isinstance(value, unitialized_value.UninitializedValue):
+            continue
+        elif value and string_conversions.is_number(value):
+            res[i] = decimal.Decimal(value)
+        elif isinstance(value, str):
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "string arithmetic")
+    return res
+
+
+def _check_for_error(*values) -> Union[bool, cell_error.CellError]:
+    """
+    Check if input values are instances of a cell error. If so, return a new error of the
+    highest priority type. Otherwise, return False.
+
+    Args:
+        values: values to check for cell error instances
+
+    Returns:
+        bool or CellError: return an error if one is found. Otherwise, return false
+    """
+    found = None
+    for value in values:
+        if isinstance(value, cell_error.CellError) and (found is None or value < found):
+            found = value
+    if found is None:
+        return False
+    match found.get_type():
+        case cell_error.CellErrorType.PARSE_ERROR:
+            return cell_error.CellError(
+                cell_error.CellErrorType.PARSE_ERROR, "parsing error")
+        case cell_error.CellErrorType.CIRCULAR_REFERENCE:
+            ce = cell_error.CellError(
+                cell_error.CellErrorType.CIRCULAR_REFERENCE, "circular reference")
+            # the last circular reference among the values decides the type
+            for value in values:
+                if isinstance(value, cell_error.CellError) and \
+                        value.get_type() == cell_error.CellErrorType.CIRCULAR_REFERENCE:
+                    ce.circref_type = value.circref_type
+            return ce
+        case cell_error.CellErrorType.BAD_REFERENCE:
+            return cell_error.CellError(
+                cell_error.CellErrorType.BAD_REFERENCE, "bad reference")
+        case cell_error.CellErrorType.BAD_NAME:
+            return cell_error.CellError(
+                cell_error.CellErrorType.BAD_NAME, "bad name")
+        case cell_error.CellErrorType.TYPE_ERROR:
+            return cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "invalid operation")
+        case cell_error.CellErrorType.DIVIDE_BY_ZERO:
+            return cell_error.CellError(
+                cell_error.CellErrorType.DIVIDE_BY_ZERO, "divide by zero")
+    return False
+
+
+def _bool_cmpr(left: Any, right: Any,
+               operand: Callable[[str, str], bool], string_op: str) -> bool:
+    # booleans > strings > numbers
+    if type(left) == type(right):  # pylint: disable=unidiomatic-typecheck
+        return operand(left, right)
+    if isinstance(left, bool):
+        return string_op in ['>', '>=']
+    if isinstance(left, str):
+        if isinstance(right, decimal.Decimal):
+            return string_op in ['>', '>=']
+        return string_op not in ['>', '>=']
+    if isinstance(left, decimal.Decimal):
+        return string_op not in ['>', '>=']
+    assert False, "Unrecognized inputs"
+
+
+def _to_concat_str(value: Any) -> str:
+    if isinstance(value, decimal.Decimal) and value == decimal.Decimal(0):
+        return "0"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if not value or isinstance(value, unitialized_value.UninitializedValue):
+        return ""
+    return str(value)
+
+
+def _compare(left: Any, operator: str, right: Any) -> Union[bool, cell_error.CellError]:
+    potential_error = _check_for_error(left, right)
+    if potential_error:
+        return potential_error
+    original_types_equal = False
+    if type(left) == type(right):  # pylint: disable=unidiomatic-typecheck
+        original_types_equal = True
+    if isinstance(left, str):
+        left = left.lower()
+        if left == "true" and not isinstance(right, bool):
+            left = True
+        elif left == "false" and not isinstance(right, bool):
+            left = False
+    elif isinstance(left, unitialized_value.UninitializedValue):
+        if isinstance(right, str):
+            left = ""
+        elif isinstance(right, decimal.Decimal):
+            left = decimal.Decimal(0)
+        elif isinstance(right, bool):
+            left = False
+    if isinstance(right, str):
+        right = right.lower()
+        if right == "true" and not isinstance(left, bool):
+            right = True
+        elif right == "false" and not isinstance(left, bool):
+            right = False
+    elif isinstance(right, unitialized_value.UninitializedValue):
+        if isinstance(left, str):
+            right = ""
+        elif isinstance(left, decimal.Decimal):
+            right = decimal.Decimal(0)
+        elif isinstance(left, bool):
+            right = False
+    if operator in ("=", "=="):
+        return left == right and original_types_equal
+    if operator in ("<>", "!="):
+        return left != right or not original_types_equal
+    if operator == ">":
+        return _bool_cmpr(left, right, lambda x, y: x > y, '>')
+    if operator == ">=":
+        return _bool_cmpr(left, right, lambda x, y: x >= y, '>=')
+    if operator == "<":
+        return _bool_cmpr(left, right, lambda x, y: x < y, '<')
+    if operator == "<=":
+        return _bool_cmpr(left, right, lambda x, y: x <= y, '<=')
+    assert False, 'Unexpected operator: ' + operator
+
+
+class FormulaCompiler(lark.visitors.Transformer):
+    """
+    This class compiles the parse tree of a formula into a tree of closures. Each closure
+    takes the FormulaEvaluator of the cell being evaluated and returns a value, so a
+    formula is only walked once no matter how many times it is evaluated.
+    """
+
+    def __init__(self, anchor: int = DEFAULT_ANCHOR):
+        super().__init__()
+        # location of the formula being compiled
+        self.anchor = anchor
+        # (lower-case sheet name or None, Reference) of every cell reference in the formula
+        self.references = []
+        # compiled cell ranges, which can only be arguments of functions
+        self.ranges = set()
+        # every CELLREF token of the formula, including those of ranges
+        self.cellrefs = []
+        # lower-case names of the sheets named by cell and range references
+        self.sheet_names = set()
+
+    def add_expr(self, children) -> CompiledFormula:
+        left, operator, right = children
+        assert operator in ('+', '-'), 'Unexpected operator: ' + operator
+        subtract = operator == '-'
+
+        def evaluate(evaluator):
+            values = [left(evaluator), operator, right(evaluator)]
+            potential_error = _check_for_error(values[0], values[2])
             if potential_error:
                 return potential_error
-        return value
+            updated_values = _check_string_arithmetic(values, 0, 2)
+            if isinstance(updated_values, cell_error.CellError):
+                return updated_values
+            if subtract:
+                return updated_values[0] - updated_values[2]
+            return updated_values[0] + updated_values[2]
+        return evaluate
 
-    def boolean(self, tree):
-        value = tree.children[0].value
-        if string_conversions.is_true_expr(value):
-            return True
-        return False
+    def mul_expr(self, children) -> CompiledFormula:
+        left, operator, right = children
+        assert operator in ('*', '/'), 'Unexpected operator: ' + operator
+        divide = operator == '/'
 
-    def error(self, tree):
-        match tree.children[0].upper():
-            case "#ERROR!":
+        def evaluate(evaluator):
+            values = [left(evaluator), operator, right(evaluator)]
+            potential_error = _check_for_error(values[0], values[2])
+            if potential_error:
+                return potential_error
+            updated_values = _check_string_arithmetic(values, 0, 2)
+            if isinstance(updated_values, cell_error.CellError):
+                return updated_values
+            if divide:
+                if updated_values[2] == 0:
+                    return cell_error.CellError(
+                        cell_error.CellErrorType.DIVIDE_BY_ZERO, 'divide by zero')
+                return updated_values[0] / updated_values[2]
+            res = updated_values[0] * updated_values[2]
+            return abs(res) if res == 0 else res
+        return evaluate
+
+    def unary_op(self, children) -> CompiledFormula:
+        operator, operand = children
+        negate = operator == "-"
+
+        def evaluate(evaluator):
+            values = [operator, operand(evaluator)]
+            potential_error = _check_for_error(values[1])
+            if potential_error:
+                return potential_error
+            updated_values = _check_string_arithmetic(values, 1)
+            if isinstance(updated_values, cell_error.CellError):
+                return updated_values
+            if negate:
+                return -1 * updated_values[1]
+            return updated_values[1]
+        return evaluate
+
+    def concat_expr(self, children) -> CompiledFormula:
+        left, right = children
+
+        def evaluate(evaluator):
+            left_value = left(evaluator)
+            right_value = right(evaluator)
+            potential_error = _check_for_error(left_value, right_value)
+            if potential_error:
+                return potential_error
+            return _to_concat_str(left_value) + _to_concat_str(right_value)
+        return evaluate
+
+    def bool_expr(self, children) -> CompiledFormula:
+        left, operator, right = children
+        operator = str(operator)
+
+        def evaluate(evaluator):
+            return _compare(left(evaluator), operator, right(evaluator))
+        return evaluate
+
+    def function(self, children) -> CompiledFormula:
+        name = children[0].strip().upper()
+        args = children[1:]
+        takes_range = any(arg in self.ranges for arg in args)
+        if takes_range and name in ("IF", "IFERROR", "CHOOSE"):
+            return lambda evaluator: cell_error.CellError(
+                cell_error.CellErrorType.TYPE_ERROR, "Invalid range argument")
+        if name == "IF":
+            return self.__if_func(args)
+        if name == "IFERROR":
+            return self.__if_error(args)
+        if name == "CHOOSE":
+            return self.__choose(args)
+
+        def evaluate(evaluator):
+            if name not in evaluator.wb.function_directory.get_function_keys():
+                return cell_error.CellError(
+                    cell_error.CellErrorType.BAD_NAME, "Invalid function name")
+            if takes_range and name not in evaluator.wb.function_directory.range_functions:
+                return cell_error.CellError(
+                    cell_error.CellErrorType.TYPE_ERROR, "Invalid range argument")
+            if name in evaluator.wb.function_directory.lookup_functions:
+                _mark_lazy(evaluator)
+            func = functions.Function(name, [arg(evaluator) for arg in args], False)
+            if name == "INDIRECT":
+                return _indirect(evaluator, func)
+            if name in evaluator.wb.function_directory.lookup_functions:
+                with evaluator.reading_by_value():
+                    return evaluator.wb.function_directory.call_function(func)
+            return evaluator.wb.function_directory.call_function(func)
+        return evaluate
+
+    def __if_func(self, args: List[CompiledFormula]) -> CompiledFormula:
+        def evaluate(evaluator):
+            _mark_lazy(evaluator)
+            if len(args) not in [2, 3]:
+                return cell_error.CellError(
+                    cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
+            condition = string_conversions.check_for_true_arg(args[0](evaluator))
+            if isinstance(condition, cell_error.CellError):
+                return condition
+            with evaluator.reading_by_value():
+                if condition:
+                    return args[1](evaluator)
+                if len(args) == 3:
+                    return args[2](evaluator)
+            return False
+        return evaluate
+
+    def __if_error(self, args: List[CompiledFormula]) -> CompiledFormula:
+        def evaluate(evaluator):
+            _mark_lazy(evaluator)
+            if len(args) not in [1, 2]:
                 return cell_error.CellError(
-                    cell_error.CellErrorType.PARSE_ERROR, "input error")
-            case "#CIRCREF!":
-                ce = cell_error.CellError(
-                    cell_error.CellErrorType.CIRCULAR_REFERENCE, "input error")
-                ce.circref_type = False
-                return ce
-            case "#REF!":
+                    cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
+            with evaluator.ignore_error_literals():
+                res = args[0](evaluator)
+            if isinstance(res, cell_error.CellError
+                          ) and res.get_type() == cell_error.CellErrorType.CIRCULAR_REFERENCE:
                 return cell_error.CellError(
-                    cell_error.CellErrorType.BAD_REFERENCE, "input error")
-            case "#NAME?":
+                    cell_error.CellErrorType.CIRCULAR_REFERENCE, "Circular Reference")
+            if not isinstance(res, cell_error.CellError):
+                return res
+            if len(args) == 2:
+                with evaluator.reading_by_value():
+                    return args[1](evaluator)
+            return ""
+        return evaluate
+
+    def __choose(self, args: List[CompiledFormula]) -> CompiledFormula:
+        def evaluate(evaluator):
+            _mark_lazy(evaluator)
+            if len(args) < 2:
                 return cell_error.CellError(
-                    cell_error.CellErrorType.BAD_NAME, "input error")
-            case "#VALUE!":
+                    cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
+            index = args[0](evaluator)
+            if isinstance(index, cell_error.CellError):
                 return cell_error.CellError(
-                    cell_error.CellErrorType.TYPE_ERROR, "input error")
-            case "#DIV/0!":
+                    cell_error.CellErrorType.TYPE_ERROR, "Invalid index")
+            if not isinstance(index, decimal.Decimal) or index <= 0 or index + 1 > len(args):
                 return cell_error.CellError(
-                    cell_error.CellErrorType.DIVIDE_BY_ZERO, "input error")
+                    cell_error.CellErrorType.TYPE_ERROR, "Invalid index")
+            with evaluator.reading_by_value():
+                return args[int(index)](evaluator)
+        return evaluate
+
+    def cell(self, children) -> CompiledFormula:
+        self.cellrefs.append(children[-1])
+        # handle different input formats for value
+        if len(children) > 1:  # =[sheet]![col][row]
+            sheet_name = _check_sheet_name(children[0].value)
+            if isinstance(sheet_name, cell_error.CellError):
+                return lambda evaluator: cell_error.CellError(
+                    cell_error.CellErrorType.PARSE_ERROR, "invalid sheet name")
+            self.sheet_names.add(sheet_name)
+        else:  # = [col][row]
+            sheet_name = None
+        reference = to_reference(children[-1].value, self.anchor)
+        self.references.append((sheet_name, reference))
+        if reference[2] and reference[3]:
+            # absolute locations are converted to keys once, when the formula is compiled
+            key = resolve(reference, self.anchor)
+            return lambda evaluator: evaluator.cell(sheet_name, key)
+        return lambda evaluator: evaluator.cell(sheet_name, resolve(reference, evaluator.anchor))
+
+    def cell_range(self, children) -> CompiledFormula:
+        self.cellrefs.extend(children[-2:])
+        if len(children) > 2:  # =[sheet]![col][row]:[col][row]
+            sheet_name = _check_sheet_name(children[0].value)
+            if isinstance(sheet_name, cell_error.CellError):
+                return lambda evaluator: cell_error.CellError(
+                    cell_error.CellErrorType.PARSE_ERROR, "invalid sheet name")
+            self.sheet_names.add(sheet_name)
+        else:  # =[col][row]:[col][row]
+            sheet_name = None
+        references = [to_reference(child.value, self.anchor) for child in children[-2:]]
+
+        def evaluate(evaluator):
+            keys = [resolve(reference, evaluator.anchor) for reference in references]
+            if None in keys:
+                return evaluator.cell_range(sheet_name, None)
+            (col1, row1), (col2, row2) = map(string_conversions.key_to_tuple, keys)
+            return evaluator.cell_range(sheet_name, (min(col1, col2), min(row1, row2),
+                                                     max(col1, col2), max(row1, row2)))
+        self.ranges.add(evaluate)
+        return evaluate
+
+    def parens(self, children) -> CompiledFormula:
+        expression = children[0]
+
+        def evaluate(evaluator):
+            # error literals are converted within parentheses, even inside of IFERROR
+            convert_literal_to_error = evaluator.convert_literal_to_error
+            evaluator.convert_literal_to_error = True
+            value = expression(evaluator)
+            evaluator.convert_literal_to_error = convert_literal_to_error
+            return value
+        return evaluate
+
+    def number(self, children) -> CompiledFormula:
+        number = decimal.Decimal(children[0])
+        if number == decimal.Decimal('NaN'):
+            value = "NaN"
+        elif number == decimal.Decimal('Infinity'):
+            value = "Infinity"
+        else:
+            value = decimal.Decimal(string_conversions.strip_zeros(children[0]))
+        return lambda evaluator: value
+
+    def string(self, children) -> CompiledFormula:
+        value = children[0].value[1:-1]
+        if not string_conversions.str_to_error(value):
+            return lambda evaluator: value
+
+        def evaluate(evaluator):
+            if evaluator.convert_literal_to_error:
+                return string_conversions.str_to_error(value)
+            return value
+        return evaluate
+
+    def boolean(self, children) -> CompiledFormula:
+        value = string_conversions.is_true_expr(children[0].value)
+        return lambda evaluator: value
+
+    def error(self, children) -> CompiledFormula:
+        error_type = {
+            "#ERROR!": cell_error.CellErrorType.PARSE_ERROR,
+            "#CIRCREF!": cell_error.CellErrorType.CIRCULAR_REFERENCE,
+            "#REF!": cell_error.CellErrorType.BAD_REFERENCE,
+            "#NAME?": cell_error.CellErrorType.BAD_NAME,
+            "#VALUE!": cell_error.CellErrorType.TYPE_ERROR,
+            "#DIV/0!": cell_error.CellErrorType.DIVIDE_BY_ZERO,
+        }[children[0].upper()]
+        # errors are mutable, so each evaluation gets its own
+        return lambda evaluator: cell_error.CellError(error_type, "input error")
+
+
+def _mark_lazy(evaluator: FormulaEvaluator) -> None:
+    if evaluator.calling_cell:
+        evaluator.calling_cell.lazy = True
+
+
+def _indirect(evaluator: FormulaEvaluator, func: functions.Function) -> Any:
+    _mark_lazy(evaluator)
+    if len(func.args) != 1:
+        return cell_error.CellError(
+            cell_error.CellErrorType.TYPE_ERROR, "Invalid argument count")
+    if isinstance(func.args[0], unitialized_value.UninitializedValue):
+        return cell_error.CellError(
+            cell_error.CellErrorType.BAD_REFERENCE, "Bad reference")
+    if not isinstance(func.args[0], str):
+        return cell_error.CellError(
+            cell_error.CellErrorType.BAD_REFERENCE, "Bad reference")
+    if '!' in func.args[0]:
+        exclamation_idx = func.args[0].index('!')
+    else:
+        exclamation_idx = -1
+    if not string_conversions.check_valid_location(func.args[0][exclamation_idx + 1:]):
+        return cell_error.CellError(
+            cell_error.CellErrorType.BAD_REFERENCE, "Bad reference")
+    formula = evaluator.wb.formula_cache.get("=" + func.args[0], evaluator.anchor)
+    if formula is None:
+        return cell_error.CellError(
+            cell_error.CellErrorType.BAD_REFERENCE, "Bad reference")
+    with evaluator.reading_by_value():
+        func.args[0] = formula(evaluator)
+    return evaluator.wb.function_directory.call_function(func)
 
 
 @lru_cache(maxsize=None)
 def open_grammar() -> lark.Lark:
-    parser = lark.Lark.open('sheets/formulas.lark', start='formula')
+    """
+    Load the formula parser. The grammar is read from the sheets package, so it doesn't
+    depend on the current working directory. The parser is LALR, and lark serializes the
+    generated parse tables to a cache file on disk so later processes skip building them.
+
+    Returns:
+        lark.Lark: formula parser
+    """
+    parser = lark.Lark.open_from_package(
+        'sheets', 'formulas.lark', start='formula', parser='lalr', cache=True)
     return parser
 
 
-@lru_cache(maxsize=None)
-def get_tree(parser: lark.Lark, contents: str) -> lark.ParseTree:
-    return parser.parse(contents)
+def compile_formula(contents: str, anchor: int = DEFAULT_ANCHOR) -> Optional[CompiledFormula]:
+    """
+    Parse and compile a formula. Compiled formulas only depend on the relative form of the
+    formula, so workbooks cache them in a FormulaCache and share them between cells.
 
+    Args:
+        contents (str): formula starting with "="
+        anchor (int): key of the location of the formula
 
-def evaluate_expr(workbook, curr_cell, sheetname: str,
-                  contents: str) -> tuple[FormulaEvaluator, Any]:
+    Returns:
+        Optional[CompiledFormula]: function evaluating the formula, or None if the formula
+        doesn't parse
+    """
+    try:
+        tree = open_grammar().parse(contents)
+    except UnexpectedInput:
+        return None
+    compiler = FormulaCompiler(anchor)
+    formula = compiler.transform(tree)
+    formula.references = tuple(compiler.references)
+    formula.sheet_names = frozenset(compiler.sheet_names)
+    # the text around the CELLREF tokens, in the order they appear in the formula
+    tokens = sorted(compiler.cellrefs, key=lambda token: token.start_pos)
+    segments = []
+    start = 0
+    for token in tokens:
+        segments.append(contents[start:token.start_pos])
+        start = token.end_pos
+    segments.append(contents[start:])
+    formula.form = (tuple(segments),
+                    tuple(to_reference(token.value, anchor) for token in tokens))
+    return formula
+
+
+def compiled_formula(workbook, curr_cell, contents: str) -> Optional[CompiledFormula]:
     """
-    Evaluate a provided expression using the lark formula parser and evaluator.
+    Get the compiled formula of contents in a cell, which the cell keeps until its
+    contents change, so that only new contents are looked up in the formula cache.
+
+    Args:
+        workbook (Workbook): a workbook object
+        curr_cell (Cell): cell the contents are in, or None
+        contents (str): formula starting with "="
+
+    Returns:
+        Optional[CompiledFormula]: function evaluating the formula, or None if the formula
+        doesn't parse
+    """
+    if curr_cell is None:
+        return workbook.formula_cache.get(contents)
+    if curr_cell.compiled_contents != contents:
+        curr_cell.compiled = workbook.formula_cache.get(contents, curr_cell.key)
+        curr_cell.compiled_contents = contents
+    return curr_cell.compiled
+
+
+def evaluate_expr(workbook, curr_cell, sheetname: str, contents: str,
+                  link_static: bool = True) -> tuple[FormulaEvaluator, Any]:
+    """
+    Evaluate a provided expression using the compiled formula and an evaluator.
 
     Args:
         workbook (Workbook): a workbook object
         curr_cell (Cell): cell to evaluate within
         sheetname (str): name of the sheet we are working in
         contents (str): contents of the cell to parse
+        link_static (bool): whether to track the cells that the formula reads whatever the
+        values are, which is only needed when the contents are new
 
     Returns:
-        FormulaEvaluator, Any: Evaluator object and provided value 
+        FormulaEvaluator, Any: Evaluator object and provided value
     """
     if sheetname.lower() not in workbook.spreadsheets:
         return None, cell_error.CellError(
             cell_error.CellErrorType.BAD_REFERENCE, "bad reference")
     sheet = workbook.spreadsheets[sheetname.lower()]
-    evaluator = FormulaEvaluator(workbook, sheet, curr_cell)
-    parser = open_grammar()
-    evaluator.parser = parser
-    try:
-        tree = get_tree(parser, contents)
-    except UnexpectedInput:
+    evaluator = FormulaEvaluator(workbook, sheet, curr_cell, link_static)
+    formula = compiled_formula(workbook, curr_cell, contents)
+    if formula is None:
         return evaluator, cell_error.CellError(
             cell_error.CellErrorType.PARSE_ERROR, "parse error")
-    value = evaluator.visit(tree)
+    value = formula(evaluator)
     return evaluator, value
@@ -0,0 +1,134 @@
+"""Index of the rectangular cell ranges that formulas read, for finding the ranges a
+location falls in without expanding them into per-cell dependencies."""
+from typing import Dict, Iterator, List, Set, Tuple
+from sheets import string_conversions
+
+# columns go up to ZZZZ (475254), which needs 19 bits
+COL_BITS = 19
+
+# (top left col, top left row, bottom right col, bottom right row) of a range
+Corners = Tuple[int, int, int, int]
+
+
+def segments(low: int, high: int, bits: int) -> Iterator[int]:
+    """
+    Nodes of a segment tree over the positions [0, 2 ** bits) that exactly cover the
+    positions [low, high]. Node 1 is the root, node n has children 2n and 2n + 1, and
+    position p is the leaf 2 ** bits + p. There are at most 2 * bits such nodes.
+    """
+    low += 1 << bits
+    high += (1 << bits) + 1
+    while low < high:
+        if low & 1:
+            yield low
+            low += 1
+        if high & 1:
+            high -= 1
+            yield high
+        low >>= 1
+        high >>= 1
+
+
+def ancestors(position: int, bits: int) -> Iterator[int]:
+    """
+    Nodes of a segment tree over the positions [0, 2 ** bits) whose interval contains
+    the given position, from its leaf up to the root.
+    """
+    node = position + (1 << bits)
+    while node:
+        yield node
+        node >>= 1
+
+
+class RangeNode:
+    """
+    A range of cells read by at least one formula, as a node of the dependency graph.
+    Formulas reading the range depend on the node. Cells within the range only have an
+    edge into the node if they have precedents of their own, so that levels and cycles
+    account for them; every other change within the range is found through a RangeIndex.
+    """
+
+    __slots__ = ("sheet", "corners", "node_id")
+
+    # ranges have no contents, value or type of their own
+    key = None
+    contents = None
+    value = None
+    cell_type = None
+    lazy = False
+
+    def __init__(self, sheet, corners: Corners):
+        self.sheet = sheet
+        self.corners = corners
+        self.node_id = None
+
+    def __repr__(self):
+        col1, row1, col2, row2 = self.corners
+        return f"RangeNode({self.sheet.name}!{string_conversions.num_to_col(col1)}{row1}:" \
+            f"{string_conversions.num_to_col(col2)}{row2})"
+
+
+class RangeIndex:
+    """
+    Two dimensional segment tree per sheet from locations to the ranges covering them.
+    A range is stored under the canonical nodes of its columns, and within each of those
+    under the canonical nodes of its rows, so adding or removing a range touches
+    O(log C * log R) entries and a location is looked up by walking the ancestors of its
+    column and row leaves, regardless of the size of the ranges.
+    """
+
+    def __init__(self):
+        # Sheet -> {column tree node: {row tree node: {node ids of ranges}}}
+        self.sheets: Dict[object, Dict[int, Dict[int, Set[int]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.sheets)
+
+    def add(self, sheet, corners: Corners, node_id: int) -> None:
+        """
+        Record that the range with the given corners on sheet has the given node id.
+        """
+        col1, row1, col2, row2 = corners
+        columns = self.sheets.setdefault(sheet, {})
+        for col_node in segments(col1, col2, COL_BITS):
+            rows = columns.setdefault(col_node, {})
+            for row_node in segments(row1, row2, string_conversions.ROW_BITS):
+                rows.setdefault(row_node, set()).add(node_id)
+
+    def remove(self, sheet, corners: Corners, node_id: int) -> None:
+        """
+        Forget a range recorded by add().
+        """
+        col1, row1, col2, row2 = corners
+        columns = self.sheets[sheet]
+        for col_node in segments(col1, col2, COL_BITS):
+            rows = columns[col_node]
+            for row_node in segments(row1, row2, string_conversions.ROW_BITS):
+                ids = rows[row_node]
+                ids.discard(node_id)
+                if not ids:
+                    del rows[row_node]
+            if not rows:
+                del columns[col_node]
+        if not columns:
+            del self.sheets[sheet]
+
+    def query(self, sheet, key: int) -> List[int]:
+        """
+        Node ids of the ranges on sheet that contain the location given by key. Each
+        range is returned once, since exactly one of its entries covers a location.
+        """
+        columns = self.sheets.get(sheet)
+        if columns is None:
+            return []
+        found = []
+        row = key & string_conversions.ROW_MASK
+        for col_node in ancestors(key >> string_conversions.ROW_BITS, COL_BITS):
+            rows = columns.get(col_node)
+            if rows is None:
+                continue
+            for row_node in ancestors(row, string_conversions.ROW_BITS):
+                ids = rows.get(row_node)
+                if ids:
+                    found.extend(ids)
+        return found
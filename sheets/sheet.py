@@ -1,7 +1,10 @@
 """Class that stores Cell objects that are all in the same spreadsheet."""
 import uuid
-from typing import Dict
-from sheets import cell
+from typing import Any, Dict, Optional
+from sheets import cell, string_conversions
+from sheets.column_aggregate import ColumnAggregate
+from sheets.column_lookup import ColumnLookup
+from sheets.column_store import ColumnStore
 
 
 class Sheet:
@@ -9,6 +12,13 @@ class Sheet:
     Sheet class contains mapping of locations to Cell objects.
     Each sheet gets a unique ID for hashing purposes to check equality.
     Sheets track the extent of rows and columns.
+
+    A columnar sheet keeps the contents of literal cells that no formula reads in a
+    ColumnStore instead of as Cell objects, and creates their Cell objects when needed.
+
+    Columns read by aggregate functions such as SUM get a ColumnAggregate, and columns
+    searched by lookup functions such as VLOOKUP get a ColumnLookup. The workbook updates
+    both through update_column_indexes() whenever a value in them changes.
     """
 
     def __eq__(self, obj):
@@ -17,7 +27,7 @@ class Sheet:
     def __hash__(self):
         return hash(str(self.uuid))
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, columnar: bool = False):
         """
         Initialize an empty sheet object with a given name. This sheet has a
         current extent of (0, 0) and empty dictionary of cell locations to Cell
@@ -25,10 +35,103 @@ class Sheet:
 
         Args:
             name (str): name of the spreadsheet object.
+            columnar (bool): whether literal cells are stored column by column.
         """
         self.name = name
         self.extent_row = 0
         self.extent_col = 0
-        # {'A1': Cell} UPPERCASE location to cell
-        self.cells: Dict[str, cell.Cell] = {}
+        # {key: Cell} location packed by string_conversions.to_key() to cell
+        self.cells: Dict[int, cell.Cell] = {}
         self.uuid: uuid.UUID = uuid.uuid1()
+        # contents of literal cells without a Cell object, for columnar sheets. A location
+        # is never in both cells and columns.
+        self.columns: Optional[ColumnStore] = ColumnStore() if columnar else None
+        # {column number: ColumnAggregate} for the columns that have been aggregated
+        self.aggregates: Dict[int, ColumnAggregate] = {}
+        # {column number: ColumnLookup} for the columns that have been searched
+        self.lookups: Dict[int, ColumnLookup] = {}
+
+    def materialize(self, key: int) -> Optional[cell.Cell]:
+        """
+        Create the Cell object of a location whose contents are stored in columns.
+
+        Args:
+            key (int): location of the cell packed by string_conversions.to_key()
+
+        Returns:
+            Optional[Cell]: the cell at the location, or None if it is empty
+        """
+        if self.columns is not None and key in self.columns:
+            contents = self.columns.pop(key)
+            value, cell_type = cell.literal_value(contents)
+            self.cells[key] = cell.Cell(self, key, contents, value, cell_type)
+        return self.cells.get(key)
+
+    def aggregate(self, col: int) -> ColumnAggregate:
+        """
+        Get the aggregate of a column, building it from the column's values the first
+        time it is needed.
+
+        Args:
+            col (int): column number
+
+        Returns:
+            ColumnAggregate: aggregate of the values in the column
+        """
+        aggregate = self.aggregates.get(col)
+        if aggregate is None:
+            aggregate = self.aggregates[col] = ColumnAggregate(self.__column_values(col))
+        return aggregate
+
+    def lookup(self, col: int) -> ColumnLookup:
+        """
+        Get the lookup index of a column, building it from the column's values the first
+        time it is needed.
+
+        Args:
+            col (int): column number
+
+        Returns:
+            ColumnLookup: index of the values in the column
+        """
+        lookup = self.lookups.get(col)
+        if lookup is None:
+            lookup = self.lookups[col] = ColumnLookup(self.__column_values(col))
+        return lookup
+
+    def __column_values(self, col: int) -> Dict[int, Any]:
+        """
+        Values of the non-empty cells in a column, by row.
+        """
+        values = {}
+        if self.extent_row < len(self.cells):
+            for row in range(1, self.extent_row + 1):
+                c = self.cells.get(string_conversions.to_key(col, row))
+                if c is not None and c.value is not None:
+                    values[row] = c.value
+        else:
+            for key, c in self.cells.items():
+                if key >> string_conversions.ROW_BITS == col and c.value is not None:
+                    values[key & string_conversions.ROW_MASK] = c.value
+        column = self.columns.columns.get(col) if self.columns is not None else None
+        if column is not None:
+            for row in column.rows():
+                values[row] = cell.literal_value(column.get(row))[0]
+        return values
+
+    def update_column_indexes(self, key: int, value: Any) -> None:
+        """
+        Record the new value of a location in the aggregate and lookup index of its
+        column, if it has them.
+
+        Args:
+            key (int): location packed by string_conversions.to_key()
+            value (Any): value of the location, or None if it is empty
+        """
+        col = key >> string_conversions.ROW_BITS
+        aggregate = self.aggregates.get(col)
+        if aggregate is not None:
+            aggregate.set(key & string_conversions.ROW_MASK, value)
+        lookup = self.lookups.get(col)
+        if lookup is not None:
+            lookup.set(key & string_conversions.ROW_MASK, value)
@@ -11,6 +11,13 @@ from sheets import cell_error, unitialized_value
 
 ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 COMPARISON_OPERATORS = ["=", "==", "<>", "!=", ">", "<", ">=", "<="]
+# Cells are keyed within a sheet by their coordinates packed into one int,
+# (col << ROW_BITS) | row. Rows go up to 9999, which needs 14 bits.
+ROW_BITS = 14
+ROW_MASK = (1 << ROW_BITS) - 1
+# largest column (ZZZZ) and row of a location
+MAX_COL = 475254
+MAX_ROW = 9999
 
 
 @cache
@@ -43,6 +50,60 @@ def str_to_tuple(location: str) -> Tuple[int, int]:
     return (cols, rows)
 
 
+def to_key(col: int, row: int) -> int:
+    """
+    Pack integer coordinates into the key of a cell within its sheet.
+
+    Args:
+        col (int): column number, starting from 1 for A
+        row (int): row number, starting from 1
+
+    Returns:
+        int: key of the location
+    """
+    return (col << ROW_BITS) | row
+
+
+def key_to_tuple(key: int) -> Tuple[int, int]:
+    """
+    Unpack the key of a cell into its integer coordinates.
+
+    Args:
+        key (int): key of a location
+
+    Returns:
+        Tuple[int, int]: column and row of the location
+    """
+    return key >> ROW_BITS, key & ROW_MASK
+
+
+def location_to_key(location: str) -> int:
+    """
+    Convert a string location such as A1 or $B$2 into the key of a cell within its sheet.
+
+    Args:
+        location (str): string location on the sheet
+
+    Returns:
+        int: key of the location
+    """
+    col, row = str_to_tuple(location)
+    return (col << ROW_BITS) | row
+
+
+def key_to_location(key: int) -> str:
+    """
+    Convert the key of a cell back into an upper-case string location such as A1.
+
+    Args:
+        key (int): key of a location
+
+    Returns:
+        str: string location on the sheet
+    """
+    return num_to_col(key >> ROW_BITS) + str(key & ROW_MASK)
+
+
 def col_to_num(location: str) -> Tuple[int, int]:
     """
     Take in a string column ranging from A to ZZZZ and return the 
@@ -179,7 +240,7 @@ def check_valid_location(location: str) -> bool:
     if not re.match(r'(?<!")\$?[A-Za-z]+\$?[1-9][0-9]*(?!")', location):
         return False
     col, row = str_to_tuple(location)
-    if col > 475254 or row > 9999:
+    if col > MAX_COL or row > MAX_ROW:
         return False
     if len(location.strip()) != len(location):
         return False
@@ -1,62 +1,74 @@
-"""This module topologically sorts a graph of Cells."""
-import enum
-from typing import Dict, List
+"""This module finds the strongly connected components of a graph of Cells."""
+from typing import Iterable, List, Sequence, Set
 from sheets.cell import Cell
 
 
-class DFSState(enum.Enum):
+def strongly_connected_components(roots: Iterable[int],
+                                  dependents: Sequence[Set[int]]) -> List[List[int]]:
     """
-    Enum used to determine if topo sort is visiting a Cell for the first time.
-    """
-    NEW_RECURSIVE_CALL = 1
-    PREV_RECURSIVE_CALL = 2
+    Run Tarjan's algorithm over every node reachable from the given roots.
+
+    Args:
+        roots (Iterable[int]): node ids to start the search from
+        dependents (Sequence[Set[int]]): node id -> ids of the nodes it points to
 
-def tarjan(cell, graph: Dict[Cell, List[Cell]]) -> List[List[Cell]]:
+    Returns:
+        List[List[int]]: strongly connected components in reverse topological order
+    """
     ret = []
     idx = 0
     stack = []
-    stack_set = set()
+    on_stack = set()
     index_dict = {}
     lowlink_dict = {}
-    call_stack = [(cell, DFSState.NEW_RECURSIVE_CALL, 0)]
-    call_set = set([(cell, DFSState.NEW_RECURSIVE_CALL, 0)])
-
-    while call_stack:
-        v, recursion_state, recursion_idx = call_stack.pop()
-        call_set.remove((v, recursion_state, recursion_idx))
-
-        if recursion_state == DFSState.NEW_RECURSIVE_CALL:
-            # Setting the depth index for v to the smallest unused index
-            index_dict[v] = idx
-            lowlink_dict[v] = idx
-            idx += 1
-
-            stack.append(v)
-            stack_set.add(v)
-        elif recursion_state == DFSState.PREV_RECURSIVE_CALL:
-            recursive_vertex = graph[v][recursion_idx]
-            lowlink_dict[v] = min(lowlink_dict[v], lowlink_dict[recursive_vertex])
-            recursion_idx += 1
-        while recursion_idx < len(graph[v]):
-            if graph[v][recursion_idx] in index_dict:
-                w = graph[v][recursion_idx]
-                if w in stack_set:
+    for root in roots:
+        if root in index_dict:
+            continue
+        index_dict[root] = lowlink_dict[root] = idx
+        idx += 1
+        stack.append(root)
+        on_stack.add(root)
+        call_stack = [(root, iter(dependents[root]))]
+        while call_stack:
+            v, neighbors = call_stack[-1]
+            for w in neighbors:
+                if w not in index_dict:
+                    # recurse into w, resuming v's neighbors afterwards
+                    index_dict[w] = lowlink_dict[w] = idx
+                    idx += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    call_stack.append((w, iter(dependents[w])))
+                    break
+                if w in on_stack:
                     lowlink_dict[v] = min(lowlink_dict[v], index_dict[w])
-                recursion_idx += 1
             else:
-                break
-        if recursion_idx < len(graph[v]):
-            w = graph[v][recursion_idx]
-            call_stack.append((v, DFSState.PREV_RECURSIVE_CALL, recursion_idx))
-            call_set.add((v, DFSState.PREV_RECURSIVE_CALL, recursion_idx))
-            call_stack.append((w, DFSState.NEW_RECURSIVE_CALL, 0))
-            call_set.add((w, DFSState.NEW_RECURSIVE_CALL, 0))
-        if recursion_idx == len(graph[v]) and lowlink_dict[v] == index_dict[v]:
-            scc = []
-            w = None
-            while w != v:
-                w = stack.pop()
-                stack_set.remove(w)
-                scc.append(w)
-            ret.append(scc)
+                call_stack.pop()
+                if call_stack:
+                    parent = call_stack[-1][0]
+                    lowlink_dict[parent] = min(lowlink_dict[parent], lowlink_dict[v])
+                if lowlink_dict[v] == index_dict[v]:
+                    scc = []
+                    w = None
+                    while w != v:
+                        w = stack.pop()
+                        on_stack.remove(w)
+                        scc.append(w)
+                    ret.append(scc)
     return ret
+
+
+def tarjan(cell: Cell, graph) -> List[List[Cell]]:
+    """
+    Find the strongly connected components of every cell reachable from a cell.
+
+    Args:
+        cell (Cell): Cell to start the search on.
+        graph (DependencyGraph): graph of cell dependencies
+
+    Returns:
+        List[List[Cell]]: strongly connected components in reverse topological order
+    """
+    graph.add_cell(cell)
+    components = strongly_connected_components([cell.node_id], graph.dependents)
+    return [graph.cells_of(scc) for scc in components]
@@ -1,6 +1,6 @@
 """This module topologically sorts a graph of Cells."""
 import enum
-from typing import Tuple, Dict, List
+from typing import Tuple, List
 from sheets.cell import Cell
 
 
@@ -12,37 +12,36 @@ class DFSState(enum.Enum):
     LEAVE = 2
 
 
-def topo_sort(cell: Cell, graph: Dict[Cell, List[Cell]]) -> Tuple[bool, List[Cell]]:
+def topo_sort(cell: Cell, graph) -> Tuple[bool, List[Cell]]:
     """
     Perform a topological sort on all neighbors of the specified starting cell.
 
     Args:
         v (Cell): Cell to start the topological sort on.
-        graph (Dict): Representation of a graph through an adjacency list. 
+        graph (DependencyGraph): graph of cell dependencies
 
     Returns:
         Tuple[bool, list[Cell]]: Boolean indicating if the cell is part of a 
         cycle and the corresponding ordered list of topologically sorted cells.
     """
-    call_stack = [(cell, DFSState.ENTER)]
-    call_set = set()
+    call_stack = [(graph.add_cell(cell), DFSState.ENTER)]
+    leaving = set()
     result = []
     visited = set()
     circular = False
     while call_stack:
         v, cell_state = call_stack.pop()
-        if (v.location, v.sheet, DFSState.LEAVE) in call_set:
-            call_set.remove((v.location, v.sheet, DFSState.LEAVE))
+        leaving.discard(v)
         if cell_state == DFSState.ENTER:
-            visited.add((v.sheet, v.location))
+            visited.add(v)
             call_stack.append((v, DFSState.LEAVE))
-            call_set.add((v.location, v.sheet, DFSState.LEAVE))
-            for w in graph[v]:
-                if (w.sheet, w.location) not in visited:
+            leaving.add(v)
+            for w in graph.dependents[v]:
+                if w not in visited:
                     call_stack.append((w, DFSState.ENTER))
-                if (w.location, w.sheet, DFSState.LEAVE) in call_set:
+                if w in leaving:
                     circular = True
                     break
         else:
             result.append(v)
-    return circular, result[::-1]
+    return circular, graph.cells_of(result[::-1])
@@ -1,17 +1,24 @@
 """Workbook API. Contains spreadsheet functions accessible to public users."""
 from __future__ import annotations
-from typing import Tuple, List, Optional, Any, TextIO, Callable, Iterable, Dict, Set
+from typing import Tuple, List, Optional, Any, TextIO, Callable, Iterable, Iterator, Dict, Set, \
+    FrozenSet
 from copy import deepcopy
 from decimal import Decimal
+import heapq
 import json
 import re
-from functools import cmp_to_key
+import weakref
 from contextlib import contextmanager, suppress
-from sheets import cell, topo_sort, cell_error, lark_module, sheet, \
-    string_conversions, unitialized_value, tarjan
+from sheets import cell, cell_error, lark_module, sheet, \
+    string_conversions, unitialized_value
+from sheets.dependency_graph import DependencyGraph
+from sheets.range_index import RangeNode
+from sheets.formula_cache import FormulaCache, DEFAULT_FORMULA_CACHE_SIZE
+from sheets.formula_template import render, resolve
+from sheets.json_reader import JsonReader
+from sheets.tarjan import strongly_connected_components
 from sheets.functions import FunctionDirectory
-from sheets.workbook_utils import check_valid_sheet_name, update_extent, compare, \
-    create_row_list, update_all_block_contents
+from sheets.workbook_utils import check_valid_sheet_name, update_extent, sorted_rows
 
 
 class Workbook:
@@ -22,11 +29,12 @@ class Workbook:
     values should cause the workbook's contents to be updated properly.
     """
 
-    def __init__(self):
+    def __init__(self, formula_cache_size: Optional[int] = DEFAULT_FORMULA_CACHE_SIZE):
         # lower case name -> sheet object
         self.spreadsheets: Dict[str, sheet.Sheet] = {}
-        # Cell: [neighbor Cells]; neighbors are cells that depend on Cell
-        self.adjacency_list: Dict[cell.Cell, List[cell.Cell]] = {}
+        # Graph of cell dependencies. Each Cell points to the cells that depend on it and
+        # also records its precedents, the cells that it reads.
+        self.graph: DependencyGraph = DependencyGraph()
         # notify functions = set of user-inputted notify functions
         self.notify_functions: List[Callable[[
             Workbook, Iterable[Tuple[str, str]]], None]] = []
@@ -35,6 +43,28 @@ class Workbook:
         self.__call_notify: bool = True
         # Directory of defined functions callable within cells
         self.function_directory: FunctionDirectory = FunctionDirectory()
+        # Least recently used cache of compiled formulas, keyed by formula text
+        self.formula_cache: FormulaCache = FormulaCache(formula_cache_size)
+        # Cells edited inside batch() whose contents haven't been evaluated yet, or None
+        # if set_cell_contents() evaluates each edit straight away
+        self.__pending: Optional[Dict[cell.Cell, None]] = None
+        # Number of nested batch() blocks, and the cells to report when the outermost
+        # one ends, keyed by sheet and location so each cell is reported once
+        self.__batch_depth: int = 0
+        self.__batch_changed: Dict[Tuple[int, int], cell.Cell] = {}
+        # Locations of columnar sheets set inside batch() without a Cell object, keyed
+        # like __batch_changed, with their values before they were first set and whether
+        # they were already going to be reported then
+        self.__batch_columns: Dict[Tuple[int, int],
+                                   Tuple[sheet.Sheet, int, Tuple[Any, Any], bool]] = {}
+        # Whether literals set on columnar sheets are stored in their columns rather than
+        # as Cell objects. Off while a block of cells is edited cell by cell.
+        self.__store_in_columns: bool = True
+        # lower case name -> formula cells whose references name the sheet, whether or not
+        # it exists, so that renaming a sheet only visits the formulas mentioning it
+        self.__sheet_references: Dict[str, Dict[cell.Cell, None]] = {}
+        # formula cell -> lower case names of the sheets it names, for cells naming any
+        self.__referenced_sheets: Dict[cell.Cell, FrozenSet[str]] = {}
 
     @contextmanager
     def __disable_notify_calls(self):
@@ -45,6 +75,279 @@ class Workbook:
         yield
         self.__call_notify = True
 
+    @contextmanager
+    def __evaluate_immediately(self):
+        """
+        Evaluate edits as they are made, even inside batch(). Used by operations that read
+        cell values between their own edits.
+        """
+        self.__evaluate_pending()
+        pending = self.__pending
+        self.__pending = None
+        try:
+            yield
+        finally:
+            self.__pending = pending
+
+    @contextmanager
+    def __evaluate_together(self) -> Iterator[List[cell.Cell]]:
+        """
+        Store the edits made inside it without evaluating them, then evaluate every edited
+        cell in a single pass, as batch() does but without notifying. Used by operations
+        that edit a block of cells and report the changes themselves. Inside batch() the
+        edits are left for the batch to evaluate.
+
+        Yields:
+            List[Cell]: list that the cells whose values changed are added to once the
+            edits are evaluated, which stays empty inside batch()
+        """
+        changed_cells = []
+        if self.__pending is not None:
+            yield changed_cells
+            return
+        self.__pending = {}
+        try:
+            yield changed_cells
+        finally:
+            try:
+                changed_cells += self.__evaluate_pending(notify=False)
+            finally:
+                self.__pending = None
+
+    @contextmanager
+    def __materialized(self, regions: List[Tuple[sheet.Sheet, Tuple[int, int, int, int]]]):
+        """
+        Give every cell in the given regions of columnar sheets a Cell object while the
+        regions are edited cell by cell, and store the literals that no formula reads in
+        columns again afterwards.
+
+        Args:
+            regions (List[Tuple[Sheet, Tuple[int, int, int, int]]]): sheets and corners
+            (top left col, top left row, bottom right col, bottom right row) of regions
+        """
+        regions = [(spreadsheet, corners) for spreadsheet, corners in regions
+                   if spreadsheet.columns is not None]
+        if not regions:
+            yield
+            return
+        for spreadsheet, corners in regions:
+            for key in spreadsheet.columns.keys_in(*corners):
+                spreadsheet.materialize(key)
+        self.__store_in_columns = False
+        try:
+            yield
+        finally:
+            self.__store_in_columns = True
+            # inside batch() the cells stay as they are, so their changes are reported
+            # against their values before the batch
+            if not self.__batch_depth:
+                for spreadsheet, corners in regions:
+                    self.__store_literals(spreadsheet, corners)
+
+    def __store_literals(self, spreadsheet: sheet.Sheet,
+                         corners: Tuple[int, int, int, int]) -> None:
+        """
+        Move literal cells of a columnar sheet that no formula reads from Cell objects
+        into the sheet's columns.
+
+        Args:
+            spreadsheet (Sheet): columnar sheet
+            corners (Tuple[int, int, int, int]): (top left col, top left row, bottom right
+            col, bottom right row) of the region to store
+        """
+        top_left_col, top_left_row, bottom_right_col, bottom_right_row = corners
+        for key, c in list(spreadsheet.cells.items()):
+            col, row = string_conversions.key_to_tuple(key)
+            if top_left_col <= col <= bottom_right_col and \
+                    top_left_row <= row <= bottom_right_row and \
+                    c.cell_type not in (None, cell.CellType.EMPTY, cell.CellType.FORMULA) \
+                    and not self.graph.has_dependents(c):
+                del spreadsheet.cells[key]
+                self.graph.remove_cell(c)
+                spreadsheet.columns.set(key, c.contents)
+
+    def __set_column_contents(self, spreadsheet: sheet.Sheet, key: int,
+                              contents: Optional[str]) -> bool:
+        """
+        Set the contents of a location of a columnar sheet that has no Cell object. No
+        formula reads such a location directly, so storing a literal only changes the
+        formulas reading a range that contains it.
+
+        Args:
+            spreadsheet (Sheet): columnar sheet
+            key (int): location of the cell packed by string_conversions.to_key()
+            contents (Optional[str]): stripped contents of the cell
+
+        Returns:
+            bool: whether the contents were stored, or the cell needs a Cell object
+            instead (formulas, and emptying a location that is already empty)
+        """
+        columns = spreadsheet.columns
+        old_contents = columns.get(key)
+        if contents and contents[0] == "=":
+            if old_contents is not None:
+                spreadsheet.materialize(key)
+            return False
+        if not contents:
+            if old_contents is None:
+                return False
+            columns.pop(key)
+            update_extent(spreadsheet, key, True)
+            spreadsheet.update_column_indexes(key, None)
+        else:
+            columns.set(key, contents)
+            update_extent(spreadsheet, key, False)
+            spreadsheet.update_column_indexes(key, cell.literal_value(contents)[0])
+        range_ids = self.graph.ranges.query(spreadsheet, key) if self.graph.ranges else []
+        if range_ids and self.__pending is not None:
+            for range_id in range_ids:
+                for c in self.graph.cells_of(self.graph.dependents[range_id]):
+                    self.__pending[c] = None
+            range_ids = []
+        if not self.notify_functions:
+            self.__recalculate(self.graph.cells_of(range_ids))
+            return True
+        old_state = (None, None) if old_contents is None else cell.literal_value(old_contents)
+        if self.__batch_depth:
+            # reported when the batch ends if the value differs from the one before it
+            batch_key = (id(spreadsheet), key)
+            if batch_key not in self.__batch_columns:
+                self.__batch_columns[batch_key] = \
+                    (spreadsheet, key, old_state, batch_key in self.__batch_changed)
+                self.__batch_changed.setdefault(
+                    batch_key, cell.Cell(spreadsheet, key, None, None, None))
+            changed_cells = []
+        elif self.__states_differ(self.__cell_state(spreadsheet, key), old_state):
+            changed_cells = [cell.Cell(spreadsheet, key, contents, None, None)]
+        else:
+            changed_cells = []
+        changed_cells += self.__recalculate(self.graph.cells_of(range_ids))
+        if self.__call_notify:
+            self.__generate_notifications(changed_cells)
+        return True
+
+    def __defer_cell_contents(self, spreadsheet: sheet.Sheet, key: int,
+                              contents: Optional[str],
+                              compiled: Optional[lark_module.CompiledFormula]) -> None:
+        """
+        Store the contents of a cell edited inside batch() without evaluating it.
+        """
+        if key in spreadsheet.cells:
+            c = spreadsheet.cells[key]
+            c.contents = contents
+        elif contents:
+            c = cell.Cell(spreadsheet, key, contents, None, None)
+            spreadsheet.cells[key] = c
+        else:
+            # an empty cell that doesn't exist stays that way
+            return
+        if compiled is not None:
+            c.compiled = compiled
+            c.compiled_contents = contents
+        update_extent(spreadsheet, key, False)
+        self.__pending[c] = None
+
+    def __set_cell_contents(self, spreadsheet: sheet.Sheet, key: int,
+                            contents: Optional[str],
+                            compiled: Optional[lark_module.CompiledFormula] = None) -> None:
+        """
+        Set the contents of the cell at a location given by its key, as with
+        set_cell_contents(). A formula copied from another cell can be given the compiled
+        formula it shares with that cell, so it isn't looked up in the formula cache.
+        """
+        if contents:
+            contents = contents.strip()
+        if spreadsheet.columns is not None and self.__store_in_columns \
+                and key not in spreadsheet.cells \
+                and self.__set_column_contents(spreadsheet, key, contents):
+            return
+        if self.__pending is not None:
+            self.__defer_cell_contents(spreadsheet, key, contents, compiled)
+            return
+        # if cell already exists (modify contents)
+        if key in spreadsheet.cells:
+            existing_cell = spreadsheet.cells[key]
+            existing_cell.contents = contents
+            if compiled is not None:
+                existing_cell.compiled = compiled
+                existing_cell.compiled_contents = contents
+            cell_dependents = self.__recalculate([existing_cell])
+            if existing_cell.cell_type == cell.CellType.EMPTY:
+                # if existing cell doesn't have neighbors, no cell relies on it
+                # -> delete cell from spreadsheet
+                if not self.graph.has_dependents(existing_cell):
+                    del spreadsheet.cells[key]
+                    self.graph.remove_cell(existing_cell)
+                    update_extent(spreadsheet, key, True)
+                    if self.__call_notify:
+                        self.__generate_notifications(cell_dependents or [existing_cell])
+                    return
+            update_extent(spreadsheet, key, False)
+            # cell_dependents includes the existing cell iff its value is updated
+            if self.__call_notify and cell_dependents:
+                self.__generate_notifications(cell_dependents)
+        else:  # if cell does not exist (create contents)
+            new_cell = cell.Cell(spreadsheet, key, contents, None, None)
+            if compiled is not None:
+                new_cell.compiled = compiled
+                new_cell.compiled_contents = contents
+            # formulas reading a range can depend on a cell that doesn't exist yet
+            changed_cells = [new_cell]
+            if contents:
+                spreadsheet.cells[key] = new_cell
+                changed_cells = self.__recalculate([new_cell]) or changed_cells
+            else:
+                self.__set_cell_value_and_type(new_cell)
+            update_extent(spreadsheet, key, False)
+            if self.__call_notify:
+                self.__generate_notifications(changed_cells)
+
+    def __get_cell_value(self, spreadsheet: sheet.Sheet, key: int) -> Any:
+        """
+        Get the value of the cell at a location given by its key, as with get_cell_value().
+        """
+        self.__evaluate_pending()
+        if key in spreadsheet.cells:
+            if isinstance(spreadsheet.cells[key].value, unitialized_value.UninitializedValue):
+                return Decimal(0)
+            return spreadsheet.cells[key].value
+        if spreadsheet.columns is not None and key in spreadsheet.columns:
+            return cell.literal_value(spreadsheet.columns.get(key))[0]
+        return None
+
+    def __evaluate_pending(self, notify: bool = True) -> List[cell.Cell]:
+        """
+        Evaluate every cell edited inside batch() since the last evaluation in a single
+        pass, and remove the cells that were emptied.
+
+        Args:
+            notify (bool): whether to report the cells whose values changed
+
+        Returns:
+            List[Cell]: cells whose values changed
+        """
+        if not self.__pending:
+            return []
+        pending = list(self.__pending)
+        self.__pending.clear()
+        # cells that have never been evaluated were created since the last evaluation
+        created = {c for c in pending if c.cell_type is None}
+        changed_cells = self.__recalculate(pending)
+        removed = set()
+        for c in pending:
+            spreadsheet = c.sheet
+            if c.cell_type == cell.CellType.EMPTY and not self.graph.has_dependents(c) \
+                    and spreadsheet.cells.get(c.key) is c:
+                del spreadsheet.cells[c.key]
+                self.graph.remove_cell(c)
+                update_extent(spreadsheet, c.key, True)
+                removed.add(c)
+        # a cell that was created and emptied again never had a value to report
+        changed_cells = [c for c in changed_cells if c not in created or c not in removed]
+        if notify:
+            self.__generate_notifications(changed_cells)
+        return changed_cells
+
     def __generate_notifications(self, cell_list: Iterable[cell.Cell]):
         """Given a list of cells, create a corresponding list of tuples containing
         each cell's sheet name and location. Then, call each registered notify
@@ -55,51 +358,74 @@ class Workbook:
         """
         if cell_list == [] or len(cell_list) == 0:
             return
+        if self.__batch_depth:
+            # report each cell once, when the batch ends
+            for c in cell_list:
+                self.__batch_changed.setdefault((id(c.sheet), c.key), c)
+            return
         changed_cells = [(c.sheet.name, c.location) for c in cell_list]
         for notify_function in self.notify_functions:
+            # each notify function gets its own view, so changes made through one view
+            # aren't seen by the other notify functions
+            view = WorkbookView(self)
             with suppress(Exception):
-                notify_function(deepcopy(self), changed_cells)
+                notify_function(view, changed_cells)
+            # a notify function that kept the view must not see later changes
+            view_ref = weakref.ref(view)
+            del view
+            if view_ref() is not None:
+                view_ref().snapshot()
 
-    def __set_cell_value_and_type(self, calling_cell: cell.Cell) -> Tuple[list, bool]:
+    def __set_cell_value_and_type(self, calling_cell: cell.Cell,
+                                  relink: bool = True) -> Tuple[bool, bool]:
         """
-        Sets cells value and type based on cell's contents field
+        Sets cells value and type based on cell's contents field, and links the cell to
+        the cells it reads in the dependency graph.
 
         Args:
             calling_cell (Cell): Cell object that we assume has contents set correctly.
+            relink (bool): whether the cell's contents or the sheets it refers to may have
+            changed since it was last evaluated. Otherwise, the cell still reads the same
+            cells apart from those it chooses to read by value, so only those are rewired.
 
         Returns:
-            list: cells that the calling cell relies on.
+            bool: if the cells that the calling cell relies on changed
             bool: if the value of the calling cell changed
         """
         cell_contents = calling_cell.contents
         calling_cell.lazy = False
         relies_on = []
+        dynamic = []
+        sheet_names = frozenset()
         # determine the new type of our cell and set its value accordingly
         if not cell_contents or len(cell_contents) == 0:
             val = None
             cell_type = cell.CellType.EMPTY
-        elif string_conversions.str_to_error(cell_contents):  # type error
-            val = string_conversions.str_to_error(cell_contents)
-            cell_type = cell.CellType.ERROR
-        elif cell_contents[0] == "'":
-            val = cell_contents[1:]
-            cell_type = cell.CellType.STRING
         elif cell_contents[0] == "=":
             evaluator, val = lark_module.evaluate_expr(
-                self, calling_cell, calling_cell.sheet.name, cell_contents)
+                self, calling_cell, calling_cell.sheet.name, cell_contents, relink)
             cell_type = cell.CellType.FORMULA
+            if isinstance(val, cell_error.CellError) and val.circref_type:
+                # a formula reading itself is a cycle of its own, which cells reading it
+                # see as an inherited circular reference, as with __set_circular()
+                val = cell_error.CellError(
+                    cell_error.CellErrorType.CIRCULAR_REFERENCE, "circular reference")
             if evaluator:
                 relies_on = evaluator.calling_cell_relies_on
-        elif string_conversions.is_bool_expr(cell_contents):
-            val = bool(string_conversions.is_true_expr(cell_contents))
-            cell_type = cell.CellType.BOOLEAN
-        elif string_conversions.is_number(cell_contents):
-            stripped = string_conversions.strip_zeros(cell_contents)
-            val = Decimal(stripped)
-            cell_type = cell.CellType.LITERAL_NUM
+                dynamic = evaluator.dynamic_reads
+            if relink:
+                formula = lark_module.compiled_formula(self, calling_cell, cell_contents)
+                if formula is not None:
+                    sheet_names = formula.sheet_names
         else:
-            val = cell_contents
-            cell_type = cell.CellType.LITERAL_STRING
+            val, cell_type = cell.literal_value(cell_contents)
+        if relink:
+            self.__index_sheet_references(calling_cell, sheet_names)
+            precedents_changed = self.graph.link_precedents(calling_cell, relies_on, dynamic)
+        elif dynamic or calling_cell.node_id in self.graph.dynamic:
+            precedents_changed = self.graph.relink_dynamic(calling_cell, dynamic)
+        else:
+            precedents_changed = False
         # determine if updating the value actually updates it or changes its type
         type_change = False
         if calling_cell.cell_type == cell.CellType.EMPTY:
@@ -107,29 +433,477 @@ class Workbook:
                 type_change = True
         elif calling_cell.cell_type != cell_type:
             type_change = True
-        val_update = bool(val != calling_cell.value or type_change)
+        val_update = type_change or self.__values_differ(val, calling_cell.value)
         calling_cell.set_fields(value=val, cell_type=cell_type)
-        return relies_on, val_update
-
-    def __get_cells_containing_sheetname(self, sheetname: str) -> list[cell.Cell]:
-        # match any cell that has contents sheetname! or 'sheetname'!
-        cells = []
-        regex = f'.*{sheetname.lower()}!.*'
-        regex2 = f".*'{sheetname.lower()}'!.*"
-        for name, spreadsheet in self.spreadsheets.items():
-            for loc, c in spreadsheet.cells.items():
-                if c.contents and \
-                    (re.match(regex, c.contents.lower()) or
-                        re.match(regex2, c.contents.lower())):
-                    with suppress(AttributeError):
-                        # If a cell is an error type, check if it is a parse error and don't
-                        # add to our list of cells. Otherwise, if it is not a cell error type,
-                        # get_type() will throw an attribute error.
-                        if self.get_cell_value(name, loc).get_type() == \
-                                cell_error.CellErrorType.PARSE_ERROR:
-                            continue
-                    cells.append(c)
-        return cells
+        calling_cell.sheet.update_column_indexes(calling_cell.key, val)
+        return precedents_changed, val_update
+
+    def __index_sheet_references(self, c: cell.Cell, sheet_names: FrozenSet[str]) -> None:
+        """
+        Record the lower case names of the sheets that the formula of a cell names, after
+        its contents changed.
+        """
+        old_names = self.__referenced_sheets.get(c, frozenset())
+        if sheet_names == old_names:
+            return
+        for name in old_names - sheet_names:
+            cells = self.__sheet_references[name]
+            del cells[c]
+            if not cells:
+                del self.__sheet_references[name]
+        for name in sheet_names - old_names:
+            self.__sheet_references.setdefault(name, {})[c] = None
+        if sheet_names:
+            self.__referenced_sheets[c] = sheet_names
+        else:
+            del self.__referenced_sheets[c]
+
+    @staticmethod
+    def __values_differ(new_value: Any, old_value: Any) -> bool:
+        """
+        Determine if a recomputed cell value differs from the cell's previous value. Values
+        of different types always differ (e.g. False and Decimal(0)), and errors are
+        compared by their type.
+        """
+        if type(new_value) is not type(old_value):  # pylint: disable=unidiomatic-typecheck
+            return True
+        if isinstance(new_value, cell_error.CellError):
+            return new_value.get_type() != old_value.get_type() or \
+                new_value.circref_type != old_value.circref_type
+        if isinstance(new_value, Decimal):
+            return new_value != old_value or new_value.is_signed() != old_value.is_signed()
+        return bool(new_value != old_value)
+
+    @staticmethod
+    def __cell_state(spreadsheet: sheet.Sheet, key: int) -> Tuple[Any, Optional[cell.CellType]]:
+        """
+        Value and type of the cell at a location, which are both None if it is empty.
+        """
+        c = spreadsheet.cells.get(key)
+        if c is not None:
+            return (None, None) if c.cell_type == cell.CellType.EMPTY else (c.value, c.cell_type)
+        if spreadsheet.columns is not None and key in spreadsheet.columns:
+            return cell.literal_value(spreadsheet.columns.get(key))
+        return None, None
+
+    @staticmethod
+    def __states_differ(new_state: Tuple[Any, Any], old_state: Tuple[Any, Any]) -> bool:
+        """
+        Determine if the value or type of a cell given by __cell_state() changed.
+        """
+        return new_state[1] != old_state[1] or \
+            Workbook.__values_differ(new_state[0], old_state[0])
+
+    def __recalculate(self, cells: Iterable[cell.Cell], relink: bool = True) -> List[cell.Cell]:
+        """
+        Evaluate the given cells and propagate any change in their values to the cells
+        that depend on them.
+
+        Dirty cells are visited in order of their topological level, so each cell is
+        evaluated after all of its dirty precedents. Propagation stops at cells whose
+        recomputed value is unchanged. Cycle detection only runs from a cell whose
+        set of precedents changed when it was evaluated. Cells that are only evaluated
+        because a value they read changed keep their precedents, apart from the ones
+        they choose to read by value. Cells queued one after another at the same level
+        whose formulas share a compiled template, such as a column of filled formulas,
+        are evaluated as a group with a single relevel of the graph.
+
+        Args:
+            cells (Iterable[Cell]): cells whose contents or inputs have changed.
+            relink (bool): whether the contents of the given cells, or the sheets they
+            refer to, may have changed, so that all of their precedents are relinked.
+
+        Returns:
+            List[Cell]: cells whose values changed, in the order they were evaluated.
+        """
+        graph = self.graph
+        changed_cells = []
+        heap = []
+        # id -> level the cell is queued at
+        queued = {}
+
+        def push(node_id: int):
+            level = graph.levels[node_id]
+            if queued.get(node_id) != level:
+                queued[node_id] = level
+                heapq.heappush(heap, (level, node_id))
+
+        def push_dependents(node_id: int):
+            for dependent in graph.dependents[node_id]:
+                push(dependent)
+            for dependent in graph.ranges_containing(node_id):
+                push(dependent)
+
+        def take_shared(c: cell.Cell, level: int) -> Optional[List[int]]:
+            # pop the cells queued next at the level whose formula compiles to the same
+            # template as the formula of c, which formulas filled down a column do
+            if not c.contents or c.contents[0] != "=":
+                return None
+            formula = lark_module.compiled_formula(self, c, c.contents)
+            shared = []
+            while formula is not None and heap and heap[0][0] == level:
+                other_id = heap[0][1]
+                if queued.get(other_id) == level:
+                    other = graph.nodes[other_id]
+                    if not isinstance(other, cell.Cell) or not other.contents or \
+                            other.contents[0] != "=" or lark_module.compiled_formula(
+                                self, other, other.contents) is not formula:
+                        break
+                    del queued[other_id]
+                    shared.append(other_id)
+                heapq.heappop(heap)
+            return shared
+
+        def evaluate_shared(group: List[int]):
+            # evaluate cells that share a compiled formula together, then relevel the graph
+            # once for all of them
+            positions = {member: i for i, member in enumerate(group)}
+            was_circular = [member in graph.cyclic for member in group]
+            results = []
+            roots = []
+            for member in group:
+                precedents_changed, val_updated = self.__set_cell_value_and_type(
+                    graph.nodes[member], member in relinked)
+                relinked.discard(member)
+                results.append((precedents_changed, val_updated))
+                if precedents_changed:
+                    roots.append(member)
+                    roots.extend(graph.link_ranges(graph.nodes[member]))
+            if roots:
+                newly_cyclic, no_longer_cyclic = graph.relevel(roots)
+                for cycle_member in newly_cyclic:
+                    self.__set_circular(graph.nodes[cycle_member])
+                    if cycle_member not in positions:
+                        if not isinstance(graph.nodes[cycle_member], RangeNode):
+                            changed_cells.append(graph.nodes[cycle_member])
+                        push_dependents(cycle_member)
+                # cells of the group may have read a cycle that a later one broke
+                for former_member in no_longer_cyclic:
+                    if former_member != group[-1]:
+                        push(former_member)
+            for i, member in enumerate(group):
+                precedents_changed, val_updated = results[i]
+                # evaluate the cell again once any of its new precedents are up to date,
+                # including cells of the group that were evaluated after it
+                if precedents_changed and member not in graph.cyclic and \
+                        any(p in queued or positions.get(p, -1) > i
+                            for p in graph.precedents[member]):
+                    push(member)
+                if member in graph.cyclic:
+                    self.__set_circular(graph.nodes[member])
+                    val_updated = not was_circular[i]
+                if val_updated:
+                    changed_cells.append(graph.nodes[member])
+                    push_dependents(member)
+                elif member in graph.cyclic:
+                    # later cells of the group may have read the value it was evaluated
+                    # to before it was found to be in a cycle
+                    for reader in graph.dependents[member].union(*(
+                            graph.dependents[range_id]
+                            for range_id in graph.ranges_containing(member))):
+                        if positions.get(reader, -1) > i and reader not in graph.cyclic:
+                            push(reader)
+
+        # ids of the given cells that haven't been evaluated yet
+        relinked = set()
+        for c in cells:
+            node_id = graph.add_cell(c)
+            push(node_id)
+            if relink:
+                relinked.add(node_id)
+        while heap:
+            level, node_id = heapq.heappop(heap)
+            if queued.get(node_id) != level:
+                continue
+            del queued[node_id]
+            c = graph.nodes[node_id]
+            if c is None:
+                # a range that no formula reads anymore was removed after it was queued
+                continue
+            if isinstance(c, RangeNode):
+                # a range is dirty whenever one of the cells within it changed
+                push_dependents(node_id)
+                continue
+            shared = take_shared(c, level)
+            if shared:
+                evaluate_shared([node_id] + shared)
+                continue
+            was_circular = node_id in graph.cyclic
+            precedents_changed, val_updated = self.__set_cell_value_and_type(
+                c, node_id in relinked)
+            relinked.discard(node_id)
+            if precedents_changed:
+                range_ids = graph.link_ranges(c)
+                newly_cyclic, no_longer_cyclic = graph.relevel([node_id] + range_ids)
+                for cycle_member in newly_cyclic:
+                    self.__set_circular(graph.nodes[cycle_member])
+                    if cycle_member != node_id:
+                        if not isinstance(graph.nodes[cycle_member], RangeNode):
+                            changed_cells.append(graph.nodes[cycle_member])
+                        push_dependents(cycle_member)
+                for former_member in no_longer_cyclic:
+                    if former_member != node_id:
+                        push(former_member)
+                # evaluate the cell again once any of its new precedents are up to date
+                if node_id not in graph.cyclic and \
+                        any(p in queued for p in graph.precedents[node_id]):
+                    push(node_id)
+            if node_id in graph.cyclic:
+                self.__set_circular(c)
+                val_updated = not was_circular
+            if val_updated:
+                changed_cells.append(c)
+                push_dependents(node_id)
+        return self.__topological_order(changed_cells)
+
+    def __topological_order(self, cells: List[cell.Cell]) -> List[cell.Cell]:
+        """
+        Order cells topologically using only the edges between the given cells, so the
+        cost is proportional to the number of cells rather than the size of the graph.
+        """
+        ids = {c.node_id for c in cells}
+        dependents = {node_id: self.graph.dependents[node_id] & ids for node_id in ids}
+        # start from cells that don't depend on any other given cell. Components come
+        # out in reverse order, so visit them in reverse to keep independent cells in
+        # their original order.
+        sources = [c.node_id for c in reversed(cells)
+                   if self.graph.precedents[c.node_id].isdisjoint(ids)]
+        components = strongly_connected_components(
+            sources + [c.node_id for c in cells], dependents)
+        return [self.graph.nodes[node_id] for scc in reversed(components) for node_id in scc]
+
+    def __set_circular(self, c: cell.Cell):
+        """Set the value of a cell that is part of a cycle."""
+        if isinstance(c, RangeNode):
+            return
+        c.set_fields(value=cell_error.CellError(
+            cell_error.CellErrorType.CIRCULAR_REFERENCE, "circular reference"))
+        c.sheet.update_column_indexes(c.key, c.value)
+
+    def __add_sheet(self, sheet_name: Optional[str], columnar: bool = False) -> str:
+        """
+        Add an empty sheet to the workbook without evaluating any cells.
+
+        Args:
+            sheet_name (Optional[str]): name of the new sheet, or None to generate one
+            columnar (bool): whether the sheet stores literal cells column by column
+
+        Raises:
+            ValueError: the sheet name is empty, invalid or already in use
+
+        Returns:
+            str: name of the new sheet
+        """
+        if sheet_name == "":
+            raise ValueError("Sheet name is empty string")
+        if sheet_name:
+            check_valid_sheet_name(self, sheet_name)
+        else:  # handle null input
+            i = 1
+            while True:
+                sheet_name = "Sheet" + str(i)
+                if sheet_name.lower() not in self.spreadsheets:
+                    break
+                i += 1
+        self.spreadsheets[sheet_name.lower()] = sheet.Sheet(sheet_name, columnar)
+        return sheet_name
+
+    def __read_workbook(self, reader: JsonReader) -> List[Tuple[sheet.Sheet, int, str]]:
+        """
+        Read a workbook file one sheet at a time, adding its sheets to this workbook, so
+        the whole document is never held in memory. Cells are not evaluated.
+
+        A file that isn't valid JSON raises a json.JSONDecodeError no matter where the
+        problem is, so any other problem is only raised once the whole file has been read.
+
+        Args:
+            reader (JsonReader): reader positioned at the start of the file
+
+        Raises:
+            KeyError: an expected value is missing
+            TypeError: a value is not of the proper type
+            ValueError: a sheet name or cell location is invalid
+
+        Returns:
+            List[Tuple[Sheet, int, str]]: sheet, location key and stripped contents of
+            every cell in the file, in file order
+        """
+        if reader.peek() != "{":
+            reader.read_value()
+            reader.end()
+            raise TypeError("Workbook should be a JSON object.")
+
+        # keys of the top level object, in the order they first appear
+        keys = []
+        loaded = []
+        error = None
+        for key in reader.iter_object():
+            if key not in keys:
+                keys.append(key)
+            if key != "sheets":
+                reader.read_value()
+                continue
+            # like json.load(), a repeated key replaces the earlier value
+            self.spreadsheets.clear()
+            loaded = []
+            error = None
+            if reader.peek() != "[":
+                reader.read_value()
+                error = TypeError("\"sheets\" value should be of type list")
+                continue
+            for _ in reader.iter_array():
+                if error:
+                    reader.read_value()
+                    continue
+                try:
+                    self.__read_sheet(reader, loaded)
+                except json.JSONDecodeError:
+                    raise
+                except (KeyError, TypeError, ValueError) as e:
+                    error = e
+        reader.end()
+
+        if len(keys) != 1:
+            raise TypeError("Should contain one instance of sheets.")
+        if keys[0] != "sheets":
+            raise KeyError("Key should be named \"sheets\".")
+        if error:
+            raise error
+        return loaded
+
+    def __read_sheet(self, reader: JsonReader,
+                     loaded: List[Tuple[sheet.Sheet, int, str]]) -> None:
+        """
+        Read one sheet object of a workbook file, adding the sheet to this workbook and
+        its cells to loaded. The whole object is read before anything is validated, and
+        a location that appears twice keeps its last contents, as with json.load().
+
+        Args:
+            reader (JsonReader): reader positioned at the start of the sheet object
+            loaded (List[Tuple[Sheet, int, str]]): cells read so far
+        """
+        if reader.peek() != "{":
+            reader.read_value()
+            raise TypeError("Sheet object is not of type dictionary.")
+        keys = set()
+        sheet_name = None
+        cell_contents = None
+        for key in reader.iter_object():
+            keys.add(key)
+            if key == "name":
+                sheet_name = reader.read_value()
+            elif key == "cell-contents" and reader.peek() == "{":
+                cell_contents = dict(reader.iter_items())
+            elif key == "cell-contents":
+                reader.read_value()
+                cell_contents = None
+            else:
+                reader.read_value()
+
+        if len(keys) != 2:
+            raise KeyError(
+                "Sheet dictionary does not have exactly two keys.")
+        if "name" not in keys or "cell-contents" not in keys:
+            raise KeyError(
+                "Keys of sheet dictionray must be named \"name\" and \"cell-contents\"")
+        if not isinstance(sheet_name, str):
+            raise TypeError("Sheet name is not of type string.")
+        loaded_sheet = self.spreadsheets[self.__add_sheet(sheet_name).lower()]
+
+        if cell_contents is None:
+            raise TypeError(
+                f"Cell Contents of sheet \"{sheet_name}\" is not of type dict.")
+        for location, contents in cell_contents.items():
+            if not isinstance(contents, str):
+                raise TypeError(
+                    "Cell location and contents must be of type string.")
+            location = location.upper()
+            if not string_conversions.check_valid_location(location):
+                raise ValueError(f"Cell location {location} is invalid")
+            loaded.append((loaded_sheet, string_conversions.location_to_key(location),
+                           contents.strip()))
+
+    def __evaluate_loaded_cells(self, cells: List[cell.Cell]) -> None:
+        """
+        Evaluate cells whose contents were all stored before any of them was evaluated.
+
+        The references of each formula are read from its compiled form, so the cells can
+        be evaluated in topological order and each one is usually only evaluated once.
+        Cells whose values could depend on evaluation order afterwards (cells reading a
+        cell that was evaluated after them, such as through a cycle or INDIRECT, and
+        cells reading a cycle) are recalculated, apart from cycles whose references don't
+        depend on values, which are simply marked as circular.
+
+        Args:
+            cells (List[Cell]): cells with contents that haven't been evaluated yet
+        """
+        graph = self.graph
+        # formulas that haven't been reached yet, by (lower-case sheet name, location key)
+        pending = {}
+        formulas = []
+        for c in cells:
+            graph.add_cell(c)
+            if c.contents[0] == "=":
+                pending[(c.sheet.name.lower(), c.key)] = c
+                formulas.append(c)
+            else:
+                # cells that aren't formulas don't read other cells, so they can go first
+                self.__set_cell_value_and_type(c)
+
+        def references(c: cell.Cell) -> Iterator[Tuple[Optional[str], Optional[int]]]:
+            formula = lark_module.compiled_formula(self, c, c.contents)
+            return ((sheet_name, resolve(reference, c.key))
+                    for sheet_name, reference in (formula.references if formula else ()))
+
+        # node id -> position in evaluation order
+        evaluated = {}
+        # Evaluate each formula after the formulas it references, depth first. A
+        # formula's compiled form is usually still cached when it is evaluated. Formulas
+        # in a cycle are evaluated in an arbitrary order and fixed up below.
+        for root in formulas:
+            if pending.pop((root.sheet.name.lower(), root.key), None) is None:
+                continue
+            stack = [(root, references(root))]
+            while stack:
+                c, refs = stack[-1]
+                for sheet_name, key in refs:
+                    precedent = pending.pop((sheet_name or c.sheet.name.lower(), key), None)
+                    if precedent is not None:
+                        stack.append((precedent, references(precedent)))
+                        break
+                else:
+                    stack.pop()
+                    evaluated[c.node_id] = len(evaluated)
+                    self.__set_cell_value_and_type(c)
+
+        for c in formulas:
+            graph.link_ranges(c)
+        newly_cyclic, _ = graph.relevel(c.node_id for c in formulas)
+        for node_id in newly_cyclic:
+            self.__set_circular(graph.nodes[node_id])
+
+        # position of the last formula within each range, or of any formula for ranges
+        # containing a cycle. Formulas without precedents have no edge into the ranges
+        # containing them, so those are looked up in the range index.
+        range_order = {}
+        for node_id, order in evaluated.items():
+            if node_id in graph.cyclic:
+                order = len(evaluated)
+            for range_id in graph.ranges_containing(node_id):
+                if range_order.get(range_id, -1) < order:
+                    range_order[range_id] = order
+        stale = set()
+        for node_id, order in evaluated.items():
+            # a cycle reads the same cells whatever its values are, so it is already final
+            if node_id in graph.cyclic and not graph.nodes[node_id].lazy:
+                continue
+            for p in graph.precedents[node_id]:
+                if p in graph.cyclic or evaluated.get(p, range_order.get(p, -1)) >= order:
+                    stale.add(node_id)
+                    break
+        # the stale cells were evaluated with their current contents, so only the cells
+        # they read by value can change
+        self.__recalculate(graph.cells_of(sorted(stale)), False)
 
     def __get_cell_contents_after_rename(self, c: cell.Cell, sheet_name: str,
                                          new_sheet_name: str) -> str:
@@ -169,47 +943,17 @@ class Workbook:
         bottom_right_row = max(start_row, end_row)
         return top_left_col, top_left_row, bottom_right_col, bottom_right_row
 
-    def __get_overlap_map(self, spreadsheet: sheet.Sheet, to_sheet: sheet.Sheet,
-                          original_corners: Tuple[int, int, int, int],
-                          destination_corners: Tuple[int, int, int, int]
-                          ) -> Dict[str, Tuple[str, cell.CellType]]:
-        """Get mapping of cells in overlapping region to their original contents.
-        Used in move_cells and copy_cells.
-
-        Args:
-            original_corners (Tuple[int, int, int, int]): 
-            (top left col, top left row, bottom right col, bottom right row)
-            destination_corners (Tuple[int, int, int, int]):
-            (top left col, top left row, bottom right col, bottom right row)
-
-        Returns:
-            Dict[str, Tuple[str, cell.CellType]]: Mapping of location to contents and cell type
-        """
-        mapping = {}
-        if spreadsheet != to_sheet:
-            return mapping
-        for i in range(destination_corners[0], destination_corners[2] + 1):
-            for j in range(destination_corners[1], destination_corners[3] + 1):
-                if original_corners[0] <= i <= original_corners[2] and \
-                        original_corners[1] <= j <= original_corners[3]:
-                    loc = "".join([string_conversions.num_to_col(i), str(j)])
-                    contents = self.get_cell_contents(spreadsheet.name, loc)
-                    if loc in spreadsheet.cells:
-                        cell_type = spreadsheet.cells[loc].cell_type
-                    else:
-                        cell_type = cell.CellType.EMPTY
-                    mapping[loc] = (contents, cell_type)
-        return mapping
-
     def __copy_cell_block(self, spreadsheet: sheet.Sheet, start_location: str,
                           end_location: str, to_location: str, to_sheet: str,
                           deleting: bool) -> Set[cell.Cell]:
         """
-        Copy a block of cells from one location to another
+        Copy a block of cells from one location to another in bulk: the new contents of
+        every cell of the block are worked out from the original contents first, then they
+        are all stored, and the edited cells (and the cells reading them) are relinked in
+        the dependency graph and evaluated together in a single pass.
 
         Args:
             spreadsheet (Sheet): Sheet object our copied cells are located in
-            sheet_name (str): Name of the sheet our starting cells are in
             start_location (str): One corner of our selection block
             end_location (str): Opposite corner of our selection block
             to_location (str): Top-left corner of the region we intend to place our cells in
@@ -218,132 +962,83 @@ class Workbook:
 
         Returns:
             Set[Cell]: iterable set of all cell objects whose values are changed by the copying
-            operation. 
+            operation.
         """
         affected_cells = set()
-        start_location = start_location.upper()
-        end_location = end_location.upper()
-        to_location = to_location.upper()
-        end_top_left_col, end_top_left_row = string_conversions.str_to_tuple(
-            to_location)
         top_left_col, top_left_row, bottom_right_col, bottom_right_row = \
-            self.__get_selection_corners(start_location, end_location)
+            self.__get_selection_corners(start_location.upper(), end_location.upper())
         # get the required change in column and row
-        to_col, to_row = string_conversions.str_to_tuple(to_location)
+        to_col, to_row = string_conversions.str_to_tuple(to_location.upper())
         delta_col = to_col - top_left_col
         delta_row = to_row - top_left_row
-        # obtain mapping of overlapped cells to their original content
         end_bottom_right_col = bottom_right_col + delta_col
         end_bottom_right_row = bottom_right_row + delta_row
-        original_corners = (top_left_col, top_left_row,
-                            bottom_right_col, bottom_right_row)
-        destination_corners = (
-            end_top_left_col, end_top_left_row, end_bottom_right_col, end_bottom_right_row)
         # if our top left corner is equal to to_location, then we aren't actually moving any
-        # cells and we can just return an empty set.
-        if "".join(
-                [string_conversions.num_to_col(top_left_col), str(top_left_row)]) == to_location:
+        # cells
+        if delta_col == 0 and delta_row == 0:
             return affected_cells
-        overlap_map = self.__get_overlap_map(
-            spreadsheet, self.spreadsheets[to_sheet.lower()], original_corners, destination_corners)
-        # move each cell in our selection zone
+        if end_bottom_right_col > string_conversions.MAX_COL or \
+                end_bottom_right_row > string_conversions.MAX_ROW:
+            raise ValueError("Target area extends outside of the sheet")
+        destination = self.spreadsheets[to_sheet.lower()]
+        # (destination key, contents, compiled formula shared with the original, whether
+        # the destination had a value) of each cell of the block, all read before any cell
+        # changes, so a destination that overlaps the source gets the original contents
+        copies = []
         for i in range(top_left_col, bottom_right_col + 1):
-            start_cell_col = string_conversions.num_to_col(i)
-            end_cell_col = string_conversions.num_to_col(i + delta_col)
             for j in range(top_left_row, bottom_right_row + 1):
-                start_cell_loc = start_cell_col + str(j)
-                end_cell_loc = end_cell_col + str(j + delta_row)
-                # If end cell location in overlap region, get its original contents
-                if start_cell_loc in overlap_map:
-                    contents = overlap_map[start_cell_loc][0]
-                else:
-                    contents = self.get_cell_contents(
-                        spreadsheet.name, start_cell_loc)
-                # If cell is formula, we need to update its relative location for cell references
-                # It's possible that a cell in the overlap region is overwritten from formula to
-                # string so we need to check its original cell type
-                overwritten_formula = start_cell_loc in overlap_map and overlap_map[
-                    start_cell_loc][1] == cell.CellType.FORMULA
-                originally_formula = start_cell_loc in spreadsheet.cells and \
-                    spreadsheet.cells[
-                        start_cell_loc].cell_type == cell.CellType.FORMULA
-                if overwritten_formula or originally_formula:
-                    # If a cell is an error type, check if it is a parse error and don't
-                    # update its contents. Otherwise, if it is not a cell error type,
-                    # get_type() will throw an attribute error.
-                    with suppress(AttributeError):
-                        if self.get_cell_value(spreadsheet.name, start_cell_loc).get_type() == \
-                                cell_error.CellErrorType.PARSE_ERROR:
-                            self.set_cell_contents(
-                                to_sheet, end_cell_loc, contents)
-                            if end_cell_loc in self.spreadsheets[to_sheet.lower()].cells:
-                                affected_cells.add(
-                                    self.spreadsheets[to_sheet.lower()].cells[end_cell_loc])
-                            continue
-                    # Since cell type is not error, we don't worry about invalid cell refs
-                    # Locations can be specified as A1, sheet1!A1, or 'sheet1'!A1
-                    # sheetname: \'[^']*\'! OR [A-Za-z_][A-Za-z0-9_]*!
-                    sheetname_pattern = r"\'[^']*\'!|[A-Za-z_][A-Za-z0-9_]*!"
-                    # cell_pattern = r"\$?[A-Za-z]+\$?[1-9][0-9]*"
-                    # Ensure cell locatoins are not wrapped in double quotes
-                    cell_pattern = r'(?<!")\$?[A-Za-z]+\$?[1-9][0-9]*(?!")'
-                    # ?: Specifies we don't want to keep the matched sheetname
-                    pattern = f"(?:{sheetname_pattern})?({cell_pattern})"
-                    locations = re.findall(pattern, contents)
-                    for loc in locations:
-                        loc = loc.upper()
-                        # If $ precedes col or row, do not update relative location
-                        # In the regex, () defines the two groups
-                        match = re.match(
-                            r"(\$?[A-Za-z]+)(\$?[1-9][0-9]*)", loc)
-                        col = match.group(1)
-                        row = match.group(2)
-                        new_loc = ""
-                        if col[0] != "$":
-                            col = string_conversions.col_to_num(
-                                col) + delta_col
-                            new_loc += string_conversions.num_to_col(col)
-                        else:
-                            new_loc += col
-                        if row[0] != "$":
-                            row = delta_row + int(row)
-                            new_loc += str(row)
-                        else:
-                            new_loc += row
-                        if not string_conversions.check_valid_location(new_loc):
-                            new_loc = "#REF!"
-                        # Note that re.escape ensures we can properly search for $ in loc
-                        # Normally, you'd have to escape $A$1 like \$A\$1
-                        contents = re.sub(
-                            re.escape(loc), new_loc, contents, flags=re.IGNORECASE)
-                    self.set_cell_contents(to_sheet, end_cell_loc, contents)
-                    if end_cell_loc in self.spreadsheets[to_sheet.lower()].cells:
-                        affected_cells.add(
-                            self.spreadsheets[to_sheet.lower()].cells[end_cell_loc])
-                # Cells that aren't formulas can copy the original location's contents
+                start_key = string_conversions.to_key(i, j)
+                end_key = string_conversions.to_key(i + delta_col, j + delta_row)
+                source = spreadsheet.cells.get(start_key)
+                compiled = None
+                if source is not None:
+                    contents = source.contents
+                elif spreadsheet.columns is not None:
+                    contents = spreadsheet.columns.get(start_key)
                 else:
-                    initial_val = self.get_cell_value(to_sheet, end_cell_loc)
-                    self.set_cell_contents(
-                        to_sheet, end_cell_loc, contents)
-                    if end_cell_loc in self.spreadsheets[to_sheet.lower()].cells:
-                        affected_cells.add(
-                            self.spreadsheets[to_sheet.lower()].cells[end_cell_loc])
-                    # If we are deleting the cells value when copying it, then it is no longer
-                    # located in our cells dictionary. So, if our initial value exists, we
-                    # create a temporary cell object that is stored in affected_cells.
-                    elif initial_val is not None:
-                        temp_cell = cell.Cell(
-                            self.spreadsheets[to_sheet.lower()], end_cell_loc, None, None, None)
-                        affected_cells.add(temp_cell)
-                        del temp_cell
-                if deleting:
-                    # Delete cells that don't overlap with the new location
-                    if start_cell_loc not in overlap_map:
-                        if start_cell_loc in spreadsheet.cells:
-                            affected_cells.add(
-                                spreadsheet.cells[start_cell_loc])
-                        self.set_cell_contents(
-                            spreadsheet.name, start_cell_loc, None)
+                    contents = None
+                # If cell is formula, we need to update its relative location for cell
+                # references. Formulas that don't parse are copied as they are. Otherwise
+                # the formula is written out at the new location in one pass from the
+                # relative form the compiled formula read off its CELLREF tokens, so it
+                # shares the compiled formula of the original unless one of its
+                # references became #REF!
+                if contents and contents[0] == "=":
+                    formula = lark_module.compiled_formula(self, source, contents)
+                    if formula is not None:
+                        contents, on_sheet = render(formula.form, end_key)
+                        compiled = formula if on_sheet else None
+                replaced = destination.cells.get(end_key)
+                had_value = replaced.value is not None if replaced is not None else \
+                    destination.columns is not None and end_key in destination.columns
+                copies.append((end_key, contents, compiled, had_value))
+        # Delete cells of the original block that don't overlap with the new location
+        cleared = []
+        if deleting:
+            for i in range(top_left_col, bottom_right_col + 1):
+                for j in range(top_left_row, bottom_right_row + 1):
+                    start_key = string_conversions.to_key(i, j)
+                    if (spreadsheet is not destination or
+                            not to_col <= i <= end_bottom_right_col or
+                            not to_row <= j <= end_bottom_right_row) and \
+                            (start_key in spreadsheet.cells or spreadsheet.columns is not None
+                             and start_key in spreadsheet.columns):
+                        cleared.append(start_key)
+        with self.__evaluate_together():
+            for end_key, contents, compiled, _ in copies:
+                self.__set_cell_contents(destination, end_key, contents, compiled)
+            for start_key in cleared:
+                self.__set_cell_contents(spreadsheet, start_key, None)
+        # Report every cell of the new location, apart from those that were and still are
+        # empty, and every cell of the original block that was deleted. Cells that no
+        # longer exist are reported through temporary cell objects.
+        for end_key, _, _, had_value in copies:
+            if end_key in destination.cells or had_value:
+                affected_cells.add(destination.cells.get(end_key) or
+                                   cell.Cell(destination, end_key, None, None, None))
+        for start_key in cleared:
+            affected_cells.add(spreadsheet.cells.get(start_key) or
+                               cell.Cell(spreadsheet, start_key, None, None, None))
         return affected_cells
 
     def num_sheets(self) -> int:
@@ -366,32 +1061,29 @@ class Workbook:
         # workbook's internal state.
         return [self.spreadsheets[spreadsheet].name for spreadsheet in self.spreadsheets]
 
-    def new_sheet(self, sheet_name: Optional[str] = None) -> Tuple[int, str]:
+    def new_sheet(self, sheet_name: Optional[str] = None,
+                  columnar: bool = False) -> Tuple[int, str]:
         # Add a new sheet to the workbook.  If the sheet name is specified, it
         # must be unique.  If the sheet name is None, a unique sheet name is
         # generated.  "Uniqueness" is determined in a case-insensitive manner,
         # but the case specified for the sheet name is preserved.
         #
+        # If columnar is True, the contents of literal cells that no formula
+        # reads are stored in per-column arrays instead of as cell objects,
+        # which takes much less memory for large sheets of numbers.  This
+        # doesn't change the behavior of the sheet.
+        #
         # The function returns a tuple with two elements:
         # (0-based index of sheet in workbook, sheet name).  This allows the
         # function to report the sheet's name when it is auto-generated.
         #
         # If the spreadsheet name is an empty string (not None), or it is
         # otherwise invalid, a ValueError is raised.
-        if sheet_name == "":
-            raise ValueError("Sheet name is empty string")
-        if sheet_name:
-            check_valid_sheet_name(self, sheet_name)
-        else:  # handle null input
-            i = 1
-            while True:
-                sheet_name = "Sheet" + str(i)
-                if sheet_name.lower() not in self.spreadsheets:
-                    break
-                i += 1
-        self.spreadsheets[sheet_name.lower()] = sheet.Sheet(sheet_name)
-        changed_cells = [c for c in list(self.adjacency_list.keys())
-                         if self.__set_cell_value_and_type(c)[1]]
+        self.__evaluate_pending()
+        sheet_name = self.__add_sheet(sheet_name, columnar)
+        # formulas that referenced the new sheet name can now be resolved
+        changed_cells = self.__recalculate(
+            [c for c in self.graph if c.cell_type == cell.CellType.FORMULA])
         self.__generate_notifications(changed_cells)
         return len(self.spreadsheets) - 1, sheet_name
 
@@ -404,19 +1096,26 @@ class Workbook:
         # If the specified sheet name is not found, a KeyError is raised.
         if sheet_name.lower() not in self.spreadsheets:
             raise KeyError("Specified sheet name not found")
+        self.__evaluate_pending()
         spreadsheet = self.spreadsheets[sheet_name.lower()]
         del self.spreadsheets[sheet_name.lower()]
-        changed_cells = []
-        for loc in spreadsheet.cells:
-            c = spreadsheet.cells[loc]
-            _, cell_dependents = topo_sort(c, self.adjacency_list)
-            changed_cells.extend(cell_dependents[1:])
-            for _, neighbors in self.adjacency_list.items():
-                if c in neighbors:
-                    neighbors.remove(c)
-            for dependent in cell_dependents[1:]:
-                self.__set_cell_value_and_type(dependent)
-            del self.adjacency_list[c]
+        dependents = set()
+        for c in spreadsheet.cells.values():
+            dependents.update(self.graph.dependents_of(c))
+        for node in self.graph.ranges_on(spreadsheet):
+            dependents.update(self.graph.dependents_of(node))
+        # cells that choose what to read by value, such as lookups, can depend on the
+        # sheet existing without having read any of its cells
+        dependents.update(c for c in self.graph if c.lazy)
+        for c in spreadsheet.cells.values():
+            self.graph.remove_cell(c)
+            self.__index_sheet_references(c, frozenset())
+        # cells on the deleted sheet are removed from the graph as well
+        dependents = [c for c in dependents if c.sheet is not spreadsheet]
+        # removing cells may have broken cycles that the dependents were part of
+        _, no_longer_cyclic = self.graph.relevel([c.node_id for c in dependents])
+        changed_cells = self.__recalculate(
+            dependents + self.graph.cells_of(no_longer_cyclic))
         self.__generate_notifications(changed_cells)
 
     def get_sheet_extent(self, sheet_name: str) -> Tuple[int, int]:
@@ -429,6 +1128,8 @@ class Workbook:
         # If the specified sheet name is not found, a KeyError is raised.
         if sheet_name.lower() not in self.spreadsheets:
             raise KeyError("Specified sheet name not found")
+        # emptied cells only shrink the extent once they are evaluated
+        self.__evaluate_pending()
         spreadsheet = self.spreadsheets[sheet_name.lower()]
         return ((spreadsheet.extent_col, spreadsheet.extent_row))
 
@@ -462,70 +1163,68 @@ class Workbook:
         spreadsheet = self.spreadsheets[sheet_name.lower()]
         if not string_conversions.check_valid_location(location):
             raise ValueError(f"Cell location {location} is invalid")
-        if contents:
-            contents = contents.strip()
-        # if cell already exists (modify contents)
-        if location in spreadsheet.cells:
-            existing_cell = spreadsheet.cells[location]
-            existing_cell.contents = contents
-            relies_on, val_updated = self.__set_cell_value_and_type(
-                existing_cell)
-            # Everything the existing cell relies on
-            for c, neighbors in self.adjacency_list.items():
-                if existing_cell in neighbors and c not in relies_on:
-                    neighbors.remove(existing_cell)
-            if existing_cell.cell_type == cell.CellType.EMPTY:
-                # existing cell is now empty so it does not depend on other cells
-                # -> remove it as a neighbor of other cells
-                for _, neighbors in self.adjacency_list.items():
-                    if existing_cell in neighbors:
-                        neighbors.remove(existing_cell)
-                # if existing cell doesn't have neighbors, no cell relies on it
-                # -> delete cell from spreadsheet
-                if not self.adjacency_list[existing_cell]:
-                    del spreadsheet.cells[location]
-                    del self.adjacency_list[existing_cell]
-                    update_extent(spreadsheet, location, True)
-                    if self.__call_notify:
-                        self.__generate_notifications([existing_cell])
-                    return
-            tarjanoutput = tarjan.tarjan(existing_cell, self.adjacency_list)
-            tarjanoutput = tarjanoutput[::-1]
-            cell_dependents = []
-            for island in tarjanoutput:
-                for c in island:
-                    relies_on, _ = self.__set_cell_value_and_type(c)
-                    if c.lazy:
-                        for d, neighbors in self.adjacency_list.items():
-                            if c in neighbors and d not in relies_on:
-                                neighbors.remove(c)
-            tarjanoutput = tarjan.tarjan(existing_cell, self.adjacency_list)
-            tarjanoutput = tarjanoutput[::-1]
-            for island in tarjanoutput:
-                if len(island) > 1:
-                    for c in island:
-                        cell_dependents.append(c)
-                        c.set_fields(value=cell_error.CellError(
-                            cell_error.CellErrorType.CIRCULAR_REFERENCE,
-                            "circular reference"))
-                else:
-                    c = island[0]
-                    cell_dependents.append(c)
-                    if c != existing_cell:
-                        self.__set_cell_value_and_type(c)
-            update_extent(spreadsheet, location, False)
-            # include the existing cell iff its value is updated
-            if self.__call_notify and val_updated:
-                self.__generate_notifications(cell_dependents)
-        else:  # if cell does not exist (create contents)
-            new_cell = cell.Cell(spreadsheet, location, contents, None, None)
-            self.__set_cell_value_and_type(new_cell)
-            if new_cell.cell_type != cell.CellType.EMPTY:
-                self.adjacency_list[new_cell] = []
-                spreadsheet.cells[location] = new_cell
-            update_extent(spreadsheet, location, False)
-            if self.__call_notify:
-                self.__generate_notifications([new_cell])
+        self.__set_cell_contents(spreadsheet, string_conversions.location_to_key(location),
+                                 contents)
+
+    def set_cells_contents(self, sheet_name: str,
+                           contents: Dict[str, Optional[str]]) -> None:
+        # Set the contents of many cells on the specified sheet at once, given
+        # as a mapping from cell location to contents.  Each cell is set as by
+        # set_cell_contents(), but all of them are evaluated in a single pass
+        # and notify functions are called once, with every cell whose value
+        # changed.
+        #
+        # If the specified sheet name is not found, a KeyError is raised.
+        # If any cell location is invalid, a ValueError is raised and no
+        # changes are made to the spreadsheet.
+        if sheet_name.lower() not in self.spreadsheets:
+            raise KeyError("Specified sheet name not found")
+        for location in contents:
+            if not string_conversions.check_valid_location(location.upper()):
+                raise ValueError(f"Cell location {location} is invalid")
+        with self.batch():
+            for location, cell_contents in contents.items():
+                self.set_cell_contents(sheet_name, location, cell_contents)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        # Context manager that applies every change made inside it as a unit:
+        #
+        #     with workbook.batch():
+        #         workbook.set_cell_contents("Sheet1", "A1", "1")
+        #         workbook.set_cell_contents("Sheet1", "A2", "=A1 + 1")
+        #
+        # Cell contents set inside the block are stored straight away but are
+        # only evaluated when a value is needed: at the end of the block, or
+        # when a value is read or a sheet is changed inside the block.  Notify
+        # functions are called once when the block ends, with each cell whose
+        # value changed reported a single time.
+        #
+        # Blocks may be nested; changes are applied when the outermost block
+        # ends, even if it ends with an exception.
+        self.__batch_depth += 1
+        if self.__batch_depth == 1:
+            self.__pending = {}
+        try:
+            yield
+        finally:
+            if self.__batch_depth > 1:
+                self.__batch_depth -= 1
+            else:
+                try:
+                    self.__evaluate_pending()
+                finally:
+                    self.__pending = None
+                    self.__batch_depth = 0
+                    for batch_key, (spreadsheet, key, old_state, reported) in \
+                            self.__batch_columns.items():
+                        if not reported and not self.__states_differ(
+                                self.__cell_state(spreadsheet, key), old_state):
+                            self.__batch_changed.pop(batch_key, None)
+                    self.__batch_columns = {}
+                    changed_cells = list(self.__batch_changed.values())
+                    self.__batch_changed = {}
+                self.__generate_notifications(changed_cells)
 
     def get_cell_contents(self, sheet_name: str, location: str) -> Optional[str]:
         # Return the contents of the specified cell on the specified sheet.
@@ -549,8 +1248,11 @@ class Workbook:
         spreadsheet = self.spreadsheets[sheet_name.lower()]
         if not string_conversions.check_valid_location(location):
             raise ValueError(f"Cell location {location} is invalid")
-        if location in spreadsheet.cells:
-            return spreadsheet.cells[location].contents
+        key = string_conversions.location_to_key(location)
+        if key in spreadsheet.cells:
+            return spreadsheet.cells[key].contents
+        if spreadsheet.columns is not None:
+            return spreadsheet.columns.get(key)
         return None
 
     def get_cell_value(self, sheet_name: str, location: str) -> Any:
@@ -579,11 +1281,7 @@ class Workbook:
         spreadsheet = self.spreadsheets[sheet_name.lower()]
         if not string_conversions.check_valid_location(location):
             raise ValueError(f"Cell location {location} is invalid")
-        if location in spreadsheet.cells:
-            if isinstance(spreadsheet.cells[location].value, unitialized_value.UninitializedValue):
-                return Decimal(0)
-            return spreadsheet.cells[location].value
-        return None
+        return self.__get_cell_value(spreadsheet, string_conversions.location_to_key(location))
 
     @staticmethod
     def load_workbook(fp: TextIO) -> Workbook:
@@ -607,46 +1305,37 @@ class Workbook:
         # raise a TypeError with a suitably descriptive message.
         wb = Workbook()
         try:
-            data = json.load(fp)
+            loaded = wb.__read_workbook(JsonReader(fp))
         except json.JSONDecodeError as e:
             print(f"{e}, Decode Error in load_workbook().")
-            return wb
+            return Workbook()
         except IOError as e:
             print(f"{e}, IO Error in load_workbook().")
-            return wb
+            return Workbook()
 
-        if len(data) != 1:
-            raise TypeError("Should contain one instance of sheets.")
-        if list(data.keys())[0] != "sheets":
-            raise KeyError("Key should be named \"sheets\".")
-        sheets = data["sheets"]
-        if not isinstance(sheets, list):
-            raise TypeError("\"sheets\" value should be of type list")
-
-        for spreadsheet in sheets:
-            if not isinstance(spreadsheet, dict):
-                raise TypeError("Sheet object is not of type dictionary.")
-            if len(spreadsheet.keys()) != 2:
-                raise KeyError(
-                    "Sheet dictionary does not have exactly two keys.")
-
-            if "name" not in spreadsheet.keys() or "cell-contents" not in spreadsheet.keys():
-                raise KeyError(
-                    "Keys of sheet dictionray must be named \"name\" and \"cell-contents\"")
-            sheet_name = spreadsheet["name"]
-            if not isinstance(sheet_name, str):
-                raise TypeError("Sheet name is not of type string.")
-            wb.new_sheet(sheet_name)
-
-            cell_contents = spreadsheet["cell-contents"]
-            if not isinstance(cell_contents, dict):
-                raise TypeError(
-                    f"Cell Contents of sheet \"{sheet_name}\" is not of type dict.")
-            for location, contents in cell_contents.items():
-                if not isinstance(location, str) or not isinstance(contents, str):
-                    raise TypeError(
-                        "Cell location and contents must be of type string.")
-                wb.set_cell_contents(sheet_name, location, contents)
+        # Store the contents of every cell before evaluating any of them, so each formula
+        # is evaluated once its precedents are known instead of as they are loaded.
+        # Files that set a location more than once (e.g. "a1" and "A1") are loaded cell
+        # by cell so later contents replace earlier ones as before.
+        locations = set()
+        duplicate_locations = False
+        for loaded_sheet, key, _ in loaded:
+            if (loaded_sheet.name.lower(), key) in locations:
+                duplicate_locations = True
+                break
+            locations.add((loaded_sheet.name.lower(), key))
+        if duplicate_locations:
+            for loaded_sheet, key, contents in loaded:
+                wb.__set_cell_contents(loaded_sheet, key, contents)
+            return wb
+        new_cells = []
+        for loaded_sheet, key, contents in loaded:
+            if contents:
+                new_cell = cell.Cell(loaded_sheet, key, contents, None, None)
+                loaded_sheet.cells[key] = new_cell
+                new_cells.append(new_cell)
+            update_extent(loaded_sheet, key, False)
+        wb.__evaluate_loaded_cells(new_cells)
         return wb
 
     def save_workbook(self, fp: TextIO) -> None:
@@ -657,12 +1346,17 @@ class Workbook:
         #
         # If an IO write error occurs (unlikely but possible), let any raised
         # exception propagate through.
+        self.__evaluate_pending()
         data = {"sheets": []}
         for _, spreadsheet in self.spreadsheets.items():
             name = spreadsheet.name
             cur_sheet = {'name': name, 'cell-contents': {}}
-            for location, c in spreadsheet.cells.items():
-                cur_sheet['cell-contents'][location] = c.contents
+            for c in spreadsheet.cells.values():
+                cur_sheet['cell-contents'][c.location] = c.contents
+            if spreadsheet.columns is not None:
+                for key, contents in spreadsheet.columns.items():
+                    cur_sheet['cell-contents'][string_conversions.key_to_location(key)] = \
+                        contents
             data["sheets"].append(cur_sheet)
         try:
             json.dump(data, fp, indent=4)
@@ -715,6 +1409,7 @@ class Workbook:
         if sheet_name.lower() not in self.spreadsheets:
             raise KeyError(f"Sheet name \"{sheet_name}\" not found.")
         check_valid_sheet_name(self, new_sheet_name)
+        self.__evaluate_pending()
         # Get current index of our original sheet
         index = list(self.spreadsheets.keys()).index(sheet_name.lower())
 
@@ -724,16 +1419,25 @@ class Workbook:
         self.spreadsheets[new_sheet_name.lower()].name = new_sheet_name
         self.move_sheet(new_sheet_name, index)
 
-        cells_to_update = self.__get_cells_containing_sheetname(sheet_name)
+        # formulas naming the sheet are edited to name it by its new name, and formulas
+        # that already named the new name, which didn't exist, are evaluated again
+        cells_to_update = list(self.__sheet_references.get(sheet_name.lower(), ()))
         for c in cells_to_update:
             new_contents = self.__get_cell_contents_after_rename(
                 c, sheet_name, new_sheet_name)
             self.set_cell_contents(c.sheet.name, c.location, new_contents)
 
-        ref_error_cells = self.__get_cells_containing_sheetname(new_sheet_name)
+        updated = set(cells_to_update)
+        ref_error_cells = list(self.__sheet_references.get(new_sheet_name.lower(), ()))
         for c in ref_error_cells:
-            if c not in cells_to_update:
+            if c not in updated:
                 self.set_cell_contents(c.sheet.name, c.location, c.contents)
+                updated.add(c)
+
+        # cells that choose what to read by value, such as INDIRECT, can name either sheet
+        # without referencing it, as with del_sheet()
+        lazy_cells = [c for c in self.graph if c.lazy and c not in updated]
+        self.__generate_notifications(self.__recalculate(lazy_cells))
 
     def move_sheet(self, sheet_name: str, index: int) -> None:
         # Move the specified sheet to the specified index in the workbook's
@@ -799,9 +1503,19 @@ class Workbook:
                 break
             i += 1
             copy_name = copy_name[:-2]
-        self.new_sheet(copy_name)
-        for location, c in self.spreadsheets[stored_name].cells.items():
-            self.set_cell_contents(copy_name, location, c.contents)
+        original = self.spreadsheets[stored_name]
+        self.new_sheet(copy_name, original.columns is not None)
+        copy = self.spreadsheets[copy_name.lower()]
+        # copied formulas can add cells to the original sheet, so iterate a copy. The
+        # copies are at the same locations, so they share the compiled formulas.
+        contents = [(key, c.contents, lark_module.compiled_formula(self, c, c.contents)
+                     if c.contents and c.contents[0] == "=" else None)
+                    for key, c in original.cells.items()]
+        if original.columns is not None:
+            contents = [(key, cell_contents, None)
+                        for key, cell_contents in original.columns.items()] + contents
+        for key, cell_contents, compiled in contents:
+            self.__set_cell_contents(copy, key, cell_contents, compiled)
         return len(self.spreadsheets) - 1, copy_name
 
     def move_cells(self, sheet_name: str, start_location: str,
@@ -934,42 +1648,194 @@ class Workbook:
         end_location = end_location.upper()
         top_left_col, top_left_row, bottom_right_col, bottom_right_row = \
             self.__get_selection_corners(start_location, end_location)
-        row_list = create_row_list(top_left_col, top_left_row, bottom_right_col,
-                                   bottom_right_row, spreadsheet, sort_cols)
+        for col in sort_cols:
+            if not 1 <= abs(col) <= bottom_right_col - top_left_col + 1:
+                raise ValueError(f"Sort col {col} is outside of the region")
+        self.__evaluate_pending()
+        corners = (top_left_col, top_left_row, bottom_right_col, bottom_right_row)
+        with self.__materialized([(spreadsheet, corners)]):
+            self.__sort_block(spreadsheet, corners, sort_cols)
 
-        # Get the original value of every cell in our sorting block
-        original_vals = {}
-        for j in range(top_left_col, bottom_right_col + 1):
-            column = string_conversions.num_to_col(j)
-            for i in range(top_left_row, bottom_right_row + 1):
-                location = column + str(i)
-                original_vals[location] = self.get_cell_value(sheet_name.lower(), location)
+    def __sort_block(self, spreadsheet: sheet.Sheet, corners: Tuple[int, int, int, int],
+                     sort_cols: List[int]) -> None:
+        """
+        Sort the rows of a block of cells and report the cells whose values changed, as
+        with sort_region().
 
-        with self.__disable_notify_calls():
-            row_list = sorted(row_list, key=cmp_to_key(compare))
-            # Initially set block to uninitialized values (ignore notifications)
-            # For later notifcations, we add a 'dummy' cell to act as a placeholder.
-            for j in range(top_left_col, bottom_right_col + 1):
-                column = string_conversions.num_to_col(j)
-                for i in range(top_left_row, bottom_right_row + 1):
-                    location = column + str(i)
-                    self.set_cell_contents(sheet_name.lower(), location, "")
-            update_all_block_contents(self, sheet_name, row_list, top_left_col, top_left_row)
-
-        # Iterate through all cells in the block again. If its value is different
-        # from its original value, then send a notification. Otherwise, remove it
-        # from the set of original cells
-        dummy_cells = set()
-        for j in range(top_left_col, bottom_right_col + 1):
-            column = string_conversions.num_to_col(j)
-            for i in range(top_left_row, bottom_right_row + 1):
-                location = column + str(i)
-                new_value = self.get_cell_value(sheet_name.lower(), location)
-                old_val = original_vals[location]
-                if isinstance(old_val, cell_error.CellError) and isinstance(
-                    new_value, cell_error.CellError):
-                    if old_val.get_type() != new_value.get_type():
-                        dummy_cells.add(cell.Cell(spreadsheet, location, None, None, None))
-                elif old_val != new_value:
-                    dummy_cells.add(cell.Cell(spreadsheet, location, None, None, None))
-        self.__generate_notifications(dummy_cells)
+        The sort is applied as a permutation of the rows: each cell of a row that moves
+        gets the contents its column had in the row moved into it, with the relative rows
+        of formula references moved along. Literals moved onto literals keep their values
+        and are stored as they are, so the only cells evaluated are the other cells that
+        changed and the formulas reading a value that changed. The cells to report are
+        those whose stored value differs from the one moved into them, and those that
+        evaluating gave a new value.
+        """
+        top_left_col, top_left_row, bottom_right_col, _ = corners
+        rows = sorted_rows(spreadsheet, corners, sort_cols)
+        # (key, contents, compiled formula shared with the original, value of a literal
+        # moved onto a literal) of every cell of the rows that move, all read before any
+        # cell changes, and the values of the other cells of those rows
+        moves = []
+        old_values = {}
+        for new_row, old_row in enumerate(rows, top_left_row):
+            if new_row == old_row:
+                continue
+            for col in range(top_left_col, bottom_right_col + 1):
+                key = string_conversions.to_key(col, new_row)
+                source = spreadsheet.cells.get(string_conversions.to_key(col, old_row))
+                target = spreadsheet.cells.get(key)
+                contents = source.contents if source is not None else None
+                compiled = None
+                literal = None
+                # formulas that don't parse are moved as they are, as with copy_cells()
+                if contents and contents[0] == "=":
+                    formula = lark_module.compiled_formula(self, source, contents)
+                    if formula is not None:
+                        contents, on_sheet = render(formula.form, key)
+                        compiled = formula if on_sheet else None
+                elif contents and target is not None and target.cell_type not in \
+                        (None, cell.CellType.EMPTY, cell.CellType.FORMULA):
+                    literal = (source.value, source.cell_type)
+                if literal is None:
+                    old_values[key] = self.__get_cell_value(spreadsheet, key)
+                moves.append((key, contents, compiled, literal))
+
+        changed_cells = {}
+        with self.__evaluate_immediately(), self.__evaluate_together() as evaluated:
+            for key, contents, compiled, literal in moves:
+                if literal is None:
+                    self.__set_cell_contents(spreadsheet, key, contents, compiled)
+                    continue
+                target = spreadsheet.cells[key]
+                old_value = target.value
+                target.contents = contents
+                target.set_fields(value=literal[0], cell_type=literal[1])
+                if self.__values_differ(literal[0], old_value):
+                    spreadsheet.update_column_indexes(key, literal[0])
+                    self.__defer_readers(target)
+                    changed_cells[target] = None
+        # cells that were edited are only reported if their value changed, not their type
+        for c in evaluated:
+            if c.sheet is not spreadsheet or c.key not in old_values or self.__values_differ(
+                    self.__get_cell_value(spreadsheet, c.key), old_values[c.key]):
+                changed_cells[c] = None
+        self.__generate_notifications(list(changed_cells))
+
+    def __defer_readers(self, c: cell.Cell) -> None:
+        """
+        Queue the formulas reading a cell, directly or through a range, to be evaluated
+        with the pending edits after the cell's value was changed without evaluating it.
+        """
+        readers = self.graph.dependents_of(c)
+        if self.graph.ranges:
+            for range_id in self.graph.ranges.query(c.sheet, c.key):
+                readers += self.graph.cells_of(self.graph.dependents[range_id])
+        for reader in readers:
+            self.__pending[reader] = None
+
+
+class WorkbookView(Workbook):
+    """
+    Read-only view of a workbook that is passed to notify functions in place of a copy.
+
+    Methods that only read the workbook are answered by the workbook itself. The first
+    time anything else is used (a method that changes the workbook, or an attribute such
+    as spreadsheets), the view makes a private deep copy of the workbook and works on the
+    copy from then on, so the workbook can't be changed through its view.
+    """
+
+    def __init__(self, workbook: Workbook):  # pylint: disable=super-init-not-called
+        # all of the view's state lives in the workbook or in its snapshot
+        self.__workbook = workbook
+        self.__snapshot: Optional[Workbook] = None
+
+    def __getattr__(self, name: str) -> Any:
+        # only called for attributes the view doesn't have, i.e. those of the workbook
+        if name.startswith("_WorkbookView__"):
+            raise AttributeError(name)
+        return getattr(self.snapshot(), name)
+
+    def __deepcopy__(self, memo):
+        return deepcopy(self.__target(), memo)
+
+    def __target(self) -> Workbook:
+        """The workbook that reads are answered from."""
+        if self.__snapshot is not None:
+            return self.__snapshot
+        return self.__workbook
+
+    def snapshot(self) -> Workbook:
+        """
+        Copy the workbook, if the view hasn't already done so, and use the copy from now
+        on so the view no longer follows changes to the workbook.
+
+        Returns:
+            Workbook: the view's private copy of the workbook
+        """
+        if self.__snapshot is None:
+            self.__snapshot = deepcopy(self.__workbook)
+        return self.__snapshot
+
+    def num_sheets(self) -> int:
+        return self.__target().num_sheets()
+
+    def list_sheets(self) -> List[str]:
+        return self.__target().list_sheets()
+
+    def get_sheet_extent(self, sheet_name: str) -> Tuple[int, int]:
+        return self.__target().get_sheet_extent(sheet_name)
+
+    def get_cell_contents(self, sheet_name: str, location: str) -> Optional[str]:
+        return self.__target().get_cell_contents(sheet_name, location)
+
+    def get_cell_value(self, sheet_name: str, location: str) -> Any:
+        return self.__target().get_cell_value(sheet_name, location)
+
+    def save_workbook(self, fp: TextIO) -> None:
+        self.__target().save_workbook(fp)
+
+    def new_sheet(self, sheet_name: Optional[str] = None,
+                  columnar: bool = False) -> Tuple[int, str]:
+        return self.snapshot().new_sheet(sheet_name, columnar)
+
+    def del_sheet(self, sheet_name: str) -> None:
+        self.snapshot().del_sheet(sheet_name)
+
+    def set_cell_contents(self, sheet_name: str, location: str,
+                          contents: Optional[str]) -> None:
+        self.snapshot().set_cell_contents(sheet_name, location, contents)
+
+    def set_cells_contents(self, sheet_name: str,
+                           contents: Dict[str, Optional[str]]) -> None:
+        self.snapshot().set_cells_contents(sheet_name, contents)
+
+    def batch(self) -> Iterator[None]:
+        return self.snapshot().batch()
+
+    def notify_cells_changed(self, notify_function:
+                             Callable[[Workbook, Iterable[Tuple[str, str]]],
+                                      None]) -> None:
+        self.snapshot().notify_cells_changed(notify_function)
+
+    def rename_sheet(self, sheet_name: str, new_sheet_name: str) -> None:
+        self.snapshot().rename_sheet(sheet_name, new_sheet_name)
+
+    def move_sheet(self, sheet_name: str, index: int) -> None:
+        self.snapshot().move_sheet(sheet_name, index)
+
+    def copy_sheet(self, sheet_name: str) -> Tuple[int, str]:
+        return self.snapshot().copy_sheet(sheet_name)
+
+    def move_cells(self, sheet_name: str, start_location: str,
+                   end_location: str, to_location: str, to_sheet: Optional[str] = None) -> None:
+        self.snapshot().move_cells(sheet_name, start_location, end_location, to_location,
+                                   to_sheet)
+
+    def copy_cells(self, sheet_name: str, start_location: str,
+                   end_location: str, to_location: str, to_sheet: Optional[str] = None) -> None:
+        self.snapshot().copy_cells(sheet_name, start_location, end_location, to_location,
+                                   to_sheet)
+
+    def sort_region(self, sheet_name: str, start_location: str, end_location: str,
+                    sort_cols: List[int]):
+        return self.snapshot().sort_region(sheet_name, start_location, end_location, sort_cols)
@@ -1,10 +1,7 @@
 """Selection of utility functions for Workbook class."""
-import copy
-import re
 from decimal import Decimal
-from typing import List
-from sheets import cell, cell_error, sheet, \
-    string_conversions, unitialized_value, row
+from typing import Any, List, Tuple
+from sheets import cell_error, sheet, string_conversions, unitialized_value
 
 ALLOWED_PUNC = set([".", "?", "!", ",", ":", ";", "@", "#",
                     "$", "%", "^", "&", "*", "(", ")", "-", "_"])
@@ -38,130 +35,86 @@ def check_valid_sheet_name(wb, sheet_name: str) -> None:
         raise ValueError("Duplicate spreadsheet name")
 
 
-def update_extent(spreadsheet: sheet.Sheet, location: str, deleting_cell: bool):
+def update_extent(spreadsheet: sheet.Sheet, key: int, deleting_cell: bool):
     """
     Update the extent of a sheet if we are deleting a cell
     """
     if deleting_cell:
         sheet_col, sheet_row = spreadsheet.extent_col, spreadsheet.extent_row
-        loc_col, loc_row = string_conversions.str_to_tuple(location)
+        loc_col, loc_row = string_conversions.key_to_tuple(key)
         max_col, max_row = 0, 0
         if loc_col == sheet_col or loc_row == sheet_row:
-            for c in spreadsheet.cells:
-                if spreadsheet.cells[c].cell_type != cell.CellType.EMPTY:
-                    c_col, c_row = string_conversions.str_to_tuple(
-                        spreadsheet.cells[c].location)
+            for c_key, c in spreadsheet.cells.items():
+                # cells edited inside a batch may not have been evaluated yet
+                if c.contents:
+                    c_col, c_row = string_conversions.key_to_tuple(c_key)
+                    max_col = max(max_col, c_col)
+                    max_row = max(max_row, c_row)
+            if spreadsheet.columns is not None:
+                for c_key in spreadsheet.columns.keys():
+                    c_col, c_row = string_conversions.key_to_tuple(c_key)
                     max_col = max(max_col, c_col)
                     max_row = max(max_row, c_row)
             spreadsheet.extent_col = max_col
             spreadsheet.extent_row = max_row
     else:
-        curr_col, curr_row = string_conversions.str_to_tuple(location)
+        curr_col, curr_row = string_conversions.key_to_tuple(key)
         spreadsheet.extent_col = max(curr_col, spreadsheet.extent_col)
         spreadsheet.extent_row = max(curr_row, spreadsheet.extent_row)
 
 
-def create_row_list(top_left_col, top_left_row, bottom_right_col, bottom_right_row,
-                    spreadsheet, sort_cols) -> List[row.Row]:
-    row_list = []
-    for i in range(top_left_row, bottom_right_row + 1):
-        cur_row = []  # list of Cell objects
-        for j in range(top_left_col, bottom_right_col + 1):
-            start_cell_col = string_conversions.num_to_col(j)
-            cell_loc = start_cell_col + str(i)
-            if cell_loc in spreadsheet.cells:
-                deep_copy = copy.deepcopy(spreadsheet.cells[cell_loc])
-                cur_row.append(deep_copy)
-            else:
-                cur_row.append(unitialized_value.EmptySortCell())
-        row_list.append(row.Row(sort_cols, i, cur_row))
-    return row_list
-
-
-def update_all_block_contents(wb, sheet_name, row_list, top_left_col, top_left_row) -> None:
-    for i, row_obj in enumerate(row_list):
-        for j, c in enumerate(row_obj.cell_list):
-            new_row = top_left_row + i
-            new_col = string_conversions.num_to_col(top_left_col + j)
-            new_location = new_col + str(new_row)
-            if not isinstance(
-                c, unitialized_value.EmptySortCell) and c.cell_type == cell.CellType.FORMULA:
-                _, old_row = string_conversions.str_to_tuple(
-                    c.location)
-                delta_row = new_row - old_row
-                sheetname_pattern = r"\'[^']*\'!|[A-Za-z_][A-Za-z0-9_]*!"
-                cell_pattern = r'(?<!")\$?[A-Za-z]+\$?[1-9][0-9]*(?!")'
-                pattern = f"(?:{sheetname_pattern})?({cell_pattern})"
-                locations = re.findall(pattern, c.contents)
-                for loc in locations:
-                    loc = loc.upper()
-                    # If $ precedes col or row, do not update relative location
-                    # In the regex, () defines the two groups
-                    match = re.match(
-                        r"(\$?[A-Za-z]+)(\$?[1-9][0-9]*)", loc)
-                    col_match = match.group(1)
-                    row_match = match.group(2)
-                    new_loc = col_match
-                    if row_match[0] != "$":
-                        # row_match = top_left_row + i
-                        row_match = delta_row + int(row_match)
-                        new_loc += str(row_match)
-                    else:
-                        new_loc += row_match
-                    if not string_conversions.check_valid_location(new_loc):
-                        new_loc = "#REF!"
-                    # Note that re.escape ensures we can properly search for $ in loc
-                    # Normally, you'd have to escape $A$1 like \$A\$1
-                    c.contents = re.sub(
-                        re.escape(loc), new_loc, c.contents, flags=re.IGNORECASE)
-            if not isinstance(c, unitialized_value.EmptySortCell):
-                wb.set_cell_contents(
-                    sheet_name.lower(), new_location, c.contents)
-
-
-def compare(obj1, obj2):
-    # boolean > str > decimal > error > uninitialized (blank)
-    type_map = {
-        unitialized_value.EmptySortCell: 1,
-        unitialized_value.UninitializedValue : 1,
-        type(None) : 1,
-        cell_error.CellError: 2,
-        Decimal: 3,
-        str: 4,
-        bool: 5
-    }
-    for i, sort_col in enumerate(obj1.sort_cols):
-        index = abs(sort_col) - 1
-        item1, item2 = obj1.cell_list[index], obj2.cell_list[index]
-        if isinstance(item1, cell.Cell):
-            item1 = item1.value
-        if isinstance(item2, cell.Cell):
-            item2 = item2.value
-        val1 = type_map[type(item1)]
-        val2 = type_map[type(item2)]
-        reverse = obj1.rev_list[i]
-        return_val = None
-        if val1 == val2:
-            if val1 == 2:
-                if item1.get_value() < item2.get_value():
-                    return_val = -1
-                elif item1.get_value() > item2.get_value():
-                    return_val = 1
-            elif val1 != 1:
-                if item1 < item2:
-                    return_val = -1
-                elif item1 > item2:
-                    return_val = 1
-        else:
-            if val1 < val2:
-                return_val = -1
-            elif val1 > val2:
-                return_val = 1
-
-        # If return value isn't null, return -1 or 1
-        if return_val and reverse:
-            return -1 * return_val
-        if return_val:
-            return return_val
-    # All checks for inequality fail, two lists must be equal
-    return 0
+# rank of each type of value in a sort, so that blanks sort before errors, errors before
+# numbers, numbers before strings and strings before booleans
+SORT_RANKS = {
+    type(None): 1,
+    unitialized_value.UninitializedValue: 1,
+    cell_error.CellError: 2,
+    Decimal: 3,
+    str: 4,
+    bool: 5
+}
+
+
+def sort_key(value: Any) -> Tuple[int, Any]:
+    """
+    Key that a cell value is sorted by: the rank of its type, then the value itself.
+    Blanks are all equal, and errors are ordered by their type.
+    """
+    rank = SORT_RANKS[type(value)]
+    if rank == 1:
+        return rank, 0
+    if rank == 2:
+        return rank, value.get_value()
+    return rank, value
+
+
+def sorted_rows(spreadsheet: sheet.Sheet, corners: Tuple[int, int, int, int],
+                sort_cols: List[int]) -> List[int]:
+    """
+    Sort the rows of a region of a sheet by the values in the sort columns.
+
+    The rows are sorted once per sort column, from the last to the first, with keys
+    computed once per row. Python's sort is stable (also in reverse), so rows that are
+    equal in a column keep the order given by the columns after it, and rows equal in
+    every column keep their original order.
+
+    Args:
+        spreadsheet (Sheet): sheet the region is in
+        corners (Tuple[int, int, int, int]): (top left col, top left row, bottom right
+        col, bottom right row) of the region
+        sort_cols (List[int]): 1-based columns of the region to sort by, negative for
+        descending order
+
+    Returns:
+        List[int]: the rows of the region in sorted order
+    """
+    top_left_col, top_left_row, _, bottom_right_row = corners
+    rows = list(range(top_left_row, bottom_right_row + 1))
+    for sort_col in reversed(sort_cols):
+        col = top_left_col + abs(sort_col) - 1
+        keys = {}
+        for i in rows:
+            c = spreadsheet.cells.get(string_conversions.to_key(col, i))
+            keys[i] = sort_key(c.value if c is not None else None)
+        rows.sort(key=keys.__getitem__, reverse=sort_col < 0)
+    return rows
@@ -0,0 +1,309 @@
+"""
+Unit tests for cell ranges, sheets.range_index and sheets.column_aggregate
+"""
+
+import unittest
+import io
+import decimal
+from context import sheets
+
+key = sheets.string_conversions.location_to_key
+
+
+def range_sum(args):
+    total = decimal.Decimal(0)
+    for arg in args:
+        for value in arg.values() if isinstance(arg, sheets.cell_range.CellRange) else [arg]:
+            if isinstance(value, sheets.CellError):
+                return value
+            if isinstance(value, decimal.Decimal):
+                total += value
+    return total
+
+
+def make_workbook(columnar=False):
+    wb = sheets.Workbook()
+    wb.function_directory.directory["RANGESUM"] = range_sum
+    wb.function_directory.range_functions.add("RANGESUM")
+    wb.new_sheet("Sheet1", columnar=columnar)
+    return wb
+
+
+class RangeIndexTests(unittest.TestCase):
+    """
+    Unit tests for sheets.range_index.RangeIndex
+    """
+
+    def test_segments_cover_interval(self):
+        for low, high in [(0, 0), (1, 9999), (5, 6), (3, 3), (1, 16383)]:
+            covered = []
+            for node in sheets.range_index.segments(low, high, 14):
+                depth = node.bit_length() - 1
+                width = 1 << (14 - depth)
+                start = (node - (1 << depth)) * width
+                covered.extend(range(start, start + width))
+            self.assertEqual(sorted(covered), list(range(low, high + 1)))
+
+    def test_query(self):
+        index = sheets.range_index.RangeIndex()
+        spreadsheet = sheets.sheet.Sheet("Sheet1")
+        other = sheets.sheet.Sheet("Sheet2")
+        index.add(spreadsheet, (1, 1, 1, 9999), 0)
+        index.add(spreadsheet, (2, 5, 4, 10), 1)
+        index.add(other, (1, 1, 1, 1), 2)
+        self.assertEqual(index.query(spreadsheet, key("A5000")), [0])
+        self.assertEqual(sorted(index.query(spreadsheet, key("B5"))), [1])
+        self.assertEqual(index.query(spreadsheet, key("E5")), [])
+        self.assertEqual(index.query(spreadsheet, key("C11")), [])
+        self.assertEqual(index.query(other, key("A1")), [2])
+        index.add(spreadsheet, (1, 1, 2, 5), 3)
+        self.assertEqual(sorted(index.query(spreadsheet, key("A1"))), [0, 3])
+        index.remove(spreadsheet, (1, 1, 1, 9999), 0)
+        self.assertEqual(index.query(spreadsheet, key("A1")), [3])
+        index.remove(other, (1, 1, 1, 1), 2)
+        self.assertNotIn(other, index.sheets)
+
+
+class CellRangeTests(unittest.TestCase):
+    """
+    Unit tests for formulas with cell ranges
+    """
+
+    def test_parse(self):
+        wb = make_workbook()
+        wb.set_cell_contents("Sheet1", "A1", "1")
+        wb.set_cell_contents("Sheet1", "B2", "2")
+        wb.set_cell_contents("Sheet1", "C1", "=RANGESUM(B2:A1)")
+        wb.set_cell_contents("Sheet1", "C2", "=RANGESUM(Sheet1!$A$1 : B2, 3)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "C1"), 3)
+        self.assertEqual(wb.get_cell_value("Sheet1", "C2"), 6)
+        for formula in ["=A1:B2", "=RANGESUM(A1:B2 + 1)", "=RANGESUM((A1:B2))"]:
+            wb.set_cell_contents("Sheet1", "D1", formula)
+            self.assertEqual(wb.get_cell_value("Sheet1", "D1").get_type(),
+                             sheets.CellErrorType.PARSE_ERROR)
+        wb.set_cell_contents("Sheet1", "D1", "=RANGESUM(A1:ZZZZZ1)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "D1").get_type(),
+                         sheets.CellErrorType.BAD_REFERENCE)
+        wb.set_cell_contents("Sheet1", "D1", "=RANGESUM(Missing!A1:B2)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "D1").get_type(),
+                         sheets.CellErrorType.BAD_REFERENCE)
+
+    def test_functions_without_ranges(self):
+        wb = make_workbook()
+        for formula in ["=AND(A1:B2)", "=IF(TRUE, A1:B2)", "=CHOOSE(1, A1:B2)"]:
+            wb.set_cell_contents("Sheet1", "D1", formula)
+            self.assertEqual(wb.get_cell_value("Sheet1", "D1").get_type(),
+                             sheets.CellErrorType.TYPE_ERROR)
+        wb.set_cell_contents("Sheet1", "D1", "=NOTAFUNCTION(A1:B2)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "D1").get_type(),
+                         sheets.CellErrorType.BAD_NAME)
+        self.assertEqual(wb.graph.range_nodes, {})
+
+    def test_edits_within_range(self):
+        notified = []
+        wb = make_workbook()
+        wb.set_cell_contents("Sheet1", "C1", "=RANGESUM(A1:B100)")
+        wb.notify_cells_changed(lambda _, cells: notified.append(list(cells)))
+        wb.set_cell_contents("Sheet1", "A50", "5")
+        wb.set_cell_contents("Sheet1", "B100", "=A50 * 2")
+        self.assertEqual(wb.get_cell_value("Sheet1", "C1"), 15)
+        wb.set_cell_contents("Sheet1", "A50", "1")
+        self.assertEqual(wb.get_cell_value("Sheet1", "C1"), 3)
+        wb.set_cell_contents("Sheet1", "A50", None)
+        self.assertEqual(wb.get_cell_value("Sheet1", "C1"), 0)
+        self.assertEqual(notified, [[("Sheet1", "A50"), ("Sheet1", "C1")],
+                                    [("Sheet1", "B100"), ("Sheet1", "C1")],
+                                    [("Sheet1", "A50"), ("Sheet1", "B100"), ("Sheet1", "C1")],
+                                    [("Sheet1", "A50"), ("Sheet1", "B100"), ("Sheet1", "C1")]])
+        # the cells within the range aren't linked to the formula one by one
+        self.assertEqual(len(wb.graph), 4)
+        wb.set_cell_contents("Sheet1", "C1", None)
+        self.assertEqual(wb.graph.range_nodes, {})
+        self.assertEqual(len(wb.graph.ranges), 0)
+
+    def test_columnar_and_batch(self):
+        wb = make_workbook(columnar=True)
+        wb.set_cells_contents("Sheet1", {"A1": "1", "A2": "2", "B1": "=RANGESUM(A1:A3)"})
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 3)
+        # literals read through a range stay in the sheet's columns
+        self.assertEqual(set(wb.spreadsheets["sheet1"].cells), {key("B1")})
+        wb.set_cell_contents("Sheet1", "A3", "4")
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 7)
+        with wb.batch():
+            wb.set_cell_contents("Sheet1", "A1", "10")
+            wb.set_cell_contents("Sheet1", "A2", None)
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 14)
+
+    def test_cycles(self):
+        wb = make_workbook()
+        wb.set_cell_contents("Sheet1", "A1", "=RANGESUM(A1:A3)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1").get_type(),
+                         sheets.CellErrorType.CIRCULAR_REFERENCE)
+        wb.set_cell_contents("Sheet1", "B1", "=RANGESUM(C1:C2)")
+        wb.set_cell_contents("Sheet1", "C2", "=B1 + 1")
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1").get_type(),
+                         sheets.CellErrorType.CIRCULAR_REFERENCE)
+        self.assertEqual(wb.get_cell_value("Sheet1", "C2").get_type(),
+                         sheets.CellErrorType.CIRCULAR_REFERENCE)
+        wb.set_cell_contents("Sheet1", "C2", "5")
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 5)
+
+    def test_sheets(self):
+        wb = make_workbook()
+        wb.new_sheet("Data")
+        wb.set_cell_contents("Data", "A1", "2")
+        wb.set_cell_contents("Sheet1", "A1", "=RANGESUM(Data!A1:B2)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), 2)
+        wb.rename_sheet("Data", "Other")
+        self.assertEqual(wb.get_cell_contents("Sheet1", "A1"), "=RANGESUM(Other!A1:B2)")
+        wb.set_cell_contents("Other", "B2", "3")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), 5)
+        wb.del_sheet("Other")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1").get_type(),
+                         sheets.CellErrorType.BAD_REFERENCE)
+        self.assertEqual(wb.graph.range_nodes, {})
+        wb.new_sheet("Other")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), 0)
+
+    def test_load(self):
+        wb = make_workbook()
+        wb.set_cell_contents("Sheet1", "A1", "=RANGESUM(B1:B3)")
+        wb.set_cell_contents("Sheet1", "B1", "=1/0")
+        wb.set_cell_contents("Sheet1", "B2", "=RANGESUM(C1:C2)")
+        wb.set_cell_contents("Sheet1", "C1", "4")
+        f = io.StringIO()
+        wb.save_workbook(f)
+        wb.set_cell_contents("Sheet1", "B1", "1")
+        g = io.StringIO()
+        wb.save_workbook(g)
+        directory = sheets.functions.FunctionDirectory
+        init = directory.__init__
+
+        def with_range_sum(self):
+            init(self)
+            self.directory["RANGESUM"] = range_sum
+            self.range_functions.add("RANGESUM")
+        directory.__init__ = with_range_sum
+        try:
+            f.seek(0)
+            loaded = sheets.Workbook.load_workbook(f)
+            g.seek(0)
+            loaded2 = sheets.Workbook.load_workbook(g)
+        finally:
+            directory.__init__ = init
+        self.assertEqual(loaded.get_cell_value("Sheet1", "A1").get_type(),
+                         sheets.CellErrorType.DIVIDE_BY_ZERO)
+        self.assertEqual(loaded2.get_cell_value("Sheet1", "A1"), 5)
+        loaded2.set_cell_contents("Sheet1", "C2", "1")
+        self.assertEqual(loaded2.get_cell_value("Sheet1", "A1"), 6)
+
+
+class ColumnAggregateTests(unittest.TestCase):
+    """
+    Unit tests for sheets.column_aggregate.ColumnAggregate
+    """
+
+    def test_query(self):
+        error = sheets.CellError(sheets.CellErrorType.DIVIDE_BY_ZERO, "")
+        column = sheets.column_aggregate.ColumnAggregate(
+            {1: decimal.Decimal(3), 2: "text", 4: decimal.Decimal(-1), 5: error})
+        self.assertEqual(column.query(1, 5), (2, 2, 1, -1, 3))
+        self.assertEqual(column.query(2, 3), sheets.column_aggregate.EMPTY_AGGREGATE)
+        self.assertEqual(column.query(5, 9999), (0, 0, 1, decimal.Decimal("Infinity"),
+                                                 decimal.Decimal("-Infinity")))
+        column.set(4, None)
+        column.set(5, decimal.Decimal(7))
+        self.assertEqual(column.query(1, 9999), (10, 2, 0, 3, 7))
+
+    def test_grow(self):
+        column = sheets.column_aggregate.ColumnAggregate({})
+        column.set(1, decimal.Decimal(1))
+        column.set(9999, decimal.Decimal(2))
+        column.set(5000, "text")
+        self.assertEqual(column.query(1, 9999)[:3], (3, 2, 0))
+        self.assertEqual(column.query(2, 9998)[:3], (0, 0, 0))
+
+
+class AggregateFunctionTests(unittest.TestCase):
+    """
+    Unit tests for SUM, AVERAGE, MIN, MAX and COUNT
+    """
+
+    def test_values(self):
+        wb = make_workbook()
+        for i in range(1, 11):
+            wb.set_cell_contents("Sheet1", f"A{i}", str(i))
+        wb.set_cell_contents("Sheet1", "B1", "text")
+        wb.set_cell_contents("Sheet1", "B2", "TRUE")
+        expected = {"=SUM(A1:B10)": 55, "=AVERAGE(A1:B10)": 5.5, "=MIN(A3:A10, 2.5)": 2.5,
+                    "=MAX(A1:A4)": 4, "=COUNT(A1:B10, 1)": 11, "=SUM(A1:A3, TRUE, \"2\")": 9,
+                    "=MIN(B1:B2)": 0, "=MAX(B1:B2)": 0, "=COUNT(A1, \"x\", B1:B2)": 1}
+        for formula, value in expected.items():
+            wb.set_cell_contents("Sheet1", "C1", formula)
+            self.assertEqual(wb.get_cell_value("Sheet1", "C1"), decimal.Decimal(value), formula)
+        for formula in ["=SUM()", "=SUM(A1, \"text\")", "=COUNT()"]:
+            wb.set_cell_contents("Sheet1", "C1", formula)
+            self.assertEqual(wb.get_cell_value("Sheet1", "C1").get_type(),
+                             sheets.CellErrorType.TYPE_ERROR, formula)
+        wb.set_cell_contents("Sheet1", "C1", "=AVERAGE(B1:B2)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "C1").get_type(),
+                         sheets.CellErrorType.DIVIDE_BY_ZERO)
+
+    def test_errors(self):
+        wb = make_workbook()
+        wb.set_cell_contents("Sheet1", "A1", "1")
+        wb.set_cell_contents("Sheet1", "A5", "=1/0")
+        wb.set_cell_contents("Sheet1", "A9", "=Missing!A1")
+        wb.set_cell_contents("Sheet1", "B1", "=SUM(A1:A10)")
+        wb.set_cell_contents("Sheet1", "B2", "=COUNT(A1:A10)")
+        wb.set_cell_contents("Sheet1", "B3", "=MAX(A1:A8)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1").get_type(),
+                         sheets.CellErrorType.BAD_REFERENCE)
+        self.assertEqual(wb.get_cell_value("Sheet1", "B2"), 1)
+        self.assertEqual(wb.get_cell_value("Sheet1", "B3").get_type(),
+                         sheets.CellErrorType.DIVIDE_BY_ZERO)
+        wb.set_cell_contents("Sheet1", "A5", "7")
+        self.assertEqual(wb.get_cell_value("Sheet1", "B3"), 7)
+        wb.set_cell_contents("Sheet1", "A9", None)
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 8)
+        self.assertEqual(wb.get_cell_value("Sheet1", "B2"), 2)
+
+    def test_incremental(self):
+        notified = []
+        wb = make_workbook()
+        wb.set_cell_contents("Sheet1", "B1", "=SUM(A1:A9999)")
+        wb.notify_cells_changed(lambda _, cells: notified.append(list(cells)))
+        wb.set_cell_contents("Sheet1", "A9999", "5")
+        wb.set_cell_contents("Sheet1", "A2", "=A9999 * 2")
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 15)
+        # text in a range is ignored, but the formula reading it still converts it
+        wb.set_cell_contents("Sheet1", "A9999", "'5")
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 10)
+        self.assertEqual(notified[-1], [("Sheet1", "A9999"), ("Sheet1", "B1")])
+
+    def test_columnar_and_batch(self):
+        wb = make_workbook(columnar=True)
+        wb.set_cells_contents("Sheet1", {f"A{i}": str(i) for i in range(1, 101)})
+        wb.set_cell_contents("Sheet1", "B1", "=AVERAGE(A1:A100)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), decimal.Decimal("50.5"))
+        with wb.batch():
+            wb.set_cell_contents("Sheet1", "A1", "100")
+            wb.set_cell_contents("Sheet1", "A100", None)
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 51)
+
+    def test_load(self):
+        wb = make_workbook()
+        wb.set_cell_contents("Sheet1", "A1", "=MIN(B1:B3)")
+        wb.set_cell_contents("Sheet1", "B1", "4")
+        wb.set_cell_contents("Sheet1", "B2", "=B1 - 5")
+        f = io.StringIO()
+        wb.save_workbook(f)
+        f.seek(0)
+        loaded = sheets.Workbook.load_workbook(f)
+        self.assertEqual(loaded.get_cell_value("Sheet1", "A1"), -1)
+        loaded.set_cell_contents("Sheet1", "B3", "-2")
+        self.assertEqual(loaded.get_cell_value("Sheet1", "A1"), -2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+Unit tests for columnar sheets and sheets.column_store
+"""
+
+import unittest
+import io
+import json
+import decimal
+from context import sheets
+
+key = sheets.string_conversions.location_to_key
+
+
+class ColumnStoreTests(unittest.TestCase):
+    """
+    Unit tests for sheets.column_store.ColumnStore
+    """
+
+    def test_numbers_round_trip(self):
+        store = sheets.column_store.ColumnStore()
+        contents = ["1", "-7", "1.50", "0", "-0", "007", ".5", "3.", "0.0000001",
+                    "123456789012345678901234", "'x", "TRUE", "#REF!", "abc"]
+        for row, text in enumerate(contents, 1):
+            store.set(key(f"B{row}"), text)
+        self.assertEqual(len(store), len(contents))
+        for row, text in enumerate(contents, 1):
+            self.assertEqual(store.get(key(f"B{row}")), text)
+        column = store.columns[2]
+        self.assertEqual(column.tags[1:5], bytes([1, 1, 1, 1]))
+        self.assertEqual(column.tags[5:], bytes([2] * (len(contents) - 4)))
+
+    def test_overwrite_and_pop(self):
+        store = sheets.column_store.ColumnStore()
+        store.set(key("A3"), "'x")
+        store.set(key("A3"), "2.5")
+        store.set(key("C1"), "1")
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.columns[1].text, {})
+        self.assertEqual(store.pop(key("A3")), "2.5")
+        self.assertIsNone(store.pop(key("A3")))
+        self.assertNotIn(key("A3"), store)
+        self.assertNotIn(1, store.columns)
+        self.assertEqual(list(store.items()), [(key("C1"), "1")])
+
+    def test_keys_in_region(self):
+        store = sheets.column_store.ColumnStore()
+        for location in ["A1", "B2", "B5", "D3", "E1"]:
+            store.set(key(location), "1")
+        self.assertEqual(store.keys_in(2, 2, 4, 4), [key("B2"), key("D3")])
+        self.assertEqual(list(store.keys()),
+                         [key(location) for location in ["A1", "B2", "B5", "D3", "E1"]])
+
+
+class ColumnarSheetTests(unittest.TestCase):
+    """
+    Unit tests for workbooks with columnar sheets
+    """
+
+    def test_literals_without_cells(self):
+        wb = sheets.Workbook()
+        wb.new_sheet("Data", columnar=True)
+        wb.set_cell_contents("Data", "A1", " 1.50 ")
+        wb.set_cell_contents("Data", "B2", "'text")
+        wb.set_cell_contents("Data", "C3", "false")
+        spreadsheet = wb.spreadsheets["data"]
+        self.assertEqual(spreadsheet.cells, {})
+        self.assertEqual(len(spreadsheet.columns), 3)
+        self.assertEqual(wb.get_cell_contents("Data", "A1"), "1.50")
+        self.assertEqual(wb.get_cell_value("Data", "A1"), decimal.Decimal("1.5"))
+        self.assertEqual(wb.get_cell_value("Data", "B2"), "text")
+        self.assertIs(wb.get_cell_value("Data", "C3"), False)
+        self.assertEqual(wb.get_sheet_extent("Data"), (3, 3))
+        wb.set_cell_contents("Data", "C3", None)
+        self.assertEqual(wb.get_sheet_extent("Data"), (2, 2))
+
+    def test_formulas_materialize_cells(self):
+        wb = sheets.Workbook()
+        wb.new_sheet("Data", columnar=True)
+        wb.set_cell_contents("Data", "A1", "2")
+        wb.set_cell_contents("Data", "A2", "3")
+        wb.set_cell_contents("Data", "B1", "=A1 * 10")
+        spreadsheet = wb.spreadsheets["data"]
+        self.assertEqual(set(spreadsheet.cells), {key("A1"), key("B1")})
+        self.assertNotIn(key("A1"), spreadsheet.columns)
+        self.assertIn(key("A2"), spreadsheet.columns)
+        wb.set_cell_contents("Data", "A1", "4")
+        self.assertEqual(wb.get_cell_value("Data", "B1"), 40)
+        wb.set_cell_contents("Data", "A2", "=A1")
+        self.assertEqual(wb.get_cell_value("Data", "A2"), 4)
+        self.assertNotIn(key("A2"), spreadsheet.columns)
+
+    def test_notifications(self):
+        notified = []
+        wb = sheets.Workbook()
+        wb.new_sheet("Data", columnar=True)
+        wb.notify_cells_changed(lambda _, cells: notified.append(list(cells)))
+        wb.set_cell_contents("Data", "A1", "1")
+        wb.set_cell_contents("Data", "A1", "1.0")
+        wb.set_cell_contents("Data", "A1", "'1.0")
+        wb.set_cell_contents("Data", "A1", None)
+        self.assertEqual(notified, [[("Data", "A1")]] * 3)
+        notified.clear()
+        with wb.batch():
+            wb.set_cell_contents("Data", "A1", "5")
+            wb.set_cell_contents("Data", "A1", None)
+            wb.set_cell_contents("Data", "B1", "5")
+        self.assertEqual(notified, [[("Data", "B1")]])
+
+    def test_move_copy_and_sort(self):
+        wb = sheets.Workbook()
+        wb.new_sheet("Data", columnar=True)
+        wb.set_cells_contents("Data", {"A1": "3", "A2": "1", "A3": "2", "B1": "=A1 + 1"})
+        wb.copy_cells("Data", "A1", "B3", "C1")
+        self.assertEqual([wb.get_cell_value("Data", f"D{row}") for row in range(1, 4)],
+                         [4, None, None])
+        wb.move_cells("Data", "C1", "C3", "E1")
+        self.assertEqual([wb.get_cell_contents("Data", f"E{row}") for row in range(1, 4)],
+                         ["3", "1", "2"])
+        wb.sort_region("Data", "E1", "E3", [1])
+        self.assertEqual([wb.get_cell_value("Data", f"E{row}") for row in range(1, 4)],
+                         [1, 2, 3])
+        spreadsheet = wb.spreadsheets["data"]
+        # literals that no formula reads are back in the columns afterwards
+        self.assertEqual(set(spreadsheet.cells),
+                         {key(location) for location in ["A1", "B1", "C1", "D1"]})
+
+    def test_save_copy_and_rename(self):
+        wb = sheets.Workbook()
+        wb.new_sheet("Data", columnar=True)
+        wb.new_sheet("Other")
+        wb.set_cells_contents("Data", {"A1": "1", "A2": "'Other!A1", "B1": "=Other!A1"})
+        wb.set_cell_contents("Other", "A1", "7")
+        _, name = wb.copy_sheet("Data")
+        self.assertIsNotNone(wb.spreadsheets[name.lower()].columns)
+        self.assertEqual(wb.get_cell_value(name, "B1"), 7)
+        wb.rename_sheet("Other", "Renamed")
+        # only formulas reference sheets, so strings that look like references stay as
+        # they are
+        self.assertEqual(wb.get_cell_contents("Data", "A2"), "'Other!A1")
+        self.assertEqual(wb.get_cell_contents("Data", "B1"), "=Renamed!A1")
+        f = io.StringIO()
+        wb.save_workbook(f)
+        saved = json.loads(f.getvalue())["sheets"][0]["cell-contents"]
+        self.assertEqual(saved, {"A1": "1", "A2": "'Other!A1", "B1": "=Renamed!A1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
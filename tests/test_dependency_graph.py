@@ -0,0 +1,98 @@
+"""
+Unit tests for implementation of sheets.DependencyGraph
+"""
+
+import unittest
+from context import sheets
+
+
+def make_cells(n):
+    spreadsheet = sheets.sheet.Sheet("sheet1")
+    return [sheets.cell.Cell(spreadsheet, sheets.string_conversions.to_key(1, i + 1),
+                             None, None, None) for i in range(n)]
+
+
+class DependencyGraphTests(unittest.TestCase):
+    """
+    Unit tests for sheets.dependency_graph.DependencyGraph
+    """
+
+    def test_add_edge(self):
+        graph = sheets.DependencyGraph()
+        a1, a2 = make_cells(2)
+        graph.add_edge(a1, a2)
+        self.assertIn(a1, graph)
+        self.assertIn(a2, graph)
+        self.assertEqual(graph.dependents_of(a1), [a2])
+        self.assertEqual(graph.precedents_of(a2), [a1])
+        self.assertEqual(graph.dependents_of(a2), [])
+        self.assertEqual(len(graph), 2)
+
+    def test_duplicate_edge(self):
+        graph = sheets.DependencyGraph()
+        a1, a2 = make_cells(2)
+        graph.add_edge(a1, a2)
+        graph.add_edge(a1, a2)
+        self.assertEqual(graph.dependents_of(a1), [a2])
+
+    def test_unlink_precedents(self):
+        graph = sheets.DependencyGraph()
+        a1, a2, a3 = make_cells(3)
+        graph.add_edge(a1, a3)
+        graph.add_edge(a2, a3)
+        graph.unlink_precedents(a3, [a2])
+        self.assertEqual(graph.precedents_of(a3), [a2])
+        self.assertFalse(graph.has_dependents(a1))
+        self.assertTrue(graph.has_dependents(a2))
+
+    def test_dynamic_precedents(self):
+        graph = sheets.DependencyGraph()
+        a1, a2, a3, a4 = make_cells(4)
+        self.assertTrue(graph.link_precedents(a4, [a1], [a1, a2]))
+        self.assertEqual(graph.dynamic, {a4.node_id: {a2.node_id}})
+        self.assertFalse(graph.link_precedents(a4, [a1], [a2]))
+        # a static precedent read by value again stays static
+        self.assertTrue(graph.relink_dynamic(a4, [a1, a3]))
+        self.assertEqual(set(graph.precedents_of(a4)), {a1, a3})
+        self.assertEqual(graph.dynamic, {a4.node_id: {a3.node_id}})
+        self.assertFalse(graph.relink_dynamic(a4, [a3]))
+        graph.remove_cell(a3)
+        self.assertEqual(graph.dynamic, {})
+        self.assertFalse(graph.relink_dynamic(a4, []))
+        self.assertEqual(graph.precedents_of(a4), [a1])
+
+    def test_remove_cell_reuses_id(self):
+        graph = sheets.DependencyGraph()
+        a1, a2, a3 = make_cells(3)
+        graph.add_edge(a1, a2)
+        removed_id = a1.node_id
+        graph.remove_cell(a1)
+        self.assertNotIn(a1, graph)
+        self.assertIsNone(a1.node_id)
+        self.assertEqual(graph.precedents_of(a2), [])
+        self.assertEqual(graph.add_cell(a3), removed_id)
+        self.assertEqual(len(graph), 2)
+
+    def test_many_dependents(self):
+        graph = sheets.DependencyGraph()
+        cells = make_cells(5000)
+        for c in cells[1:]:
+            graph.add_edge(cells[0], c)
+        self.assertEqual(len(graph.dependents_of(cells[0])), 4999)
+        graph.unlink_precedents(cells[2500], [])
+        self.assertEqual(len(graph.dependents_of(cells[0])), 4998)
+
+    def test_tarjan_cycle(self):
+        graph = sheets.DependencyGraph()
+        a1, a2, a3 = make_cells(3)
+        graph.add_edge(a1, a2)
+        graph.add_edge(a2, a3)
+        graph.add_edge(a3, a2)
+        components = sheets.tarjan(a1, graph)
+        self.assertEqual(len(components), 2)
+        self.assertEqual(set(components[0]), {a2, a3})
+        self.assertEqual(components[1], [a1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Unit tests for implementation of sheets.FormulaCache
+"""
+
+import unittest
+from copy import deepcopy
+from context import sheets
+from sheets.string_conversions import location_to_key
+
+
+class FormulaCacheTests(unittest.TestCase):
+    """
+    Unit tests for sheets.formula_cache.FormulaCache
+    """
+
+    def test_hits_and_misses(self):
+        cache = sheets.FormulaCache(10)
+        formula = cache.get("=1 + 2")
+        self.assertIs(cache.get("=1 + 2"), formula)
+        cache.get("=3")
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 2, 0))
+        self.assertEqual(len(cache), 2)
+
+    def test_parse_failure_cached(self):
+        cache = sheets.FormulaCache(10)
+        self.assertIsNone(cache.get("=1 +"))
+        self.assertIsNone(cache.get("=1 +"))
+        self.assertIn("=1 +", cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_evicted(self):
+        cache = sheets.FormulaCache(2)
+        cache.get("=1")
+        cache.get("=2")
+        cache.get("=1")
+        cache.get("=3")
+        self.assertIn("=1", cache)
+        self.assertNotIn("=2", cache)
+        self.assertIn("=3", cache)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_relative_forms_shared(self):
+        cache = sheets.FormulaCache(10)
+        c1, c2 = location_to_key("C1"), location_to_key("C2")
+        formula = cache.get("=A1 * B1 + $D$1", c1)
+        self.assertIs(cache.get("=A2 * B2 + $D$1", c2), formula)
+        self.assertIsNot(cache.get("=A1 * B1 + $D$1", c2), formula)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_unbounded_and_disabled(self):
+        unbounded = sheets.FormulaCache(None)
+        disabled = sheets.FormulaCache(0)
+        for i in range(100):
+            unbounded.get(f"={i}")
+            disabled.get(f"={i}")
+        self.assertEqual(len(unbounded), 100)
+        self.assertEqual(len(disabled), 0)
+        self.assertEqual(disabled.evictions, 0)
+        with self.assertRaises(ValueError):
+            sheets.FormulaCache(-1)
+
+    def test_clear_workbook_cache(self):
+        wb1 = sheets.Workbook(formula_cache_size=5)
+        wb2 = sheets.Workbook()
+        wb1.new_sheet()
+        wb2.new_sheet()
+        for i in range(10):
+            wb1.set_cell_contents("sheet1", f"A{i + 1}", f"={i} * 2")
+            wb2.set_cell_contents("sheet1", f"A{i + 1}", f"={i} * 2")
+        self.assertEqual(len(wb1.formula_cache), 5)
+        self.assertEqual(wb1.formula_cache.evictions, 5)
+        self.assertEqual(len(wb2.formula_cache), 10)
+        wb1.formula_cache.clear()
+        self.assertEqual(len(wb1.formula_cache), 0)
+        self.assertEqual(len(wb2.formula_cache), 10)
+        # cells are still evaluated correctly after the cache is cleared
+        wb1.set_cell_contents("sheet1", "B1", "=A10 + 1")
+        self.assertEqual(wb1.get_cell_value("sheet1", "B1"), 19)
+
+    def test_copy_starts_empty(self):
+        wb = sheets.Workbook(formula_cache_size=5)
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "=1")
+        wb_copy = deepcopy(wb)
+        self.assertEqual(len(wb_copy.formula_cache), 0)
+        self.assertEqual(wb_copy.formula_cache.maxsize, 5)
+        wb_copy.set_cell_contents("sheet1", "A2", "=A1 + 1")
+        self.assertEqual(wb_copy.get_cell_value("sheet1", "A2"), 2)
+
+    def test_unparsable_indirect(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "=INDIRECT(\"a b!A2\")")
+        self.assertEqual(wb.get_cell_value("sheet1", "A1").get_type(),
+                         sheets.CellErrorType.BAD_REFERENCE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Unit tests for relative forms of formulas and formulas that share them
+"""
+
+import unittest
+from context import sheets
+from sheets.formula_template import relative_form, render, resolve, to_reference
+from sheets.lark_module import compile_formula
+from sheets.string_conversions import location_to_key
+
+
+class RelativeFormTests(unittest.TestCase):
+    """
+    Unit tests for sheets.formula_template
+    """
+
+    def test_to_reference(self):
+        anchor = location_to_key("C5")
+        self.assertEqual(to_reference("A1", anchor), (-2, -4, False, False))
+        self.assertEqual(to_reference("b$2", anchor), (-1, 2, False, True))
+        self.assertEqual(to_reference("$C3", anchor), (3, -2, True, False))
+        self.assertEqual(to_reference("$D$7", anchor), (4, 7, True, True))
+
+    def test_resolve(self):
+        anchor = location_to_key("C5")
+        for location in ["A1", "B$2", "$C3", "$D$7", "ZZZZ9999"]:
+            self.assertEqual(resolve(to_reference(location, anchor), anchor),
+                             location_to_key(location.replace("$", "")))
+        self.assertEqual(resolve(to_reference("A1", anchor), location_to_key("D6")),
+                         location_to_key("B2"))
+        self.assertEqual(resolve(to_reference("$A1", anchor), location_to_key("D6")),
+                         location_to_key("A2"))
+        self.assertIsNone(resolve(to_reference("A1", anchor), location_to_key("C4")))
+        self.assertIsNone(resolve(to_reference("A9999", anchor), location_to_key("C6")))
+        self.assertIsNone(resolve(to_reference("ZZZZ1", anchor), location_to_key("D5")))
+
+    def test_filled_formulas_share_form(self):
+        self.assertEqual(relative_form("=A1*B1", location_to_key("C1")),
+                         relative_form("=A2*B2", location_to_key("C2")))
+        self.assertEqual(relative_form("=SUM(A1:A9) + $D$1", location_to_key("B1")),
+                         relative_form("=SUM(C3:C11) + $D$1", location_to_key("D3")))
+        self.assertNotEqual(relative_form("=A1*B1", location_to_key("C1")),
+                            relative_form("=A1*B1", location_to_key("C2")))
+        self.assertEqual(relative_form("=$A1", location_to_key("C1")),
+                         relative_form("=$A1", location_to_key("D1")))
+        self.assertNotEqual(relative_form("=$A1", location_to_key("C1")),
+                            relative_form("=$A1", location_to_key("C2")))
+        self.assertNotEqual(relative_form("=A1+B1", location_to_key("C1")),
+                            relative_form("=A1*B1", location_to_key("C1")))
+
+    def test_render(self):
+        form = relative_form("=a1 + $B2 * Sheet2!C$3 - $D$4", location_to_key("C3"))
+        self.assertEqual(render(form, location_to_key("C3")),
+                         ("=A1 + $B2 * Sheet2!C$3 - $D$4", True))
+        self.assertEqual(render(form, location_to_key("E4")),
+                         ("=C2 + $B3 * Sheet2!E$3 - $D$4", True))
+        self.assertEqual(render(form, location_to_key("B3")),
+                         ("=#REF! + $B2 * Sheet2!B$3 - $D$4", False))
+
+    def test_only_cell_references_are_relative(self):
+        segments, references = relative_form(
+            '="A1" & Sheet2!B2 & \'Other 1\'!C3 & LOG10(2) & sheet_3!D4 & #REF!')
+        self.assertEqual(segments, ('="A1" & Sheet2!', " & 'Other 1'!", ' & LOG10(2) & sheet_3!',
+                                    ' & #REF!'))
+        self.assertEqual(references, ((1, 1, False, False), (2, 2, False, False),
+                                      (3, 3, False, False)))
+        self.assertEqual(relative_form("=TRUE + 1"), (("=TRUE + 1",), ()))
+
+    def test_compiled_form_matches_tokens(self):
+        anchor = location_to_key("B2")
+        for contents in ['=A1 + A10 + $A1', '=SUM(A1:$B$9, Sheet2!C3:D4) * LOG10(2)',
+                         '="A1" & \'Other 1\'!C3 & sheet_3!d4 & #REF!', "=TRUE + 1"]:
+            self.assertEqual(compile_formula(contents, anchor).form,
+                             relative_form(contents, anchor))
+
+
+class SharedFormulaTests(unittest.TestCase):
+    """
+    Unit tests for formulas filled down a column, which share a compiled formula
+    """
+
+    def test_fill_compiles_once(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cells_contents("Sheet1", {f"{c}{i}": str(i) for c in "AB" for i in range(1, 101)})
+        wb.set_cells_contents("Sheet1", {f"C{i}": f"=A{i} * B{i}" for i in range(1, 101)})
+        self.assertEqual(len(wb.formula_cache), 1)
+        self.assertEqual(wb.formula_cache.misses, 1)
+        for i in range(1, 101):
+            self.assertEqual(wb.get_cell_value("Sheet1", f"C{i}"), i * i)
+        wb.set_cell_contents("Sheet1", "A7", "1")
+        self.assertEqual(wb.get_cell_value("Sheet1", "C7"), 7)
+        self.assertEqual(wb.get_cell_value("Sheet1", "C8"), 64)
+
+    def test_references_resolve_per_cell(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cells_contents("Sheet1", {"A1": "1", "A2": "2", "A3": "3", "B1": "10"})
+        wb.set_cells_contents("Sheet1", {"C1": "=A1 + $B$1", "C2": "=A2 + $B$1",
+                                         "C3": "=A3 + $B$1", "D1": "=A1 + $B$1",
+                                         "D2": "=SUM(A1:A2)", "D3": "=SUM(A2:A3)"})
+        self.assertEqual([wb.get_cell_value("Sheet1", f"C{i}") for i in range(1, 4)],
+                         [11, 12, 13])
+        self.assertEqual(wb.get_cell_value("Sheet1", "D1"), 11)
+        self.assertEqual(wb.get_cell_value("Sheet1", "D2"), 3)
+        self.assertEqual(wb.get_cell_value("Sheet1", "D3"), 5)
+        # the same text in another cell refers to other cells
+        wb.set_cell_contents("Sheet1", "E2", "=A2 + $B$1")
+        self.assertEqual(wb.get_cell_value("Sheet1", "E2"), 12)
+        wb.set_cell_contents("Sheet1", "E2", '=INDIRECT("A3")')
+        self.assertEqual(wb.get_cell_value("Sheet1", "E2"), 3)
+
+    def test_filled_chain(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        notifications = []
+        wb.notify_cells_changed(lambda _, cells: notifications.append(sorted(cells)))
+        wb.set_cell_contents("Sheet1", "A1", "1")
+        wb.set_cells_contents("Sheet1", {f"A{i}": f"=A{i - 1} + 1" for i in range(2, 51)})
+        self.assertEqual(wb.get_cell_value("Sheet1", "A50"), 50)
+        notifications.clear()
+        wb.set_cell_contents("Sheet1", "A1", "11")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A50"), 60)
+        self.assertEqual(notifications,
+                         [sorted(("Sheet1", f"A{i}") for i in range(1, 51))])
+
+    def test_fill_into_cycle(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cells_contents("Sheet1", {"A1": "1", "C3": "=C5 + $A$1", "C4": "=C6 + $A$1",
+                                         "C5": "=C7 + $A$1", "C6": "=C8 + $A$1"})
+        wb.set_cells_contents("Sheet1", {f"C{i}": f"=C{i - 1} + 1" for i in range(4, 9)})
+        for i in range(3, 9):
+            value = wb.get_cell_value("Sheet1", f"C{i}")
+            self.assertIsInstance(value, sheets.CellError)
+            self.assertEqual(value.get_type(), sheets.CellErrorType.CIRCULAR_REFERENCE)
+        wb.set_cell_contents("Sheet1", "C3", "=$A$1")
+        self.assertEqual([wb.get_cell_value("Sheet1", f"C{i}") for i in range(3, 9)],
+                         [1, 2, 3, 4, 5, 6])
+
+    def test_fill_off_sheet(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cells_contents("Sheet1", {"B1": "=A10000", "B2": "=A10001",
+                                         "B3": "=SUM(A3:A10002)"})
+        self.assertEqual(len(wb.formula_cache), 2)
+        for location in ["B1", "B2", "B3"]:
+            self.assertEqual(wb.get_cell_value("Sheet1", location).get_type(),
+                             sheets.CellErrorType.BAD_REFERENCE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -228,6 +228,32 @@ class FunctionTests(unittest.TestCase):
         self.assertEqual(wb.get_cell_value(
             'sheet1', 'a1'), decimal.Decimal(0))
 
+    def test_dynamic_dependencies(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        notified = []
+        wb.set_cell_contents("sheet1", "A1", "TRUE")
+        wb.set_cell_contents("sheet1", "A2", "C1")
+        wb.set_cell_contents("sheet1", "B1", "=IF(A1, C1, D1) + INDIRECT(A2)")
+        wb.notify_cells_changed(lambda _, cells: notified.append(list(cells)))
+        wb.set_cell_contents("sheet1", "D1", "1")
+        self.assertEqual(notified, [[("Sheet1", "D1")]])
+        wb.set_cell_contents("sheet1", "A1", "FALSE")
+        wb.set_cell_contents("sheet1", "C1", "2")
+        wb.set_cell_contents("sheet1", "A2", "D1")
+        wb.set_cell_contents("sheet1", "C1", "3")
+        self.assertEqual(wb.get_cell_value("sheet1", "B1"), 2)
+        self.assertEqual(notified[1:], [[("Sheet1", "A1"), ("Sheet1", "B1")],
+                                        [("Sheet1", "C1"), ("Sheet1", "B1")],
+                                        [("Sheet1", "A2"), ("Sheet1", "B1")],
+                                        [("Sheet1", "C1")]])
+        # reading by value into a cycle and back out of it
+        wb.set_cell_contents("sheet1", "A2", "B1")
+        self.assertEqual(wb.get_cell_value("sheet1", "B1").get_type(),
+                         sheets.cell_error.CellErrorType.CIRCULAR_REFERENCE)
+        wb.set_cell_contents("sheet1", "A2", "C1")
+        self.assertEqual(wb.get_cell_value("sheet1", "B1"), 4)
+
     def test_update_circ_ref_error(self):
         wb = sheets.Workbook()
         wb.new_sheet()
@@ -421,6 +447,17 @@ class FunctionTests(unittest.TestCase):
         wb.set_cell_contents("sheet1", "B1", "=ISERROR(A1)")
         self.assertEqual(wb.get_cell_value("sheet1", "B1"), True)
 
+    def test_iserror_reader_before_self_reference(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "=ISERROR(B1)")
+        wb.set_cell_contents("sheet1", "B1", "=B1")
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1").get_type(
+        ), sheets.cell_error.CellErrorType.CIRCULAR_REFERENCE)
+        self.assertEqual(wb.get_cell_value("sheet1", "A1"), True)
+        wb.set_cell_contents("sheet1", "A1", "=ISERROR(B1)")
+        self.assertEqual(wb.get_cell_value("sheet1", "A1"), True)
+
     def test_iserror_non_participating_circref(self):
         wb = sheets.Workbook()
         wb.new_sheet()
@@ -0,0 +1,78 @@
+"""
+Unit tests for implementation of sheets.JsonReader
+"""
+
+import unittest
+import io
+import json
+from context import sheets
+from utils import store_stdout, restore_stdout
+
+
+def read_all(reader: sheets.JsonReader):
+    """
+    Read the next value by walking every object and array member by member.
+    """
+    ch = reader.peek()
+    if ch == "{":
+        return {key: read_all(reader) for key in reader.iter_object()}
+    if ch == "[":
+        return [read_all(reader) for _ in reader.iter_array()]
+    return reader.read_value()
+
+
+class JsonReaderTests(unittest.TestCase):
+    """
+    Unit tests for sheets.json_reader.JsonReader
+    """
+
+    def test_same_values_as_json(self):
+        doc = {"sheets": [{"name": "Sheet1", "cell-contents": {"A1": "=B1 + 1", "B1": "x\"y"}},
+                          {"name": "ሴ", "cell-contents": {}}],
+               "numbers": [0, -2.5, 1e+20, 123456789, True, None, [], {}]}
+        for indent in [None, 4]:
+            text = json.dumps(doc, indent=indent)
+            for chunk_size in [1, 2, 3, 7, 1 << 16]:
+                reader = sheets.JsonReader(io.StringIO(text), chunk_size)
+                self.assertEqual(read_all(reader), doc)
+                reader.end()
+
+    def test_number_split_between_chunks(self):
+        for chunk_size in range(1, 8):
+            reader = sheets.JsonReader(io.StringIO("[1e+20, -12.5]"), chunk_size)
+            self.assertEqual(read_all(reader), [1e+20, -12.5])
+
+    def test_decode_errors_match_json(self):
+        for text in ['{"sheets": [{,name": "S"}]}', '[\n 1,\n t"ue\n]', '{"a": 1} x', '',
+                     '{"a" 1}', '["abc', '[1, 2']:
+            with self.assertRaises(json.JSONDecodeError) as expected:
+                json.loads(text)
+            reader = sheets.JsonReader(io.StringIO(text), 2)
+            with self.assertRaises(json.JSONDecodeError) as actual:
+                read_all(reader)
+                reader.end()
+            self.assertEqual(str(actual.exception), str(expected.exception))
+
+    def test_load_decode_error_after_bad_sheet(self):
+        # the file isn't valid JSON, which is reported instead of the missing sheet name
+        text = '{"sheets": [{"cell-contents": {}}, {"name": "S1", "cell-contents": {]}'
+        new_stdo, sys_out = store_stdout()
+        wb = sheets.Workbook.load_workbook(io.StringIO(text))
+        output = restore_stdout(new_stdo, sys_out)
+        self.assertIn("Decode Error", output)
+        self.assertEqual(wb.num_sheets(), 0)
+
+    def test_load_repeated_sheets_key(self):
+        text = '{"sheets": [{"name": "S1", "cell-contents": {"A1": "1"}}], ' \
+            '"sheets": [{"name": "S2", "cell-contents": {"A1": "2", "A1": "=1 + 2"}}]}'
+        wb = sheets.Workbook.load_workbook(io.StringIO(text))
+        self.assertEqual(wb.list_sheets(), ["S2"])
+        self.assertEqual(wb.get_cell_value("S2", "A1"), 3)
+
+    def test_load_not_an_object(self):
+        with self.assertRaises(TypeError):
+            sheets.Workbook.load_workbook(io.StringIO('[{"sheets": []}]'))
+
+
+if __name__ == "__main__":
+    unittest.main()
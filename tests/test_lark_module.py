@@ -421,5 +421,34 @@ class LarkModuleTests(unittest.TestCase):
         self.assertTrue(value_b.get_type() ==
                         sheets.cell_error.CellErrorType.CIRCULAR_REFERENCE)
 
+    def test_compiled_formula_shared(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.new_sheet()
+        formula = wb.formula_cache.get("=A1 * 2")
+        self.assertIs(formula, wb.formula_cache.get("=A1 * 2"))
+        wb.set_cell_contents("sheet1", "A1", "3")
+        wb.set_cell_contents("sheet2", "A1", "4")
+        wb.set_cell_contents("sheet1", "B1", "=A1 * 2")
+        wb.set_cell_contents("sheet2", "B1", "=A1 * 2")
+        self.assertEqual(wb.get_cell_value("sheet1", "B1"), 6)
+        self.assertEqual(wb.get_cell_value("sheet2", "B1"), 8)
+        wb.set_cell_contents("sheet2", "A1", "5")
+        self.assertEqual(wb.get_cell_value("sheet1", "B1"), 6)
+        self.assertEqual(wb.get_cell_value("sheet2", "B1"), 10)
+
+    def test_compiled_error_literals(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        _, value = sheets.lark_module.evaluate_expr(
+            wb, None, "sheet1", "=IFERROR(\"#REF!\" & (\"#REF!\"), 1)")
+        self.assertEqual(value, 1)
+        _, value = sheets.lark_module.evaluate_expr(
+            wb, None, "sheet1", "=IFERROR(\"#REF!\", 1)")
+        self.assertEqual(value, "#REF!")
+        _, value = sheets.lark_module.evaluate_expr(
+            wb, None, "sheet1", "=\"#REF!\"")
+        self.assertEqual(value.get_type(), sheets.cell_error.CellErrorType.BAD_REFERENCE)
+
 if __name__ == "__main__":
     unittest.main()
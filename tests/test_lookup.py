@@ -0,0 +1,260 @@
+"""
+Unit tests for VLOOKUP, MATCH, XLOOKUP, COUNTIF and SUMIF and sheets.column_lookup
+"""
+
+import unittest
+import io
+import decimal
+from context import sheets
+
+EXACT = sheets.column_lookup.EXACT
+AT_MOST = sheets.column_lookup.AT_MOST
+AT_LEAST = sheets.column_lookup.AT_LEAST
+
+
+def make_workbook(columnar=False):
+    wb = sheets.Workbook()
+    wb.new_sheet("Sheet1", columnar=columnar)
+    wb.new_sheet("Table", columnar=columnar)
+    for i in range(1, 11):
+        wb.set_cell_contents("Table", f"A{i}", str(i * 10))
+        wb.set_cell_contents("Table", f"B{i}", f"Name{i}")
+    return wb
+
+
+class ColumnLookupTests(unittest.TestCase):
+    """
+    Unit tests for sheets.column_lookup.ColumnLookup
+    """
+
+    def test_find(self):
+        d = decimal.Decimal
+        lookup = sheets.column_lookup.ColumnLookup(
+            {1: d(5), 2: "b", 3: d(1), 4: "A", 5: d(5), 6: True, 7: None})
+        self.assertEqual(lookup.find(d(5), 1, 10, EXACT), 1)
+        self.assertEqual(lookup.find(d("5.0"), 2, 10, EXACT), 5)
+        self.assertEqual(lookup.find("a", 1, 10, EXACT), 4)
+        self.assertEqual(lookup.find("5", 1, 10, EXACT), None)
+        self.assertEqual(lookup.find(d(5), 2, 4, EXACT), None)
+        # the last row with the largest value that isn't greater
+        self.assertEqual(lookup.find(d(7), 1, 10, AT_MOST), 5)
+        self.assertEqual(lookup.find(d(7), 1, 4, AT_MOST), 1)
+        self.assertEqual(lookup.find(d(4), 1, 10, AT_MOST), 3)
+        self.assertEqual(lookup.find(d(0), 1, 10, AT_MOST), None)
+        # the first row with the smallest value that isn't less
+        self.assertEqual(lookup.find(d(2), 1, 10, AT_LEAST), 1)
+        self.assertEqual(lookup.find(d(2), 2, 10, AT_LEAST), 5)
+        self.assertEqual(lookup.find("aa", 1, 10, AT_LEAST), 2)
+        self.assertEqual(lookup.find(d(6), 1, 10, AT_LEAST), None)
+        self.assertEqual(lookup.find(False, 1, 10, AT_LEAST), 6)
+
+    def test_set(self):
+        d = decimal.Decimal
+        lookup = sheets.column_lookup.ColumnLookup({})
+        for row in range(1, 1001):
+            lookup.set(row, d(row))
+        lookup.set(500, "text")
+        lookup.set(1, None)
+        self.assertEqual(lookup.find(d(500), 1, 9999, EXACT), None)
+        self.assertEqual(lookup.find(d(500), 1, 9999, AT_MOST), 499)
+        self.assertEqual(lookup.find(d(1), 1, 9999, AT_LEAST), 2)
+        self.assertEqual(lookup.find("TEXT", 1, 9999, EXACT), 500)
+        # a range far from the nearest values is scanned instead
+        self.assertEqual(lookup.find(d(5000), 10, 12, AT_MOST), 12)
+        self.assertEqual(lookup.find(d(0), 10, 12, AT_LEAST), 10)
+        self.assertEqual(len(lookup.ordered), 999)
+
+    def test_criteria(self):
+        d = decimal.Decimal
+        lookup = sheets.column_lookup.ColumnLookup(
+            {row: d(row % 10) for row in range(1, 101)})
+        lookup.set(5, "a")
+        lookup.set(6, True)
+        lookup.set(7, None)
+        self.assertEqual(lookup.count(("=", (0, d(3))), 1, 100), 10)
+        self.assertEqual(lookup.count(("<", (0, d(3))), 1, 100), 30)
+        self.assertEqual(lookup.count(("<=", (0, d(3))), 1, 20), 8)
+        self.assertEqual(lookup.count((">", (0, d(3))), 1, 100), 57)
+        self.assertEqual(lookup.count((">=", (1, "a")), 1, 100), 1)
+        self.assertEqual(lookup.count(("<>", (0, d(3))), 1, 100), 89)
+        self.assertEqual(lookup.count((">", (2, False)), 1, 100), 1)
+        self.assertEqual(sorted(lookup.matching_rows((">=", (0, d(8))), 1, 30)),
+                         [8, 9, 18, 19, 28, 29])
+        self.assertEqual(sorted(lookup.matching_rows(("<>", (0, d(0))), 1, 10)),
+                         [1, 2, 3, 4, 5, 6, 8, 9])
+
+
+class LookupFunctionTests(unittest.TestCase):
+    """
+    Unit tests for formulas with VLOOKUP, MATCH and XLOOKUP
+    """
+
+    def check(self, wb, formula, expected):
+        wb.set_cell_contents("Sheet1", "A1", formula)
+        value = wb.get_cell_value("Sheet1", "A1")
+        if isinstance(expected, sheets.CellErrorType):
+            self.assertIsInstance(value, sheets.CellError, formula)
+            self.assertEqual(value.get_type(), expected, formula)
+        else:
+            self.assertEqual(value, expected, formula)
+
+    def test_vlookup(self):
+        wb = make_workbook()
+        self.check(wb, "=VLOOKUP(30, Table!A1:B10, 2)", "Name3")
+        self.check(wb, "=VLOOKUP(35, Table!A1:B10, 2)", "Name3")
+        self.check(wb, "=VLOOKUP(35, Table!A1:B10, 2, FALSE)", sheets.CellErrorType.TYPE_ERROR)
+        self.check(wb, "=VLOOKUP(\"name4\", Table!B1:B10, 1, FALSE)", "Name4")
+        self.check(wb, "=VLOOKUP(5, Table!A1:B10, 2)", sheets.CellErrorType.TYPE_ERROR)
+        self.check(wb, "=VLOOKUP(30, Table!A1:B10, 3)", sheets.CellErrorType.TYPE_ERROR)
+        self.check(wb, "=VLOOKUP(30, Table!A1:C10, 3)", 0)
+        self.check(wb, "=VLOOKUP(30, Table!A1, 1)", sheets.CellErrorType.TYPE_ERROR)
+        self.check(wb, "=VLOOKUP(1/0, Table!A1:B10, 2)", sheets.CellErrorType.DIVIDE_BY_ZERO)
+        self.check(wb, "=VLOOKUP(30, Missing!A1:B10, 2)", sheets.CellErrorType.BAD_REFERENCE)
+
+    def test_match(self):
+        wb = make_workbook()
+        self.check(wb, "=MATCH(55, Table!A1:A10)", 5)
+        self.check(wb, "=MATCH(55, Table!A1:A10, -1)", 6)
+        self.check(wb, "=MATCH(50, Table!A1:A10, 0)", 5)
+        self.check(wb, "=MATCH(\"Name2\", Table!A2:B2, 0)", 2)
+        self.check(wb, "=MATCH(20, Table!A1:B2)", sheets.CellErrorType.TYPE_ERROR)
+        self.check(wb, "=MATCH(\"30\", Table!A1:A10, 0)", sheets.CellErrorType.TYPE_ERROR)
+
+    def test_xlookup(self):
+        wb = make_workbook()
+        self.check(wb, "=XLOOKUP(\"NAME4\", Table!B1:B10, Table!A1:A10)", 40)
+        self.check(wb, "=XLOOKUP(99, Table!A1:A10, Table!B1:B10, \"none\")", "none")
+        self.check(wb, "=XLOOKUP(99, Table!A1:A10, Table!B1:B10, \"none\", -1)", "Name9")
+        self.check(wb, "=XLOOKUP(99, Table!A1:A10, Table!B1:B10, \"none\", 1)", "Name10")
+        self.check(wb, "=XLOOKUP(99, Table!A1:A10, Table!B1:B10)",
+                   sheets.CellErrorType.TYPE_ERROR)
+        self.check(wb, "=XLOOKUP(10, Table!A1:A10, Table!B1:B9)",
+                   sheets.CellErrorType.TYPE_ERROR)
+        self.check(wb, "=XLOOKUP(10, Table!A1:A10, Table!B1:B10, 0, 2)",
+                   sheets.CellErrorType.TYPE_ERROR)
+
+    def test_edits(self):
+        notified = []
+        wb = make_workbook()
+        wb.set_cell_contents("Sheet1", "A1", "=VLOOKUP(40, Table!A1:B10, 2, FALSE)")
+        wb.set_cell_contents("Sheet1", "A2", "=MATCH(40, Table!A1:A10)")
+        wb.notify_cells_changed(lambda _, cells: notified.append(list(cells)))
+        wb.set_cell_contents("Table", "B4", "Changed")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), "Changed")
+        wb.set_cell_contents("Table", "A4", "41")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1").get_type(),
+                         sheets.CellErrorType.TYPE_ERROR)
+        self.assertEqual(wb.get_cell_value("Sheet1", "A2"), 3)
+        wb.set_cell_contents("Table", "A10", "40")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), "Name10")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A2"), 10)
+        # only the cell that a lookup returns is linked in the other columns
+        wb.set_cell_contents("Table", "B3", "Other")
+        self.assertEqual(notified, [[("Table", "B4"), ("Sheet1", "A1")],
+                                    [("Table", "A4"), ("Sheet1", "A1"), ("Sheet1", "A2")],
+                                    [("Table", "A10"), ("Sheet1", "A1"), ("Sheet1", "A2")],
+                                    [("Table", "B3")]])
+
+    def test_cycles(self):
+        wb = make_workbook()
+        wb.set_cell_contents("Table", "B5", "=VLOOKUP(20, Table!A1:B10, 2)")
+        self.assertEqual(wb.get_cell_value("Table", "B5"), "Name2")
+        wb.set_cell_contents("Table", "B5", "=VLOOKUP(50, Table!A1:B10, 2)")
+        self.assertEqual(wb.get_cell_value("Table", "B5").get_type(),
+                         sheets.CellErrorType.CIRCULAR_REFERENCE)
+        wb.set_cell_contents("Table", "A5", "=XLOOKUP(\"Name1\", B1:B5, A1:A5)")
+        self.assertEqual(wb.get_cell_value("Table", "A5").get_type(),
+                         sheets.CellErrorType.CIRCULAR_REFERENCE)
+
+    def test_columnar_and_batch(self):
+        wb = make_workbook(columnar=True)
+        wb.set_cell_contents("Sheet1", "A1", "=VLOOKUP(70, Table!A1:B10, 2, FALSE)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), "Name7")
+        with wb.batch():
+            wb.set_cell_contents("Table", "A7", None)
+            wb.set_cell_contents("Table", "A8", "70")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), "Name8")
+
+    def test_sheets_and_load(self):
+        wb = make_workbook()
+        wb.set_cell_contents("Sheet1", "A1", "=MATCH(1/0, Table!A1:A10)")
+        wb.set_cell_contents("Sheet1", "A2", "=XLOOKUP(20, Table!A1:A10, Table!B1:B10)")
+        f = io.StringIO()
+        wb.save_workbook(f)
+        f.seek(0)
+        loaded = sheets.Workbook.load_workbook(f)
+        self.assertEqual(loaded.get_cell_value("Sheet1", "A2"), "Name2")
+        loaded.set_cell_contents("Table", "A2", "25")
+        self.assertEqual(loaded.get_cell_value("Sheet1", "A2").get_type(),
+                         sheets.CellErrorType.TYPE_ERROR)
+        # the first lookup never read the table, but can't be given it after it's deleted
+        wb.del_sheet("Table")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1").get_type(),
+                         sheets.CellErrorType.BAD_REFERENCE)
+        self.assertEqual(wb.get_cell_value("Sheet1", "A2").get_type(),
+                         sheets.CellErrorType.BAD_REFERENCE)
+
+
+class ConditionalFunctionTests(unittest.TestCase):
+    """
+    Unit tests for formulas with COUNTIF and SUMIF
+    """
+
+    check = LookupFunctionTests.check
+
+    def test_countif(self):
+        wb = make_workbook()
+        wb.set_cell_contents("Table", "A11", "text")
+        wb.set_cell_contents("Table", "A12", "TRUE")
+        self.check(wb, "=COUNTIF(Table!A1:A20, \">50\")", 5)
+        self.check(wb, "=COUNTIF(Table!A1:A20, \"<=50\")", 5)
+        self.check(wb, "=COUNTIF(Table!A1:A20, 30)", 1)
+        self.check(wb, "=COUNTIF(Table!A1:A20, \"30\")", 1)
+        self.check(wb, "=COUNTIF(Table!A1:A20, \"<>30\")", 11)
+        self.check(wb, "=COUNTIF(Table!A1:A20, \"TEXT\")", 1)
+        self.check(wb, "=COUNTIF(Table!A1:A20, TRUE)", 1)
+        self.check(wb, "=COUNTIF(Table!A1:B20, \">=name5\")", 6)
+        self.check(wb, "=COUNTIF(Table!A1:A20, Table!C1)", 0)
+        self.check(wb, "=COUNTIF(Table!A1:A20, 1/0)", sheets.CellErrorType.DIVIDE_BY_ZERO)
+        self.check(wb, "=COUNTIF(Missing!A1:A20, 1)", sheets.CellErrorType.BAD_REFERENCE)
+        self.check(wb, "=COUNTIF(5, 5)", sheets.CellErrorType.TYPE_ERROR)
+
+    def test_sumif(self):
+        wb = make_workbook()
+        for i in range(1, 11):
+            wb.set_cell_contents("Table", f"C{i}", str(i))
+        self.check(wb, "=SUMIF(Table!A1:A10, \">80\")", 190)
+        self.check(wb, "=SUMIF(Table!A1:A10, \"<30\", Table!C1:C10)", 3)
+        self.check(wb, "=SUMIF(Table!B1:B10, \"name1\", Table!A1:A10)", 10)
+        self.check(wb, "=SUMIF(Table!A1:A10, \">0\", Table!B1:B10)", 0)
+        self.check(wb, "=SUMIF(Table!A1:A10, \">0\", Table!C1:C9)",
+                   sheets.CellErrorType.TYPE_ERROR)
+        wb.set_cell_contents("Table", "C2", "=1/0")
+        self.check(wb, "=SUMIF(Table!A1:A10, \"<30\", Table!C1:C10)",
+                   sheets.CellErrorType.DIVIDE_BY_ZERO)
+        self.check(wb, "=SUMIF(Table!A1:A10, \">20\", Table!C1:C10)", 52)
+
+    def test_edits(self):
+        notified = []
+        wb = make_workbook(columnar=True)
+        wb.set_cell_contents("Sheet1", "B1", "50")
+        wb.set_cell_contents("Sheet1", "A1", "=COUNTIF(Table!A1:A10, Sheet1!B1)")
+        wb.set_cell_contents("Sheet1", "A2", "=SUMIF(Table!A1:A10, \">=\" & B1, Table!A1:A10)")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), 1)
+        self.assertEqual(wb.get_cell_value("Sheet1", "A2"), 450)
+        wb.notify_cells_changed(lambda _, cells: notified.append(list(cells)))
+        wb.set_cell_contents("Table", "A1", "50")
+        wb.set_cell_contents("Sheet1", "B1", "100")
+        wb.set_cell_contents("Table", "B1", "other")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), 1)
+        self.assertEqual(wb.get_cell_value("Sheet1", "A2"), 100)
+        self.assertEqual(notified, [[("Table", "A1"), ("Sheet1", "A1"), ("Sheet1", "A2")],
+                                    [("Sheet1", "B1"), ("Sheet1", "A2"), ("Sheet1", "A1")],
+                                    [("Table", "B1")]])
+        wb.set_cell_contents("Table", "A3", "=COUNTIF(A1:A10, 50)")
+        self.assertEqual(wb.get_cell_value("Table", "A3").get_type(),
+                         sheets.CellErrorType.CIRCULAR_REFERENCE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1024,6 +1024,17 @@ class WorkbookMoveCopyCells(unittest.TestCase):
         output = sort_notify_list(restore_stdout(new_stdo, sys_out))
         self.assertEqual([], output)
 
+    def test_move_to_invalid_unchanged(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "2.2")
+        wb.set_cell_contents("sheet1", "A2", "4.5")
+        with self.assertRaises(ValueError):
+            wb.move_cells("sheet1", "A1", "A2", "ZZZZ9999")
+        self.assertEqual(wb.get_cell_contents("sheet1", "A1"), "2.2")
+        self.assertEqual(wb.get_cell_contents("sheet1", "ZZZZ9999"), None)
+        self.assertEqual(wb.get_sheet_extent("sheet1"), (1, 2))
+
     def test_copy_to_invalid(self):
         new_stdo, sys_out = store_stdout()
         wb = sheets.Workbook()
@@ -1245,5 +1256,82 @@ class WorkbookMoveCopyCells(unittest.TestCase):
         self.assertEqual(wb.get_cell_contents('sheet1', "A2"), None)
 
 
+    def test_copy_shares_compiled_formula(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cells_contents("sheet1", {f"A{i}": str(i) for i in range(1, 11)})
+        wb.set_cells_contents("sheet1", {f"B{i}": f"=A{i} * $A$1" for i in range(1, 11)})
+        misses = wb.formula_cache.misses
+        wb.copy_cells("sheet1", "B1", "B10", "C1")
+        self.assertEqual(wb.get_cell_value("sheet1", "C10"), 10)
+        wb.move_cells("sheet1", "C1", "C10", "D2")
+        wb.copy_sheet("sheet1")
+        self.assertEqual(wb.formula_cache.misses, misses)
+        self.assertEqual(len(wb.formula_cache), 1)
+        self.assertEqual(wb.get_cell_contents("sheet1", "D2"), "=C2 * $A$1")
+        self.assertEqual(wb.get_cell_value("sheet1", "D11"), 0)
+        self.assertEqual(wb.get_cell_value("sheet1_1", "B10"), 10)
+
+    def test_copy_only_rewrites_references(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", '=LOG10(A10) + A1 + "is A1 b1" + $a1')
+        wb.copy_cells("sheet1", "A1", "A1", "B2")
+        self.assertEqual(wb.get_cell_contents("sheet1", "B2"),
+                         '=LOG10(B11) + B2 + "is A1 b1" + $A2')
+
+    def test_copy_reference_prefixes(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "C1", "=A1 + A10 + $A1 + A1")
+        wb.copy_cells("sheet1", "C1", "C1", "D2")
+        self.assertEqual(wb.get_cell_contents("sheet1", "D2"), "=B2 + B11 + $A2 + B2")
+        wb.move_cells("sheet1", "D2", "D2", "C1")
+        self.assertEqual(wb.get_cell_contents("sheet1", "C1"), "=A1 + A10 + $A1 + A1")
+        wb.move_cells("sheet1", "C1", "C1", "B1")
+        self.assertEqual(wb.get_cell_contents("sheet1", "B1"),
+                         "=#REF! + #REF! + $A1 + #REF!")
+
+    def test_move_chain_overlapping(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "1")
+        wb.set_cells_contents("sheet1", {f"A{i}": f"=A{i - 1} + 1" for i in range(2, 101)})
+        wb.set_cell_contents("sheet1", "B1", "=A100")
+        wb.move_cells("sheet1", "A1", "A100", "A51")
+        self.assertEqual(wb.get_cell_contents("sheet1", "A52"), "=A51 + 1")
+        self.assertEqual(wb.get_cell_contents("sheet1", "A50"), None)
+        self.assertEqual(wb.get_cell_value("sheet1", "A150"), 100)
+        self.assertEqual(wb.get_cell_value("sheet1", "B1"), 50)
+        wb.copy_cells("sheet1", "A51", "A150", "B2")
+        self.assertEqual(wb.get_cell_value("sheet1", "B101"), 100)
+        self.assertEqual(wb.get_cell_value("sheet1", "B1"), 50)
+
+    def test_move_in_batch(self):
+        new_stdo, sys_out = store_stdout()
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "1")
+        wb.set_cell_contents("sheet1", "A2", "=A1 * 2")
+        wb.notify_cells_changed(on_cells_changed)
+        with wb.batch():
+            wb.set_cell_contents("sheet1", "A1", "5")
+            wb.move_cells("sheet1", "A1", "A2", "B1")
+            self.assertEqual(wb.get_cell_contents("sheet1", "B2"), "=B1 * 2")
+        self.assertEqual(wb.get_cell_value("sheet1", "B2"), 10)
+        output = sort_notify_list(restore_stdout(new_stdo, sys_out))
+        expected = ["'Sheet1', 'A1'", "'Sheet1', 'A2'",
+                    "'Sheet1', 'B1'", "'Sheet1', 'B2'"]
+        self.assertEqual(expected, output)
+
+    def test_parse_error_move_clears_source(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "=1 +")
+        wb.move_cells("sheet1", "A1", "A1", "B1")
+        self.assertEqual(wb.get_cell_contents("sheet1", "A1"), None)
+        self.assertEqual(wb.get_cell_contents("sheet1", "B1"), "=1 +")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,88 @@
+"""
+Performance Analysis For The Formula Parser
+"""
+
+import ast
+import os
+import time
+import unittest
+import lark
+from context import sheets
+
+
+def lark_module_formulas() -> list:
+    """
+    Collect every formula used in tests/test_lark_module.py.
+    """
+    path = os.path.join(os.path.dirname(__file__), "test_lark_module.py")
+    with open(path, encoding="utf8") as fp:
+        tree = ast.parse(fp.read())
+    return [node.value for node in ast.walk(tree)
+            if isinstance(node, ast.Constant) and isinstance(node.value, str)
+            and node.value.startswith("=")]
+
+
+def parse_all(parser: lark.Lark, formulas: list) -> list:
+    """
+    Parse each formula, recording None for formulas that fail to parse.
+    """
+    trees = []
+    for formula in formulas:
+        try:
+            trees.append(parser.parse(formula))
+        except lark.exceptions.UnexpectedInput:
+            trees.append(None)
+    return trees
+
+
+def parse_throughput(parser: lark.Lark, formulas: list, rounds: int) -> float:
+    """
+    Parse the formulas rounds times and return the number of formulas parsed per second.
+    """
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse_all(parser, formulas)
+    return rounds * len(formulas) / (time.perf_counter() - start)
+
+
+def load_time(**options) -> float:
+    """
+    Return the number of seconds taken to build the formula parser.
+    """
+    start = time.perf_counter()
+    lark.Lark.open_from_package('sheets', 'formulas.lark', start='formula', **options)
+    return time.perf_counter() - start
+
+
+class Parser_Benchmark(unittest.TestCase):
+    """
+    Compare the LALR formula parser against lark's default Earley parser.
+    """
+
+    def test_same_trees(self):
+        formulas = lark_module_formulas()
+        earley = lark.Lark.open_from_package('sheets', 'formulas.lark', start='formula')
+        lalr = sheets.lark_module.open_grammar()
+        self.assertEqual(parse_all(earley, formulas), parse_all(lalr, formulas))
+
+    def test_parse_throughput(self):
+        formulas = lark_module_formulas()
+        earley = lark.Lark.open_from_package('sheets', 'formulas.lark', start='formula')
+        lalr = sheets.lark_module.open_grammar()
+        earley_rate = parse_throughput(earley, formulas, 10)
+        lalr_rate = parse_throughput(lalr, formulas, 10)
+        print(f"\n{len(formulas)} formulas: earley {earley_rate:.0f}/s, "
+              f"lalr {lalr_rate:.0f}/s ({lalr_rate / earley_rate:.1f}x)")
+        self.assertGreater(lalr_rate, earley_rate)
+
+    def test_cold_start(self):
+        # make sure the cache file exists before timing a cached load
+        load_time(parser='lalr', cache=True)
+        uncached = load_time(parser='lalr')
+        cached = load_time(parser='lalr', cache=True)
+        print(f"\nparser load: uncached {uncached * 1000:.1f}ms, cached {cached * 1000:.1f}ms")
+        self.assertLess(cached, uncached)
+
+
+if __name__ == "__main__":
+    unittest.main()
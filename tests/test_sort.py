@@ -315,6 +315,60 @@ class WorkbookSortCells(unittest.TestCase):
         expected = ["'Sheet1', 'A1'", "'Sheet1', 'A2'", "'Sheet1', 'A5'", "'Sheet1', 'A6'"]
         self.assertEqual(expected, output)
 
+    def test_sort_descending_is_stable(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "1")
+        wb.set_cell_contents("sheet1", "B1", "a")
+        wb.set_cell_contents("sheet1", "A2", "2")
+        wb.set_cell_contents("sheet1", "B2", "b")
+        wb.set_cell_contents("sheet1", "A3", "1")
+        wb.set_cell_contents("sheet1", "B3", "c")
+        wb.set_cell_contents("sheet1", "B4", "d")
+        wb.set_cell_contents("sheet1", "A5", "2")
+        wb.set_cell_contents("sheet1", "B5", "e")
+        wb.set_cell_contents("sheet1", "C5", "=A5 * 10")
+        wb.sort_region('Sheet1', 'A1', 'C5', [-1])
+        block_equal(wb, self, [2, "b", None,
+                               2, "e", 20,
+                               1, "a", None,
+                               1, "c", None,
+                               None, "d", None])
+        self.assertEqual(wb.get_cell_contents("sheet1", "C2"), "=A2 * 10")
+
+    def test_sort_updates_readers_outside_block(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "3")
+        wb.set_cell_contents("sheet1", "A2", "1")
+        wb.set_cell_contents("sheet1", "A3", "2")
+        wb.set_cell_contents("sheet1", "D1", "=A1")
+        wb.set_cell_contents("sheet1", "D2", "=SUM(A1:A2)")
+        wb.set_cell_contents("sheet1", "D3", "=A3 + 1")
+        new_stdo, sys_out = store_stdout()
+        wb.notify_cells_changed(on_cells_changed)
+        wb.sort_region('Sheet1', 'A1', 'A3', [1])
+        output = sort_notify_list(restore_stdout(new_stdo, sys_out))
+        self.assertEqual(wb.get_cell_value("sheet1", "D1"), decimal.Decimal(1))
+        self.assertEqual(wb.get_cell_value("sheet1", "D2"), decimal.Decimal(3))
+        self.assertEqual(wb.get_cell_value("sheet1", "D3"), decimal.Decimal(4))
+        expected = ["'Sheet1', 'A1'", "'Sheet1', 'A2'", "'Sheet1', 'A3'",
+                    "'Sheet1', 'D1'", "'Sheet1', 'D2'", "'Sheet1', 'D3'"]
+        self.assertEqual(expected, output)
+
+
+    def test_sort_col_outside_region(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "3")
+        wb.set_cell_contents("sheet1", "A2", "1")
+        wb.set_cell_contents("sheet1", "B1", "1")
+        wb.set_cell_contents("sheet1", "B2", "2")
+        for sort_cols in [[0], [2], [-2], [1, 3]]:
+            with self.assertRaises(ValueError):
+                wb.sort_region('Sheet1', 'A1', 'A2', sort_cols)
+        self.assertEqual(wb.get_cell_value("sheet1", "A1"), decimal.Decimal(3))
+        self.assertEqual(wb.get_cell_value("sheet1", "A2"), decimal.Decimal(1))
 
 if __name__ == "__main__":
     unittest.main()
@@ -234,6 +234,27 @@ def dangling_chain(self, width, height):
         p.sort_stats(pstats.SortKey.CUMULATIVE).print_stats()
 
 
+def fill_down(self, rows):
+    """
+    Fills a column with rows copies of the same relative formula, then updates
+    the cell that every copy references absolutely.
+    """
+    pc = cProfile.Profile()
+    wb = sheets.Workbook()
+    wb.new_sheet("sheet1")
+    wb.set_cells_contents("sheet1", {f"{c}{i}": str(i) for c in "AB" for i in range(1, rows + 1)})
+    wb.set_cell_contents("sheet1", "D1", "1")
+    pc.enable()
+    wb.set_cells_contents("sheet1", {f"C{i}": f"=A{i} * B{i} + $D$1" for i in range(1, rows + 1)})
+    wb.set_cell_contents("sheet1", "D1", "2")
+    pc.disable()
+    self.assertEqual(wb.get_cell_value("sheet1", f"C{rows}"), rows * rows + 2)
+    self.assertEqual(len(wb.formula_cache), 1)
+    pc.dump_stats(f'logs/test_fill_down_{rows}.stats')
+    with open(f'logs/test_fill_down_stats_{rows}.stats', 'w', encoding="utf8") as stream:
+        p = pstats.Stats(f'logs/test_fill_down_{rows}.stats', stream=stream)
+        p.sort_stats(pstats.SortKey.CUMULATIVE).print_stats()
+
 class Multiple_Reference_Tests(unittest.TestCase):
     """
     Initialize and execute all test cases. 
@@ -282,5 +303,10 @@ class Multiple_Reference_Tests(unittest.TestCase):
         dangling_chain(self, 15, 100)
 
 
+    def test_fill_down(self):
+        fill_down(self, 3333)
+        fill_down(self, 6666)
+        fill_down(self, 9999)
+
 if __name__ == "__main__":
     unittest.main()
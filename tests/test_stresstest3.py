@@ -0,0 +1,71 @@
+"""
+Memory Analysis For Large Sheets
+"""
+
+import unittest
+import time
+import tracemalloc
+from context import sheets
+
+ROWS = 5000
+COLS = 200
+
+
+def sheet_contents(rows: int, cols: int) -> dict:
+    """
+    Contents for a rows x cols block of numbers starting at A1.
+    """
+    return {f"{sheets.string_conversions.num_to_col(j)}{i}": str(i * j)
+            for i in range(1, rows + 1) for j in range(1, cols + 1)}
+
+
+class Memory_Benchmark(unittest.TestCase):
+    """
+    Measure the memory used by a sheet of 1,000,000 cells.
+    """
+
+    def test_cell_objects(self):
+        spreadsheet = sheets.sheet.Sheet("sheet1")
+        tracemalloc.start()
+        start = time.perf_counter()
+        cells = [sheets.cell.Cell(spreadsheet, sheets.string_conversions.to_key(j, i),
+                                  None, None, None)
+                 for i in range(1, ROWS + 1) for j in range(1, COLS + 1)]
+        elapsed = time.perf_counter() - start
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"\n{len(cells)} cells: {size / len(cells):.0f} bytes/cell, "
+              f"created in {elapsed:.2f}s")
+        start = time.perf_counter()
+        unique = set(cells)
+        print(f"hashed {len(unique)} cells in {time.perf_counter() - start:.2f}s")
+        self.assertEqual(len(unique), len(cells))
+        self.assertNotEqual(cells[0], cells[1])
+
+    def test_million_cell_sheet(self):
+        self.check_million_cell_sheet(False)
+
+    def test_million_cell_columnar_sheet(self):
+        self.check_million_cell_sheet(True)
+
+    def check_million_cell_sheet(self, columnar: bool):
+        contents = sheet_contents(ROWS, COLS)
+        tracemalloc.start()
+        start = time.perf_counter()
+        wb = sheets.Workbook()
+        wb.new_sheet("sheet1", columnar)
+        wb.set_cells_contents("sheet1", contents)
+        elapsed = time.perf_counter() - start
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        num_cells = ROWS * COLS
+        print(f"\n{num_cells} cell {'columnar ' if columnar else ''}sheet: "
+              f"{size / num_cells:.0f} bytes/cell, "
+              f"peak {peak / num_cells:.0f} bytes/cell, loaded in {elapsed:.1f}s")
+        self.assertEqual(wb.get_sheet_extent("sheet1"), (COLS, ROWS))
+        last = f"{sheets.string_conversions.num_to_col(COLS)}{ROWS}"
+        self.assertEqual(wb.get_cell_value("sheet1", last), ROWS * COLS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+Performance Analysis For Aggregate, Lookup And Conditional Functions Over Cell Ranges
+"""
+
+import unittest
+import cProfile
+import pstats
+from context import sheets
+
+
+def profile_stats(pc, name):
+    """
+    Write the stats of a profiler to logs/, sorted by cumulative time.
+    """
+    pc.dump_stats(f'logs/{name}.stats')
+    with open(f'logs/{name}_stats.stats', 'w', encoding="utf8") as stream:
+        p = pstats.Stats(f'logs/{name}.stats', stream=stream)
+        p.sort_stats(pstats.SortKey.CUMULATIVE).print_stats()
+
+
+def sum_edits(self, rows, cols):
+    """
+    Fills a rows x cols block with numbers that one cell sums. Then, updates
+    every cell in the first column of the block one at a time.
+    """
+    pc = cProfile.Profile()
+    wb = sheets.Workbook()
+    wb.new_sheet("sheet1")
+    wb.set_cells_contents("sheet1", {f"{chr(65 + y)}{i}": "1"
+                                     for y in range(cols) for i in range(1, rows + 1)})
+    wb.set_cell_contents("sheet1", "Z1", f"=SUM(A1:{chr(64 + cols)}{rows})")
+    self.assertEqual(wb.get_cell_value("sheet1", "Z1"), rows * cols)
+    pc.enable()
+    for i in range(1, rows + 1):
+        wb.set_cell_contents("sheet1", f"A{i}", "2")
+    pc.disable()
+    self.assertEqual(wb.get_cell_value("sheet1", "Z1"), rows * cols + rows)
+    profile_stats(pc, f'test_sum_edits_{rows}_{cols}')
+
+
+def many_aggregates_one_column(self, rows):
+    """
+    Generates rows number of cells that each aggregate the column A1:A{rows}
+    in a different way. Then, updates every cell of the column.
+    """
+    pc = cProfile.Profile()
+    wb = sheets.Workbook()
+    wb.new_sheet("sheet1")
+    wb.set_cells_contents("sheet1", {f"A{i}": str(i) for i in range(1, rows + 1)})
+    funcs = ["SUM", "AVERAGE", "MIN", "MAX", "COUNT"]
+    wb.set_cells_contents("sheet1", {f"B{i}": f"={funcs[i % 5]}(A1:A{i})"
+                                     for i in range(1, rows + 1)})
+    pc.enable()
+    for i in range(1, rows + 1):
+        wb.set_cell_contents("sheet1", f"A{i}", str(rows - i))
+    pc.disable()
+    self.assertEqual(wb.get_cell_value("sheet1", f"B{rows - rows % 5}"), rows * (rows - 1) // 2)
+    profile_stats(pc, f'test_many_aggregates_one_column_{rows}')
+
+
+def chained_maximums(self, rows):
+    """
+    Generates a column where every cell is one more than the maximum of the
+    cells above it. Then, updates the first cell of the column.
+    """
+    pc = cProfile.Profile()
+    wb = sheets.Workbook()
+    wb.new_sheet("sheet1")
+    wb.set_cell_contents("sheet1", "A1", "1")
+    wb.set_cells_contents("sheet1", {f"A{i}": f"=MAX(A1:A{i - 1}) + 1" for i in range(2, rows + 1)})
+    pc.enable()
+    wb.set_cell_contents("sheet1", "A1", "2")
+    pc.disable()
+    self.assertEqual(wb.get_cell_value("sheet1", f"A{rows}"), rows + 1)
+    profile_stats(pc, f'test_chained_maximums_{rows}')
+
+
+def lookups_against_table(self, rows, lookups):
+    """
+    Generates a table of rows keys and prices, and lookups number of cells that
+    look up a key in it, half exactly and half approximately. Then, updates
+    prices and keys of the table.
+    """
+    pc = cProfile.Profile()
+    wb = sheets.Workbook()
+    wb.new_sheet("table")
+    wb.new_sheet("orders")
+    wb.set_cells_contents("table", {f"{c}{i}": str(i * 3) if c == "A" else str(i)
+                                    for c in "AB" for i in range(1, rows + 1)})
+    pc.enable()
+    wb.set_cells_contents("orders", {
+        f"{c}{i}": f"=VLOOKUP({i * 3 + (c == 'B')}, table!A1:B{rows}, 2, {c == 'B'})"
+        for c in "AB" for i in range(1, lookups // 2 + 1)})
+    for i in range(1, lookups // 2 + 1):
+        wb.set_cell_contents("table", f"B{i}", str(-i))
+    wb.set_cell_contents("table", "A1", "0")
+    pc.disable()
+    self.assertEqual(wb.get_cell_value("orders", "A2"), -2)
+    self.assertEqual(wb.get_cell_value("orders", "B2"), -2)
+    self.assertEqual(wb.get_cell_value("orders", "A1").get_type(),
+                     sheets.CellErrorType.TYPE_ERROR)
+    profile_stats(pc, f'test_lookups_against_table_{rows}_{lookups}')
+
+
+def conditional_counts(self, rows, formulas):
+    """
+    Generates a column of rows values repeating every 100 rows, and formulas
+    number of cells that count or sum the column by criteria. Then, updates
+    every thousandth cell of the column.
+    """
+    pc = cProfile.Profile()
+    wb = sheets.Workbook()
+    wb.new_sheet("sheet1")
+    wb.set_cells_contents("sheet1", {f"A{i}": str(i % 100) for i in range(1, rows + 1)})
+    pc.enable()
+    wb.set_cells_contents("sheet1", {
+        f"B{i}": f"=COUNTIF(A1:A{rows}, {i % 100})" if i % 2 else
+        f"=SUMIF(A1:A{rows}, \">={i % 100}\")" for i in range(1, formulas + 1)})
+    for i in range(1000, rows + 1, 1000):
+        wb.set_cell_contents("sheet1", f"A{i}", "1")
+    pc.disable()
+    self.assertEqual(wb.get_cell_value("sheet1", "B1"), rows // 100 + rows // 1000)
+    self.assertEqual(wb.get_cell_value("sheet1", "B98"), rows // 100 * (98 + 99))
+    profile_stats(pc, f'test_conditional_counts_{rows}_{formulas}')
+
+
+class Range_Function_Tests(unittest.TestCase):
+    """
+    Initialize and execute all test cases.
+    """
+
+    def test_sum_edits(self):
+        sum_edits(self, 9999, 1)
+        sum_edits(self, 9999, 5)
+        sum_edits(self, 9999, 10)
+
+    def test_many_aggregates_one_column(self):
+        many_aggregates_one_column(self, 100)
+        many_aggregates_one_column(self, 200)
+        many_aggregates_one_column(self, 300)
+
+    def test_chained_maximums(self):
+        chained_maximums(self, 500)
+        chained_maximums(self, 1000)
+        chained_maximums(self, 1500)
+
+    def test_lookups_against_table(self):
+        lookups_against_table(self, 9999, 1000)
+        lookups_against_table(self, 9999, 2000)
+        lookups_against_table(self, 9999, 4000)
+
+    def test_conditional_counts(self):
+        conditional_counts(self, 9900, 100)
+        conditional_counts(self, 9900, 200)
+        conditional_counts(self, 9900, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
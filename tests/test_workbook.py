@@ -3,6 +3,8 @@ Unit tests for implementation of sheets.Workbook
 """
 
 import unittest
+import io
+import json
 import string
 import random
 import decimal
@@ -185,6 +187,29 @@ class WorkbookSetCellContents(unittest.TestCase):
         self.assertEqual(wb.get_cell_value('sheet1', 'A3'),
                          wb.get_cell_value('sheet1', 'A4'))
 
+    def test_change_references(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "1")
+        wb.set_cell_contents("sheet1", "A2", "2")
+        wb.set_cell_contents("sheet1", "A3", "=A1 + A2")
+        wb.set_cell_contents("sheet1", "A3", "=A2 * 2")
+        wb.set_cell_contents("sheet1", "A1", "10")
+        self.assertEqual(wb.get_cell_value('sheet1', 'A3'), decimal.Decimal(4))
+        wb.set_cell_contents("sheet1", "A2", "5")
+        self.assertEqual(wb.get_cell_value('sheet1', 'A3'), decimal.Decimal(10))
+        cells = wb.spreadsheets["sheet1"].cells
+        key = sheets.string_conversions.location_to_key
+        self.assertEqual(wb.graph.precedents_of(cells[key("A3")]), [cells[key("A2")]])
+
+    def test_reset_parens_references(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("sheet1", "A1", "=(B1 + 1) * 2")
+        wb.set_cell_contents("sheet1", "A1", "=(B1 + 2) * 2")
+        wb.set_cell_contents("sheet1", "B1", "1")
+        self.assertEqual(wb.get_cell_value('sheet1', 'A1'), decimal.Decimal(6))
+
 
 class WorkbookLoadAndSave(unittest.TestCase):
     """
@@ -201,6 +226,37 @@ class WorkbookLoadAndSave(unittest.TestCase):
             with open("test-data/mock_workbook2.json", "w", encoding="utf8") as fpw:
                 wb.save_workbook(fpw)
 
+    def test_load_formulas_before_precedents(self):
+        cells = {f"A{i}": f"=A{i + 1} + 1" for i in range(1, 500)}
+        cells["A500"] = "1"
+        cells["B1"] = "=Sheet2!A1 & INDIRECT(\"C1\")"
+        cells["C1"] = "'x"
+        data = {"sheets": [{"name": "Sheet1", "cell-contents": cells},
+                           {"name": "Sheet2", "cell-contents": {"A1": "=Sheet1!A1"}}]}
+        wb = sheets.Workbook.load_workbook(io.StringIO(json.dumps(data)))
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), 500)
+        self.assertEqual(wb.get_cell_value("Sheet2", "A1"), 500)
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), "500x")
+        self.assertEqual(wb.get_sheet_extent("Sheet1"), (3, 500))
+
+    def test_load_cycle(self):
+        data = {"sheets": [{"name": "Sheet1", "cell-contents": {
+            "D1": "=C1", "A1": "=B1", "B1": "=A1 + 1", "C1": "=B1", "E1": "=F1", "F1": "2"}}]}
+        wb = sheets.Workbook.load_workbook(io.StringIO(json.dumps(data)))
+        for location in ["A1", "B1", "C1", "D1"]:
+            self.assertEqual(wb.get_cell_value("Sheet1", location).get_type(),
+                             sheets.CellErrorType.CIRCULAR_REFERENCE)
+        self.assertEqual(wb.get_cell_value("Sheet1", "E1"), 2)
+        wb.set_cell_contents("Sheet1", "B1", "3")
+        self.assertEqual(wb.get_cell_value("Sheet1", "D1"), 3)
+
+    def test_load_location_set_twice(self):
+        data = {"sheets": [{"name": "Sheet1", "cell-contents": {
+            "B1": "=A1 * 2", "a1": "1", "A1": "5"}}]}
+        wb = sheets.Workbook.load_workbook(io.StringIO(json.dumps(data)))
+        self.assertEqual(wb.get_cell_contents("Sheet1", "A1"), "5")
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 10)
+
 
 class WorkbookCopySheet(unittest.TestCase):
     """
@@ -468,6 +524,41 @@ class WorkbookRenameSheet(unittest.TestCase):
         wb.rename_sheet('a', 'b')
         self.assertEqual(wb.get_cell_contents("b", "A1"), "='b'!A2")
 
+    def test_rename_after_edits(self):
+        wb = sheets.Workbook()
+        wb.new_sheet("sheet1")
+        wb.new_sheet("sheet2")
+        wb.new_sheet("sheet3")
+        wb.set_cell_contents("sheet1", "A1", "=sheet2!A1 + 1")
+        wb.set_cell_contents("sheet1", "A2", "=SUM(sheet2!A1:A2)")
+        wb.set_cell_contents("sheet1", "A3", "=sheet2!A1")
+        wb.set_cell_contents("sheet1", "A3", "=4")
+        wb.set_cell_contents("sheet3", "A1", "=sheet2!A1")
+        wb.del_sheet("sheet3")
+        wb.set_cell_contents("sheet2", "A1", "2")
+        wb.rename_sheet("sheet2", "Data")
+        self.assertEqual(wb.get_cell_contents("sheet1", "A1"), "=Data!A1 + 1")
+        self.assertEqual(wb.get_cell_contents("sheet1", "A2"), "=SUM(Data!A1:A2)")
+        self.assertEqual(wb.get_cell_contents("sheet1", "A3"), "=4")
+        wb.set_cell_contents("Data", "A2", "5")
+        self.assertEqual(wb.get_cell_value("sheet1", "A1"), decimal.Decimal(3))
+        self.assertEqual(wb.get_cell_value("sheet1", "A2"), decimal.Decimal(7))
+
+    def test_rename_indirect(self):
+        wb = sheets.Workbook()
+        wb.new_sheet("S")
+        wb.new_sheet("Other")
+        wb.set_cell_contents("Other", "C2", "7")
+        wb.set_cell_contents("S", "A1", "=INDIRECT(\"Other!C2\")")
+        wb.set_cell_contents("S", "A2", "=INDIRECT(\"Nope!C2\")")
+        self.assertEqual(wb.get_cell_value("S", "A1"), decimal.Decimal(7))
+        self.assertEqual(wb.get_cell_value("S", "A2").get_type(),
+                         sheets.cell_error.CellErrorType.BAD_REFERENCE)
+        wb.rename_sheet("Other", "Nope")
+        self.assertEqual(wb.get_cell_value("S", "A1").get_type(),
+                         sheets.cell_error.CellErrorType.BAD_REFERENCE)
+        self.assertEqual(wb.get_cell_value("S", "A2"), decimal.Decimal(7))
+
 
 class WorkbookNotifyCellsChanged(unittest.TestCase):
     """
@@ -736,7 +827,152 @@ class WorkbookNotifyCellsChanged(unittest.TestCase):
         expected = "[('Sheet1', 'A1')]\n[('sheet1_1', 'A1'), ('Sheet1', 'A1')]\n"
         self.assertEqual(expected, output)
 
+    def test_unchanged_value_stops_notify(self):
+        def on_cells_changed(workbook, cells_changed):
+            _ = workbook
+            print(cells_changed)
+        new_stdo, sys_out = store_stdout()
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("Sheet1", "A1", "1")
+        wb.set_cell_contents("Sheet1", "B1", "=A1 > 0")
+        wb.set_cell_contents("Sheet1", "C1", "=B1 & \"!\"")
+        wb.notify_cells_changed(on_cells_changed)
+        wb.set_cell_contents("Sheet1", "A1", "2")
+        output = restore_stdout(new_stdo, sys_out)
+        self.assertEqual("[('Sheet1', 'A1')]\n", output)
+        self.assertEqual(wb.get_cell_value("Sheet1", "C1"), "TRUE!")
+
+    def test_value_type_change_notify(self):
+        def on_cells_changed(workbook, cells_changed):
+            _ = workbook
+            print(cells_changed)
+        new_stdo, sys_out = store_stdout()
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("Sheet1", "A1", "0")
+        wb.set_cell_contents("Sheet1", "B1", "=A1")
+        wb.set_cell_contents("Sheet1", "C1", "=B1 & \"\"")
+        wb.notify_cells_changed(on_cells_changed)
+        # FALSE == 0 in Python, but the values are still different
+        wb.set_cell_contents("Sheet1", "A1", "false")
+        output = restore_stdout(new_stdo, sys_out)
+        expected = "[('Sheet1', 'A1'), ('Sheet1', 'B1'), ('Sheet1', 'C1')]\n"
+        self.assertEqual(expected, output)
+        self.assertEqual(wb.get_cell_value("Sheet1", "C1"), "FALSE")
+
+    def test_notify_reads_without_copy(self):
+        values = []
+
+        def on_cells_changed(workbook, cells_changed):
+            self.assertIsInstance(workbook, sheets.Workbook)
+            for sheet_name, location in cells_changed:
+                values.append(workbook.get_cell_value(sheet_name, location))
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("Sheet1", "B1", "=A1 * 2")
+        wb.notify_cells_changed(on_cells_changed)
+        wb.set_cell_contents("Sheet1", "A1", "4")
+        self.assertEqual(values, [4, 8])
+
+    def test_notify_cannot_change_workbook(self):
+        def on_cells_changed(workbook, cells_changed):
+            _ = cells_changed
+            workbook.set_cell_contents("Sheet1", "A1", "100")
+            key = sheets.string_conversions.location_to_key("B1")
+            workbook.spreadsheets["sheet1"].cells[key].contents = "'changed"
+            self.assertEqual(workbook.get_cell_value("Sheet1", "A1"), 100)
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("Sheet1", "B1", "=A1")
+        wb.notify_cells_changed(on_cells_changed)
+        wb.set_cell_contents("Sheet1", "A1", "1")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1"), 1)
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 1)
+        self.assertEqual(wb.get_cell_contents("Sheet1", "B1"), "=A1")
+
+    def test_notify_kept_workbook_unchanged(self):
+        kept = []
 
+        def on_cells_changed(workbook, cells_changed):
+            _ = cells_changed
+            kept.append(workbook)
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.notify_cells_changed(on_cells_changed)
+        wb.set_cell_contents("Sheet1", "A1", "1")
+        wb.set_cell_contents("Sheet1", "A1", "2")
+        wb.del_sheet("Sheet1")
+        self.assertEqual([w.get_cell_value("Sheet1", "A1") for w in kept], [1, 2])
+
+
+class WorkbookBatch(unittest.TestCase):
+    """
+    Unit tests for Workbook.batch and Workbook.set_cells_contents
+    """
+
+    def test_batch_single_notification(self):
+        notified = []
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cell_contents("Sheet1", "A1", "1")
+        wb.set_cell_contents("Sheet1", "B1", "=A1 + A2")
+        wb.notify_cells_changed(lambda _, cells: notified.append(list(cells)))
+        with wb.batch():
+            wb.set_cell_contents("Sheet1", "A1", "2")
+            wb.set_cell_contents("Sheet1", "A2", "3")
+            wb.set_cell_contents("Sheet1", "A1", "5")
+            wb.set_cell_contents("Sheet1", "C1", "'unchanged")
+            wb.set_cell_contents("Sheet1", "C1", None)
+            self.assertEqual(notified, [])
+        self.assertEqual(len(notified), 1)
+        self.assertEqual(sorted(notified[0]),
+                         [("Sheet1", "A1"), ("Sheet1", "A2"), ("Sheet1", "B1")])
+        self.assertEqual(wb.get_cell_value("Sheet1", "B1"), 8)
+        self.assertEqual(wb.get_sheet_extent("Sheet1"), (2, 2))
+
+    def test_batch_read_inside(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        with wb.batch():
+            wb.set_cell_contents("Sheet1", "A2", "=A1 * 2")
+            wb.set_cell_contents("Sheet1", "A1", "4")
+            self.assertEqual(wb.get_cell_value("Sheet1", "A2"), 8)
+            wb.set_cell_contents("Sheet1", "A1", "=A2")
+        self.assertEqual(wb.get_cell_value("Sheet1", "A1").get_type(),
+                         sheets.CellErrorType.CIRCULAR_REFERENCE)
+        self.assertEqual(wb.get_cell_value("Sheet1", "A2").get_type(),
+                         sheets.CellErrorType.CIRCULAR_REFERENCE)
+
+    def test_batch_nested_and_exception(self):
+        notified = []
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.notify_cells_changed(lambda _, cells: notified.append(list(cells)))
+        with self.assertRaises(KeyError):
+            with wb.batch():
+                wb.set_cell_contents("Sheet1", "A1", "1")
+                with wb.batch():
+                    wb.new_sheet()
+                    wb.set_cell_contents("Sheet2", "A1", "=Sheet1!A1")
+                wb.set_cell_contents("Sheet3", "A1", "1")
+        self.assertEqual(notified, [[("Sheet1", "A1"), ("Sheet2", "A1")]])
+        self.assertEqual(wb.get_cell_value("Sheet2", "A1"), 1)
+        # notifications are sent straight away again after the batch
+        wb.set_cell_contents("Sheet1", "A1", "2")
+        self.assertEqual(len(notified), 2)
+
+    def test_set_cells_contents(self):
+        wb = sheets.Workbook()
+        wb.new_sheet()
+        wb.set_cells_contents("Sheet1", {"a1": "1", "A2": "=A1 + 1", "A3": None})
+        self.assertEqual(wb.get_cell_value("Sheet1", "A2"), 2)
+        self.assertEqual(wb.get_cell_contents("Sheet1", "A1"), "1")
+        with self.assertRaises(ValueError):
+            wb.set_cells_contents("Sheet1", {"A1": "5", "A0": "1"})
+        self.assertEqual(wb.get_cell_contents("Sheet1", "A1"), "1")
+        with self.assertRaises(KeyError):
+            wb.set_cells_contents("Sheet2", {"A1": "5"})
 
 
 if __name__ == "__main__":